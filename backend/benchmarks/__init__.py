@@ -0,0 +1,17 @@
+"""
+Suite de benchmarks del backend.
+
+Se ejecuta sin red contra una base de datos de prueba temporal, poblada con
+`seed_benchmark`:
+
+    cd backend
+    python -m benchmarks                      # ejecuta y compara con baseline.json
+    python -m benchmarks --save-baseline      # guarda los resultados como baseline
+    python -m benchmarks -k muestreo --output resultados.json
+
+La prueba de carga de flujos completos contra un servidor local está en
+`benchmarks.loadtest` (`python -m benchmarks.loadtest --help`).
+
+Los benchmarks se registran con el decorador `benchmark` de `benchmarks.runner`
+en los módulos `benchmarks.suite_*`.
+"""
@@ -0,0 +1,499 @@
+"""
+Generador de carga local para los flujos de inspección.
+
+Cada usuario virtual inicia sesión y repite el flujo real del frontend:
+POST /api/muestreo/generar/ → POST /api/muestreo/configurar-pallets/<id>/ →
+GET /api/muestreo/diagrama-pallets/<id>/. Los usuarios se activan en rampa y
+se reporta throughput, latencias (p50/p90/p95/p99) y errores por endpoint.
+
+Usa asyncio con un cliente HTTP/1.1 mínimo (keep-alive) para no depender de
+paquetes externos ni de red:
+
+    cd backend
+    python -m benchmarks.loadtest --iniciar --usuarios 50 --rampa 10 --duracion 60
+    python -m benchmarks.loadtest --url http://127.0.0.1:8000 --usuario ana --password ...
+    python -m benchmarks.loadtest --iniciar --escenario login --usuarios 30 --pausa 0.2
+
+El escenario `lectura` crea una inspección por usuario y luego solo consulta
+inspección, diagrama y tema (tablets con el diagrama abierto); sirve para
+comparar el despliegue WSGI con el ASGI (vistas async de lectura):
+
+    python -m benchmarks.loadtest --iniciar --escenario lectura --usuarios 200 \
+        --servidor "gunicorn -c gunicorn.conf.py --bind 127.0.0.1:8765 config.wsgi"
+    GUNICORN_WORKER_CLASS=uvicorn python -m benchmarks.loadtest --iniciar --escenario lectura --usuarios 200 \
+        --servidor "gunicorn -c gunicorn.conf.py --bind 127.0.0.1:8765 config.asgi"
+
+Con --iniciar se levanta `manage.py runserver` (o el comando de --servidor)
+en un puerto local y se crea el usuario de prueba si no existe.
+
+Si el servidor corre con PROFILING_ENABLED=True, el resumen incluye cuántos
+requests abrieron una conexión nueva a la base de datos y cuántos reutilizaron
+una persistente (entrada `conn` de Server-Timing). Para comparar:
+
+    PROFILING_ENABLED=True DB_CONN_MAX_AGE=0 python -m benchmarks.loadtest --iniciar \
+        --servidor "gunicorn -c gunicorn.conf.py --bind 127.0.0.1:8765 config.wsgi"
+    PROFILING_ENABLED=True DB_CONN_MAX_AGE=600 python -m benchmarks.loadtest --iniciar --servidor ...
+"""
+import argparse
+import asyncio
+import json
+import math
+import os
+import random
+import shlex
+import socket
+import subprocess
+import sys
+import time
+from collections import Counter
+from pathlib import Path
+from urllib.parse import urlsplit
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+
+# Bytes de buffer (socket y lector) de los clientes con --kbps
+BUFFER_LENTO = 4096
+
+ENDPOINTS = ['login', 'generar', 'configurar_pallets', 'diagrama_pallets', 'inspeccion', 'tema']
+
+# (especie, peso, cajas por pallet mín., máx.)
+ESPECIES = [
+    ('Cereza', 50, 150, 260),
+    ('Uva de Mesa', 20, 90, 130),
+    ('Arándano', 15, 180, 320),
+    ('Manzana', 10, 48, 60),
+    ('Ciruela', 5, 90, 120),
+]
+
+
+class ClienteHTTP:
+    """Cliente HTTP/1.1 mínimo sobre asyncio con reutilización de conexión."""
+
+    def __init__(self, host, port, timeout, kbps=None):
+        self.host = host
+        self.port = port
+        self.timeout = timeout
+        # Velocidad de descarga simulada (None = sin límite)
+        self.bytes_por_segundo = kbps * 1000 / 8 if kbps else None
+        self._reader = None
+        self._writer = None
+        # Server-Timing conn;desc="nueva"|"reutilizada" → cantidad de requests
+        self.conexiones_bd = Counter()
+
+    async def _conectar(self):
+        if self.bytes_por_segundo is None:
+            self._reader, self._writer = await asyncio.open_connection(self.host, self.port)
+            return
+        # Buffers chicos: el servidor solo puede enviar al ritmo en que se lee
+        sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, BUFFER_LENTO)
+        sock.setblocking(False)
+        await asyncio.get_running_loop().sock_connect(sock, (self.host, self.port))
+        self._reader, self._writer = await asyncio.open_connection(sock=sock, limit=BUFFER_LENTO)
+
+    async def _leer_cuerpo(self, cantidad):
+        if self.bytes_por_segundo is None:
+            return await self._reader.readexactly(cantidad)
+        cuerpo = bytearray()
+        while len(cuerpo) < cantidad:
+            parte = await self._reader.readexactly(min(BUFFER_LENTO, cantidad - len(cuerpo)))
+            cuerpo += parte
+            await asyncio.sleep(len(parte) / self.bytes_por_segundo)
+        return bytes(cuerpo)
+
+    async def cerrar(self):
+        if self._writer is not None:
+            self._writer.close()
+            try:
+                await self._writer.wait_closed()
+            except (ConnectionError, OSError):
+                pass
+            self._writer = None
+
+    async def request(self, metodo, path, datos=None, token=None):
+        """Envía una petición y retorna (status, cuerpo JSON o None)."""
+        cuerpo = json.dumps(datos).encode() if datos is not None else b''
+        cabeceras = [
+            f'{metodo} {path} HTTP/1.1',
+            f'Host: {self.host}:{self.port}',
+            'Accept: application/json',
+            'Connection: keep-alive',
+            f'Content-Length: {len(cuerpo)}',
+        ]
+        if datos is not None:
+            cabeceras.append('Content-Type: application/json')
+        if token:
+            cabeceras.append(f'Authorization: Bearer {token}')
+        mensaje = ('\r\n'.join(cabeceras) + '\r\n\r\n').encode() + cuerpo
+
+        for intento in range(2):
+            if self._writer is None:
+                await self._conectar()
+            try:
+                self._writer.write(mensaje)
+                await self._writer.drain()
+                return await asyncio.wait_for(self._leer_respuesta(), self.timeout)
+            except (ConnectionError, asyncio.IncompleteReadError):
+                # El servidor cerró una conexión reutilizada: reintentar una vez
+                await self.cerrar()
+                if intento:
+                    raise
+            except BaseException:
+                await self.cerrar()
+                raise
+
+    async def _leer_respuesta(self):
+        linea = await self._reader.readuntil(b'\r\n')
+        partes = linea.decode('latin-1').split(' ', 2)
+        status = int(partes[1])
+
+        cabeceras = {}
+        while True:
+            linea = await self._reader.readuntil(b'\r\n')
+            if linea == b'\r\n':
+                break
+            nombre, _, valor = linea.decode('latin-1').partition(':')
+            cabeceras[nombre.strip().lower()] = valor.strip()
+        self._registrar_conexion_bd(cabeceras.get('server-timing', ''))
+
+        if cabeceras.get('transfer-encoding', '').lower() == 'chunked':
+            cuerpo = bytearray()
+            while True:
+                tamano = int((await self._reader.readuntil(b'\r\n')).split(b';')[0], 16)
+                if tamano == 0:
+                    await self._reader.readuntil(b'\r\n')
+                    break
+                cuerpo += await self._leer_cuerpo(tamano)
+                await self._reader.readexactly(2)
+        elif 'content-length' in cabeceras:
+            cuerpo = await self._leer_cuerpo(int(cabeceras['content-length']))
+        else:
+            cuerpo = await self._reader.read()
+            cabeceras['connection'] = 'close'
+
+        if cabeceras.get('connection', '').lower() == 'close':
+            await self.cerrar()
+
+        try:
+            return status, json.loads(cuerpo) if cuerpo else None
+        except ValueError:
+            return status, None
+
+    def _registrar_conexion_bd(self, server_timing):
+        for metrica in server_timing.split(','):
+            nombre, _, parametros = metrica.strip().partition(';')
+            if nombre == 'conn':
+                self.conexiones_bd[parametros.partition('desc=')[2].strip('"')] += 1
+
+
+class Estadisticas:
+    """Latencias y errores por endpoint."""
+
+    def __init__(self):
+        self.latencias = {e: [] for e in ENDPOINTS}
+        self.errores = {e: 0 for e in ENDPOINTS}
+        self.detalle_errores = {}
+        self.conexiones_bd = Counter()
+        self.inicio = None
+        self.fin = None
+
+    def registrar(self, endpoint, segundos, error=None):
+        self.latencias[endpoint].append(segundos)
+        if error:
+            self.errores[endpoint] += 1
+            self.detalle_errores[error] = self.detalle_errores.get(error, 0) + 1
+
+    def resumen(self):
+        duracion = (self.fin or time.perf_counter()) - self.inicio
+        filas = []
+        for endpoint in ENDPOINTS:
+            latencias = sorted(self.latencias[endpoint])
+            n = len(latencias)
+            fila = {
+                'endpoint': endpoint,
+                'peticiones': n,
+                'errores': self.errores[endpoint],
+                'tasa_error': round(self.errores[endpoint] / n, 4) if n else 0.0,
+                'throughput_rps': round(n / duracion, 2) if duracion else 0.0,
+            }
+            for p in (50, 90, 95, 99):
+                fila[f'p{p}_ms'] = round(_percentil(latencias, p) * 1000, 2) if n else None
+            fila['max_ms'] = round(latencias[-1] * 1000, 2) if n else None
+            filas.append(fila)
+        return {
+            'duracion_s': round(duracion, 2),
+            'endpoints': filas,
+            'errores': self.detalle_errores,
+            'conexiones_bd': dict(self.conexiones_bd),
+        }
+
+
+def _percentil(ordenados, p):
+    """Percentil por rango más cercano sobre una lista ordenada."""
+    k = max(0, math.ceil(p / 100 * len(ordenados)) - 1)
+    return ordenados[k]
+
+
+def _datos_inspeccion(rng, numero):
+    """Datos realistas para /api/muestreo/generar/."""
+    especie, _, minimo, maximo = rng.choices(ESPECIES, [e[1] for e in ESPECIES])[0]
+    cantidad_pallets = rng.randint(6, 26)
+    base = rng.randint(minimo, maximo)
+    boxes = [max(1, round(base * rng.uniform(0.9, 1.1))) for _ in range(cantidad_pallets)]
+    datos = {
+        'exportador': f'Exportadora {rng.randint(1, 8)}',
+        'establecimiento_nombre': f'Planta {rng.randint(1, 20)}',
+        'inspector_sag': f'Inspector {rng.randint(1, 60)}',
+        'contraparte_sag': f'Contraparte {rng.randint(1, 120)}',
+        'especie': especie,
+        'numero_lote': f'LT-{numero}',
+        'tamano_lote': sum(boxes),
+        'tipo_muestreo': 'POR_ETAPA' if rng.random() < 0.2 else 'NORMAL',
+        'tipo_despacho': 'Marítimo',
+        'cantidad_pallets': cantidad_pallets,
+    }
+    if datos['tipo_muestreo'] == 'POR_ETAPA':
+        datos['boxes_per_pallet'] = boxes
+    return datos, boxes
+
+
+def _configuraciones(inspection, boxes, rng):
+    """Configuración de pallets como la envía el frontend."""
+    if inspection['tipo_muestreo'] == 'POR_ETAPA':
+        pallets = inspection['selected_pallets']
+    else:
+        pallets = range(1, inspection['cantidad_pallets'] + 1)
+    base = rng.choice([6, 8, 10])
+    return [
+        {'numero_pallet': p, 'base': base, 'cantidad_cajas': boxes[p - 1], 'distribucion_caras': []}
+        for p in pallets
+    ]
+
+
+async def _medir(stats, endpoint, coro, esperado):
+    inicio = time.perf_counter()
+    try:
+        status, cuerpo = await coro
+    except asyncio.TimeoutError:
+        stats.registrar(endpoint, time.perf_counter() - inicio, f'{endpoint}: timeout')
+        return None
+    except (OSError, ConnectionError, asyncio.IncompleteReadError, ValueError) as e:
+        stats.registrar(endpoint, time.perf_counter() - inicio, f'{endpoint}: {type(e).__name__}')
+        return None
+    error = None if status == esperado else f'{endpoint}: HTTP {status}'
+    stats.registrar(endpoint, time.perf_counter() - inicio, error)
+    return cuerpo if error is None else None
+
+
+async def _login(cliente, stats, args):
+    return await _medir(stats, 'login', cliente.request(
+        'POST', '/api/auth/login/', {'username': args.usuario, 'password': args.password}
+    ), 200)
+
+
+async def _generar_y_configurar(cliente, stats, args, rng, numero, token):
+    """Crea una inspección y configura sus pallets. Retorna la inspección o None."""
+    datos, boxes = _datos_inspeccion(rng, numero)
+    cuerpo = await _medir(stats, 'generar', cliente.request(
+        'POST', '/api/muestreo/generar/', datos, token
+    ), 201)
+    if cuerpo is None:
+        return None
+    inspection = cuerpo['data']['inspection']
+
+    await asyncio.sleep(rng.uniform(0, args.pausa))
+    cuerpo = await _medir(stats, 'configurar_pallets', cliente.request(
+        'POST', f"/api/muestreo/configurar-pallets/{inspection['id']}/",
+        {'configurations': _configuraciones(inspection, boxes, rng)}, token
+    ), 200)
+    return inspection if cuerpo is not None else None
+
+
+async def _lecturas(cliente, stats, args, rng, n, fin, token):
+    """Una tablet: una inspección propia y luego solo lecturas hasta el final."""
+    inspection = None
+    while inspection is None and time.perf_counter() < fin:
+        inspection = await _generar_y_configurar(cliente, stats, args, rng, f'{n}-0', token)
+
+    # El tema se consulta solo si hay alguno (no se mide el listado)
+    _, temas = await cliente.request('GET', '/api/themes/')
+    tema_id = temas[0]['id'] if temas else None
+
+    while inspection is not None and time.perf_counter() < fin:
+        await _medir(stats, 'inspeccion', cliente.request(
+            'GET', f"/api/inspections/{inspection['id']}/"
+        ), 200)
+        await _medir(stats, 'diagrama_pallets', cliente.request(
+            'GET', f"/api/muestreo/diagrama-pallets/{inspection['id']}/"
+        ), 200)
+        if tema_id is not None:
+            await _medir(stats, 'tema', cliente.request('GET', f'/api/themes/{tema_id}/'), 200)
+        await asyncio.sleep(rng.uniform(0, args.pausa))
+
+
+async def usuario_virtual(n, args, stats, fin, host, port):
+    """Un inspector: login y flujos generar → configurar → diagrama hasta el final."""
+    rng = random.Random(args.seed * 100003 + n)
+    cliente = ClienteHTTP(host, port, args.timeout, args.kbps)
+    try:
+        if args.escenario == 'login':
+            # Cambio de turno: todas las estaciones inician sesión con la misma cuenta
+            while time.perf_counter() < fin:
+                await _login(cliente, stats, args)
+                await asyncio.sleep(rng.uniform(0, args.pausa))
+            return
+
+        cuerpo = await _login(cliente, stats, args)
+        token = cuerpo.get('access') if cuerpo else None
+
+        if args.escenario == 'lectura':
+            await _lecturas(cliente, stats, args, rng, n, fin, token)
+            return
+
+        flujo = 0
+        while time.perf_counter() < fin:
+            flujo += 1
+            inspection = await _generar_y_configurar(cliente, stats, args, rng, f'{n}-{flujo}', token)
+            if inspection is None:
+                continue
+
+            await _medir(stats, 'diagrama_pallets', cliente.request(
+                'GET', f"/api/muestreo/diagrama-pallets/{inspection['id']}/", token=token
+            ), 200)
+            await asyncio.sleep(rng.uniform(0, args.pausa))
+    finally:
+        stats.conexiones_bd.update(cliente.conexiones_bd)
+        await cliente.cerrar()
+
+
+async def ejecutar(args):
+    partes = urlsplit(args.url)
+    host, port = partes.hostname, partes.port or 80
+    stats = Estadisticas()
+    stats.inicio = time.perf_counter()
+    fin = stats.inicio + args.duracion
+
+    tareas = []
+    for n in range(args.usuarios):
+        # Rampa lineal: el usuario n parte a n/usuarios * rampa segundos
+        retraso = args.rampa * n / args.usuarios if args.usuarios else 0
+        tareas.append(asyncio.create_task(_con_retraso(retraso, usuario_virtual(n, args, stats, fin, host, port))))
+
+    progreso = asyncio.create_task(_reportar_progreso(stats, fin))
+    await asyncio.gather(*tareas)
+    progreso.cancel()
+    stats.fin = time.perf_counter()
+    return stats.resumen()
+
+
+async def _con_retraso(segundos, coro):
+    await asyncio.sleep(segundos)
+    await coro
+
+
+async def _reportar_progreso(stats, fin):
+    while time.perf_counter() < fin:
+        await asyncio.sleep(5)
+        total = sum(len(v) for v in stats.latencias.values())
+        errores = sum(stats.errores.values())
+        print(f'  {time.perf_counter() - stats.inicio:5.0f}s  {total} peticiones, {errores} errores', file=sys.stderr)
+
+
+def _iniciar_servidor(args):
+    """Levanta el servidor local y asegura el usuario de prueba."""
+    entorno = dict(os.environ, DJANGO_SETTINGS_MODULE=os.environ.get('DJANGO_SETTINGS_MODULE', 'config.settings'))
+    script = (
+        'from django.contrib.auth.models import User;'
+        f'u, _ = User.objects.get_or_create(username={args.usuario!r});'
+        f'u.set_password({args.password!r}); u.save()'
+    )
+    subprocess.run(
+        [sys.executable, 'manage.py', 'shell', '-c', script],
+        cwd=BACKEND_DIR, env=entorno, check=True
+    )
+
+    partes = urlsplit(args.url)
+    comando = args.servidor or f'{sys.executable} manage.py runserver {partes.hostname}:{partes.port} --noreload'
+    proceso = subprocess.Popen(
+        shlex.split(comando), cwd=BACKEND_DIR, env=entorno,
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+
+    limite = time.monotonic() + 30
+    while time.monotonic() < limite:
+        if proceso.poll() is not None:
+            raise SystemExit(f'El servidor terminó al iniciar (código {proceso.returncode}): {comando}')
+        try:
+            socket.create_connection((partes.hostname, partes.port), timeout=1).close()
+            return proceso
+        except OSError:
+            time.sleep(0.3)
+    proceso.terminate()
+    raise SystemExit(f'El servidor no respondió en {partes.hostname}:{partes.port}')
+
+
+def _imprimir(resumen, args):
+    print(f"\nUsuarios: {args.usuarios}  Rampa: {args.rampa}s  Duración: {resumen['duracion_s']}s\n")
+    print(f"{'endpoint':<20}{'peticiones':>11}{'req/s':>9}{'error %':>9}"
+          f"{'p50 ms':>10}{'p90 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'max ms':>10}")
+    print('-' * 99)
+    for f in resumen['endpoints']:
+        def ms(v):
+            return '-' if v is None else f'{v:.1f}'
+        print(f"{f['endpoint']:<20}{f['peticiones']:>11}{f['throughput_rps']:>9.1f}{f['tasa_error'] * 100:>8.1f}%"
+              f"{ms(f['p50_ms']):>10}{ms(f['p90_ms']):>10}{ms(f['p95_ms']):>10}{ms(f['p99_ms']):>10}{ms(f['max_ms']):>10}")
+    conexiones = resumen['conexiones_bd']
+    if conexiones:
+        total = sum(conexiones.values())
+        reutilizadas = conexiones.get('reutilizada', 0)
+        print(f"\nConexiones BD: {conexiones.get('nueva', 0)} nuevas, {reutilizadas} reutilizadas "
+              f"({reutilizadas / total * 100:.1f} % de {total} requests con consultas)")
+    if resumen['errores']:
+        print('\nErrores:')
+        for error, cantidad in sorted(resumen['errores'].items(), key=lambda e: -e[1]):
+            print(f'  {cantidad:>6}  {error}')
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m benchmarks.loadtest', description='Prueba de carga local')
+    parser.add_argument('--url', default='http://127.0.0.1:8765', help='Servidor a probar (default: http://127.0.0.1:8765)')
+    parser.add_argument('--usuarios', type=int, default=20, help='Usuarios virtuales concurrentes (default: 20)')
+    parser.add_argument('--rampa', type=float, default=10, help='Segundos para activar todos los usuarios (default: 10)')
+    parser.add_argument('--duracion', type=float, default=60, help='Duración total en segundos (default: 60)')
+    parser.add_argument('--pausa', type=float, default=1.0, help='Pausa máxima entre pasos por usuario (default: 1.0)')
+    parser.add_argument('--timeout', type=float, default=30, help='Timeout por petición en segundos (default: 30)')
+    parser.add_argument('--escenario', choices=['flujo', 'login', 'lectura'], default='flujo',
+                        help='flujo: login + generar/configurar/diagrama; login: solo logins repetidos; '
+                             'lectura: una inspección por usuario y luego solo GETs (default: flujo)')
+    parser.add_argument('--kbps', type=float, help='Descarga limitada por usuario, p. ej. 1000 para 3G (default: sin límite)')
+    parser.add_argument('--usuario', default='loadtest', help='Usuario para /api/auth/login/ (compartido por todos)')
+    parser.add_argument('--password', default='loadtest-2026', help='Contraseña del usuario')
+    parser.add_argument('--seed', type=int, default=1, help='Semilla de los datos generados')
+    parser.add_argument('--iniciar', action='store_true', help='Levanta el servidor local y crea el usuario')
+    parser.add_argument('--servidor', help='Comando del servidor para --iniciar (default: manage.py runserver)')
+    parser.add_argument('--output', help='Archivo JSON donde guardar el resumen')
+    args = parser.parse_args(argv)
+
+    proceso = _iniciar_servidor(args) if args.iniciar else None
+    try:
+        resumen = asyncio.run(ejecutar(args))
+    finally:
+        if proceso is not None:
+            proceso.terminate()
+            proceso.wait(timeout=10)
+
+    resumen['parametros'] = {
+        'url': args.url, 'escenario': args.escenario, 'usuarios': args.usuarios, 'rampa_s': args.rampa,
+        'duracion_s': args.duracion, 'pausa_s': args.pausa, 'kbps': args.kbps, 'servidor': args.servidor,
+    }
+    _imprimir(resumen, args)
+    if args.output:
+        Path(args.output).write_text(json.dumps(resumen, indent=2, ensure_ascii=False), encoding='utf-8')
+        print(f'\nResumen guardado en {args.output}')
+
+    errores = sum(f['errores'] for f in resumen['endpoints'])
+    return 1 if errores else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,267 @@
+"""
+Infraestructura de la suite de benchmarks: registro, medición, metadatos
+de la ejecución y comparación contra un baseline.
+"""
+import argparse
+import gc
+import json
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import time
+from datetime import datetime
+from pathlib import Path
+
+BASE_DIR = Path(__file__).resolve().parent
+BASELINE_POR_DEFECTO = BASE_DIR / 'baseline.json'
+
+# Módulos que registran benchmarks al importarse
+SUITES = [
+    'benchmarks.suite_muestreo',
+    'benchmarks.suite_api',
+    'benchmarks.suite_json',
+    'benchmarks.suite_tokens',
+]
+
+_registro = []
+
+
+def benchmark(nombre, numero=100, repeticiones=5):
+    """
+    Registra una función de benchmark.
+
+    La función decorada recibe el contexto compartido (dict) y retorna el
+    callable a medir; así la preparación queda fuera del tiempo medido.
+    `contexto['llamadas']` indica cuántas veces se llamará (incluido el
+    calentamiento), para preparar datos de un solo uso.
+
+    Args:
+        nombre (str): Identificador estable (se usa para comparar con el baseline)
+        numero (int): Llamadas por repetición
+        repeticiones (int): Repeticiones; se reportan estadísticas entre ellas
+    """
+    def decorador(preparar):
+        _registro.append({
+            'nombre': nombre,
+            'preparar': preparar,
+            'numero': numero,
+            'repeticiones': repeticiones,
+        })
+        return preparar
+    return decorador
+
+
+def medir(fn, numero, repeticiones):
+    """
+    Mide `fn` y retorna estadísticas en microsegundos por llamada.
+
+    Se hace una llamada de calentamiento y se desactiva el GC durante cada
+    repetición para reducir el ruido, como hace timeit. Antes se fuerza una
+    recolección para no heredar basura de la preparación (p. ej. una poda
+    masiva) ni de benchmarks anteriores.
+    """
+    fn()
+    gc.collect()
+    tiempos = []
+    for _ in range(repeticiones):
+        gc_activo = gc.isenabled()
+        gc.disable()
+        try:
+            inicio = time.perf_counter()
+            for _ in range(numero):
+                fn()
+            tiempos.append((time.perf_counter() - inicio) / numero * 1e6)
+        finally:
+            if gc_activo:
+                gc.enable()
+
+    tiempos.sort()
+    return {
+        'numero': numero,
+        'repeticiones': repeticiones,
+        'min_us': round(tiempos[0], 3),
+        'mediana_us': round(statistics.median(tiempos), 3),
+        'media_us': round(statistics.fmean(tiempos), 3),
+        'desviacion_us': round(statistics.pstdev(tiempos), 3),
+        'max_us': round(tiempos[-1], 3),
+    }
+
+
+def _git_commit():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'],
+            cwd=BASE_DIR, capture_output=True, text=True, timeout=5
+        ).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def metadatos(contexto):
+    """Información de la ejecución para que los resultados sean comparables."""
+    import django
+    from django.db import connection
+
+    return {
+        'fecha': datetime.now().isoformat(timespec='seconds'),
+        'commit': _git_commit(),
+        'python': platform.python_version(),
+        'implementacion': platform.python_implementation(),
+        'django': django.get_version(),
+        'base_datos': connection.vendor,
+        'plataforma': platform.platform(),
+        'procesador': platform.processor() or platform.machine(),
+        'cpus': os.cpu_count(),
+        'inspecciones': contexto.get('inspecciones'),
+        'seed': contexto.get('seed'),
+        'tokens': contexto.get('tokens'),
+    }
+
+
+def comparar(resultados, baseline, umbral):
+    """
+    Compara las medianas contra el baseline.
+
+    Returns:
+        list: Dicts con nombre, baseline, actual, cambio relativo y si es regresión
+    """
+    base = {r['nombre']: r for r in baseline.get('resultados', [])}
+    comparacion = []
+    for r in resultados:
+        anterior = base.get(r['nombre'])
+        if not anterior:
+            continue
+        cambio = (r['mediana_us'] - anterior['mediana_us']) / anterior['mediana_us']
+        comparacion.append({
+            'nombre': r['nombre'],
+            'baseline_us': anterior['mediana_us'],
+            'actual_us': r['mediana_us'],
+            'cambio': round(cambio, 4),
+            'regresion': cambio > umbral,
+        })
+    return comparacion
+
+
+def _preparar_django(args):
+    """Configura Django contra una base de datos de prueba y la puebla."""
+    sys.path.insert(0, str(BASE_DIR.parent))
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'config.settings')
+
+    import django
+    django.setup()
+
+    from django.conf import settings
+    from django.core.management import call_command
+    from django.db import connection
+    from django.test.utils import setup_test_environment
+
+    settings.DEBUG = False
+    setup_test_environment()
+    nombre_original = connection.settings_dict['NAME']
+    connection.creation.create_test_db(verbosity=0, autoclobber=True)
+
+    if args.inspecciones:
+        with open(os.devnull, 'w') as devnull:
+            call_command(
+                'seed_benchmark',
+                inspecciones=args.inspecciones,
+                establecimientos=args.establecimientos,
+                seed=args.seed,
+                stdout=devnull
+            )
+    return connection, nombre_original
+
+
+def _imprimir(resultados, comparacion):
+    cambios = {c['nombre']: c for c in comparacion}
+    ancho = max([len(r['nombre']) for r in resultados] + [10])
+    print(f"\n{'benchmark':<{ancho}}  {'mediana':>12}  {'min':>12}  {'±':>10}  {'vs baseline':>12}")
+    print('-' * (ancho + 56))
+    for r in resultados:
+        c = cambios.get(r['nombre'])
+        delta = ''
+        if c:
+            delta = f"{c['cambio']:+.1%}" + (' ⚠' if c['regresion'] else '')
+        print(
+            f"{r['nombre']:<{ancho}}  {_formatear(r['mediana_us']):>12}  "
+            f"{_formatear(r['min_us']):>12}  {_formatear(r['desviacion_us']):>10}  {delta:>12}"
+        )
+
+
+def _formatear(us):
+    if us >= 1e6:
+        return f'{us / 1e6:.2f} s'
+    if us >= 1e3:
+        return f'{us / 1e3:.2f} ms'
+    return f'{us:.1f} µs'
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m benchmarks', description='Benchmarks del backend')
+    parser.add_argument('-k', dest='filtro', help='Ejecuta solo benchmarks cuyo nombre contenga este texto')
+    parser.add_argument('--inspecciones', type=int, default=2000, help='Inspecciones sintéticas (default: 2000)')
+    parser.add_argument('--establecimientos', type=int, default=10, help='Establecimientos sintéticos (default: 10)')
+    parser.add_argument('--seed', type=int, default=42, help='Semilla de datos y muestreo (default: 42)')
+    parser.add_argument('--tokens', type=int, default=20000,
+                        help='Tokens JWT expirados sembrados para auth.refresh (default: 20000)')
+    parser.add_argument('--output', help='Archivo JSON donde guardar los resultados')
+    parser.add_argument('--baseline', default=str(BASELINE_POR_DEFECTO), help='Baseline para comparar')
+    parser.add_argument('--save-baseline', action='store_true', help='Guarda los resultados como baseline')
+    parser.add_argument('--umbral', type=float, default=0.20,
+                        help='Aumento relativo de la mediana considerado regresión (default: 0.20)')
+    args = parser.parse_args(argv)
+
+    connection, nombre_original = _preparar_django(args)
+    try:
+        import importlib
+        for modulo in SUITES:
+            importlib.import_module(modulo)
+
+        contexto = {'inspecciones': args.inspecciones, 'seed': args.seed, 'tokens': args.tokens}
+        resultados = []
+        for b in _registro:
+            if args.filtro and args.filtro not in b['nombre']:
+                continue
+            random.seed(args.seed)
+            contexto['llamadas'] = b['numero'] * b['repeticiones'] + 1
+            fn = b['preparar'](contexto)
+            estadisticas = medir(fn, b['numero'], b['repeticiones'])
+            resultados.append({'nombre': b['nombre'], **estadisticas})
+            print(f"  {b['nombre']}: {_formatear(estadisticas['mediana_us'])}", file=sys.stderr)
+
+        informe = {'metadatos': metadatos(contexto), 'resultados': resultados}
+    finally:
+        connection.creation.destroy_test_db(nombre_original, verbosity=0)
+
+    comparacion = []
+    baseline_path = Path(args.baseline)
+    if baseline_path.exists() and not args.save_baseline:
+        baseline = json.loads(baseline_path.read_text(encoding='utf-8'))
+        comparacion = comparar(resultados, baseline, args.umbral)
+        informe['baseline'] = {
+            'archivo': str(baseline_path),
+            'metadatos': baseline.get('metadatos'),
+            'umbral': args.umbral,
+            'comparacion': comparacion,
+        }
+
+    _imprimir(resultados, comparacion)
+
+    contenido = json.dumps(informe, indent=2, ensure_ascii=False)
+    if args.output:
+        Path(args.output).write_text(contenido, encoding='utf-8')
+        print(f'\nResultados guardados en {args.output}')
+    if args.save_baseline:
+        baseline_path.write_text(contenido, encoding='utf-8')
+        print(f'\nBaseline guardado en {baseline_path}')
+
+    regresiones = [c for c in comparacion if c['regresion']]
+    if regresiones:
+        print(f'\n⚠ {len(regresiones)} regresiones sobre el umbral de {args.umbral:.0%}:')
+        for c in regresiones:
+            print(f"  {c['nombre']}: {_formatear(c['baseline_us'])} → {_formatear(c['actual_us'])} ({c['cambio']:+.1%})")
+        return 1
+    return 0
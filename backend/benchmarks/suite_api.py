@@ -0,0 +1,166 @@
+"""
+Benchmarks de endpoints de la API a través del cliente de pruebas de DRF.
+
+Miden la pila completa de Django (middleware, autenticación, serializers y
+consultas) contra la base de datos sintética creada por el runner.
+"""
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import transaction
+from rest_framework.test import APIClient
+
+from benchmarks.runner import benchmark
+from inspections.models import Inspection, UserProfile
+
+
+def _get(client, url):
+    def llamar():
+        response = client.get(url)
+        if response.status_code != 200:
+            raise RuntimeError(f'{url} respondió {response.status_code}')
+        return response
+    return llamar
+
+
+def _configurar_pallets(client, inspection, base=8):
+    """Configura los pallets de una inspección como lo hace el frontend."""
+    if inspection.tipo_muestreo == 'POR_ETAPA':
+        pallets = inspection.selected_pallets
+        cajas = {i: inspection.boxes_per_pallet[i - 1] for i in pallets}
+    else:
+        pallets = range(1, inspection.cantidad_pallets + 1)
+        por_pallet, resto = divmod(inspection.tamano_lote, inspection.cantidad_pallets)
+        cajas = {i: por_pallet + (1 if i <= resto else 0) for i in pallets}
+
+    configurations = [
+        {'numero_pallet': i, 'base': base, 'cantidad_cajas': cajas[i], 'distribucion_caras': []}
+        for i in pallets
+    ]
+    response = client.post(
+        f'/api/muestreo/configurar-pallets/{inspection.id}/',
+        {'configurations': configurations},
+        format='json'
+    )
+    if response.status_code != 200:
+        raise RuntimeError(f'No se pudo configurar la inspección {inspection.id}: {response.data}')
+
+
+def _inspeccion_mas_grande(tipo_muestreo):
+    return (
+        Inspection.objects.filter(tipo_muestreo=tipo_muestreo)
+        .order_by('-cantidad_pallets', 'id')
+        .first()
+    )
+
+
+def _diagrama(tipo_muestreo):
+    def preparar(contexto):
+        client = APIClient()
+        inspection = _inspeccion_mas_grande(tipo_muestreo)
+        if inspection is None:
+            raise RuntimeError(f'No hay inspecciones {tipo_muestreo}; aumente --inspecciones')
+        _configurar_pallets(client, inspection)
+        return _get(client, f'/api/muestreo/diagrama-pallets/{inspection.id}/')
+    return preparar
+
+
+benchmark('api.diagrama_pallets[normal]', numero=20)(_diagrama('NORMAL'))
+benchmark('api.diagrama_pallets[por_etapa]', numero=20)(_diagrama('POR_ETAPA'))
+
+
+@benchmark('api.generar_muestreo', numero=50)
+def generar_muestreo(contexto):
+    client = APIClient()
+    datos = {
+        'exportador': 'Benchmark',
+        'establecimiento_nombre': 'Planta Benchmark',
+        'inspector_sag': 'Inspector',
+        'contraparte_sag': 'Contraparte',
+        'especie': 'Cereza',
+        'numero_lote': 'BENCH-GEN',
+        'tamano_lote': 4800,
+        'tipo_muestreo': 'NORMAL',
+        'tipo_despacho': 'Marítimo',
+        'cantidad_pallets': 20,
+    }
+
+    def llamar():
+        response = client.post('/api/muestreo/generar/', datos, format='json')
+        if response.status_code != 201:
+            raise RuntimeError(f'generar respondió {response.status_code}')
+    return llamar
+
+
+@benchmark('api.importar_lotes[csv 10k]', numero=1, repeticiones=3)
+def importar_lotes(contexto):
+    client = _cliente_superadmin()
+    filas = ['lote;especie;tamano_lote;cantidad_pallets;cajas_por_pallet']
+    for i in range(10000):
+        # Mitad normal, mitad por etapa
+        if i % 2:
+            filas.append(f'BENCH-IMP-{i};Cereza;800;8;' + ' '.join(['100'] * 8))
+        else:
+            filas.append(f'BENCH-IMP-{i};Cereza;4800;20;')
+    contenido = '\n'.join(filas).encode()
+    comunes = {
+        'exportador': 'Benchmark',
+        'establecimiento_nombre': 'Planta Benchmark',
+        'inspector_sag': 'Inspector',
+        'contraparte_sag': 'Contraparte',
+        'tipo_despacho': 'Marítimo',
+    }
+
+    def llamar():
+        # Se revierte para no agrandar la base de los demás benchmarks
+        with transaction.atomic():
+            response = client.post('/api/muestreo/importar/', {
+                'archivo': SimpleUploadedFile('lotes.csv', contenido), **comunes
+            }, format='multipart')
+            transaction.set_rollback(True)
+        if response.status_code != 201 or response.data['data']['importadas'] != 10000:
+            raise RuntimeError(f'importar respondió {response.status_code}')
+    return llamar
+
+
+@benchmark('api.list[establishments]', numero=20)
+def list_establishments(contexto):
+    return _get(APIClient(), '/api/establishments/')
+
+
+@benchmark('api.list[inspections]', numero=3, repeticiones=3)
+def list_inspections(contexto):
+    return _get(APIClient(), '/api/inspections/')
+
+
+@benchmark('api.list[sampling-results]', numero=3, repeticiones=3)
+def list_sampling_results(contexto):
+    return _get(APIClient(), '/api/sampling-results/')
+
+
+def _cliente_superadmin():
+    user, _ = User.objects.get_or_create(username='benchmark-superadmin')
+    UserProfile.objects.get_or_create(user=user, defaults={'role': 'SUPERADMIN'})
+    client = APIClient()
+    client.force_authenticate(user)
+    return client
+
+
+def _analytics(endpoint):
+    def preparar(contexto):
+        llamar = _get(_cliente_superadmin(), f'/api/admin/analytics/{endpoint}/?desde={_inicio_temporada()}')
+
+        def sin_cache():
+            cache.clear()
+            return llamar()
+        return sin_cache
+    return preparar
+
+
+def _inicio_temporada():
+    primera = Inspection.objects.order_by('fecha').values_list('fecha', flat=True).first()
+    return primera.isoformat() if primera else ''
+
+
+for _endpoint in ('series', 'tablas', 'especies', 'exportadores'):
+    benchmark(f'api.analytics[{_endpoint}]', numero=20)(_analytics(_endpoint))
@@ -0,0 +1,76 @@
+"""
+Benchmarks de serialización JSON: renderer/parser estándar de DRF contra
+los respaldados por orjson, sobre los payloads más grandes de la API.
+"""
+from io import BytesIO
+
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIClient, APIRequestFactory
+
+from benchmarks.runner import benchmark
+from benchmarks.suite_api import _configurar_pallets, _inspeccion_mas_grande
+from inspections.models import SamplingResult
+from inspections.renderers import ORJSONRenderer, ORJSONParser
+from inspections.serializers import SamplingResultSerializer
+from inspections.views import MuestreoViewSet
+
+
+def _payload_diagrama():
+    """response.data de get_diagrama_pallets para la inspección con más pallets."""
+    inspection = _inspeccion_mas_grande('NORMAL')
+    _configurar_pallets(APIClient(), inspection)
+    vista = MuestreoViewSet.as_view({'get': 'get_diagrama_pallets'})
+    request = APIRequestFactory().get(f'/api/muestreo/diagrama-pallets/{inspection.id}/')
+    return vista(request, inspection_id=inspection.id).data
+
+
+def _payload_sampling_results():
+    """Lista serializada de 500 SamplingResult con cajas_list."""
+    queryset = SamplingResult.objects.select_related('inspection__establishment')[:500]
+    return SamplingResultSerializer(queryset, many=True).data
+
+
+PAYLOADS = {
+    'diagrama': _payload_diagrama,
+    'sampling_results': _payload_sampling_results,
+}
+
+RENDERERS = {
+    'drf': JSONRenderer,
+    'orjson': ORJSONRenderer,
+}
+
+PARSERS = {
+    'drf': JSONParser,
+    'orjson': ORJSONParser,
+}
+
+
+def _render(payload, nombre_renderer):
+    def preparar(contexto):
+        clave = f'json.payload.{payload}'
+        if clave not in contexto:
+            contexto[clave] = PAYLOADS[payload]()
+        datos = contexto[clave]
+        renderer = RENDERERS[nombre_renderer]()
+        return lambda: renderer.render(datos)
+    return preparar
+
+
+def _parse(payload, nombre_parser):
+    def preparar(contexto):
+        clave = f'json.payload.{payload}'
+        if clave not in contexto:
+            contexto[clave] = PAYLOADS[payload]()
+        cuerpo = JSONRenderer().render(contexto[clave])
+        parser = PARSERS[nombre_parser]()
+        return lambda: parser.parse(BytesIO(cuerpo))
+    return preparar
+
+
+for _payload in PAYLOADS:
+    for _nombre in RENDERERS:
+        benchmark(f'json.render[{_payload}-{_nombre}]', numero=20)(_render(_payload, _nombre))
+    for _nombre in PARSERS:
+        benchmark(f'json.parse[{_payload}-{_nombre}]', numero=20)(_parse(_payload, _nombre))
@@ -0,0 +1,60 @@
+"""
+Benchmarks del motor de muestreo (inspections.utils), sin base de datos.
+"""
+from benchmarks.runner import benchmark
+from inspections.utils import (
+    calcular_muestreo,
+    validate_stage_sampling,
+    select_stage_sampling_pallets,
+    distribute_samples_proportionally,
+    generate_stage_sampling_numbers
+)
+
+# (especie, tamaño de lote) representativos de cada tabla oficial
+CASOS_MUESTREO = [
+    ('Damasco', 3500),           # Hipergeométrica 3%
+    ('Ciruela', 2400),           # Hipergeométrica 6%
+    ('Manzana', 12000),          # Biométrica
+    ('Cereza', 4800),            # Porcentual 2%
+    ('Cereza', 60000),           # Porcentual 2%, lote grande
+]
+
+
+def _registrar_calcular_muestreo(especie, tamano_lote):
+    @benchmark(f'muestreo.calcular[{especie}-{tamano_lote}]', numero=500)
+    def preparar(contexto):
+        return lambda: calcular_muestreo(tamano_lote=tamano_lote, especie=especie)
+
+
+for _especie, _tamano in CASOS_MUESTREO:
+    _registrar_calcular_muestreo(_especie, _tamano)
+
+
+@benchmark('muestreo.calcular[incremento-40]', numero=500)
+def calcular_con_incremento(contexto):
+    return lambda: calcular_muestreo(tamano_lote=12000, especie='Manzana', incremento_intensidad=40)
+
+
+def _pipeline_por_etapa(boxes_per_pallet, especie):
+    """Mismo flujo que /api/muestreo/generar/ para muestreo por etapa."""
+    total = sum(boxes_per_pallet)
+    es_valido, errores, _ = validate_stage_sampling(len(boxes_per_pallet), boxes_per_pallet, total)
+    if not es_valido:
+        raise ValueError(errores)
+    seleccionados = select_stage_sampling_pallets(len(boxes_per_pallet))
+    cajas_seleccionadas = sum(boxes_per_pallet[i - 1] for i in seleccionados)
+    muestra = calcular_muestreo(tamano_lote=cajas_seleccionadas, especie=especie)['tamano_muestra']
+    distribucion = distribute_samples_proportionally(boxes_per_pallet, seleccionados, muestra)
+    return generate_stage_sampling_numbers(boxes_per_pallet, seleccionados, distribucion)
+
+
+@benchmark('muestreo.por_etapa[20-pallets]', numero=300)
+def por_etapa_20(contexto):
+    boxes = [200 + (i % 5) * 10 for i in range(20)]
+    return lambda: _pipeline_por_etapa(boxes, 'Cereza')
+
+
+@benchmark('muestreo.por_etapa[60-pallets]', numero=200)
+def por_etapa_60(contexto):
+    boxes = [100 + (i % 7) * 5 for i in range(60)]
+    return lambda: _pipeline_por_etapa(boxes, 'Manzana')
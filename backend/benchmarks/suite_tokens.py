@@ -0,0 +1,76 @@
+"""
+Benchmarks de refresh de JWT con token_blacklist crecida.
+
+Se siembran `--tokens` filas expiradas en OutstandingToken (la mitad también
+en BlacklistedToken) y se mide POST /api/auth/refresh/ antes y después de
+`prune_tokens`. Para el escenario de producción: `--tokens 1000000 -k auth.`
+"""
+import os
+import uuid
+from datetime import timedelta
+
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken, OutstandingToken
+from rest_framework_simplejwt.tokens import RefreshToken
+from rest_framework_simplejwt.utils import aware_utcnow
+
+from benchmarks.runner import benchmark
+
+LOTE = 5000
+
+
+def _usuario():
+    user, _ = User.objects.get_or_create(username='bench-refresh')
+    return user
+
+
+def _sembrar(contexto):
+    """Inserta los tokens expirados una sola vez por ejecución."""
+    if contexto.get('tokens.sembrados'):
+        return
+    user = _usuario()
+    expiracion = aware_utcnow() - timedelta(days=1)
+    restantes = contexto.get('tokens', 0)
+    while restantes > 0:
+        cantidad = min(LOTE, restantes)
+        outstanding = OutstandingToken.objects.bulk_create([
+            OutstandingToken(
+                user=user,
+                jti=uuid.uuid4().hex,
+                token='bench',
+                created_at=expiracion - timedelta(days=7),
+                expires_at=expiracion,
+            )
+            for _ in range(cantidad)
+        ])
+        BlacklistedToken.objects.bulk_create([
+            BlacklistedToken(token_id=token.id) for token in outstanding[::2]
+        ])
+        restantes -= cantidad
+    contexto['tokens.sembrados'] = True
+
+
+def _refresh(podar):
+    def preparar(contexto):
+        _sembrar(contexto)
+        if podar:
+            with open(os.devnull, 'w') as devnull:
+                call_command('prune_tokens', '--pausa', '0', stdout=devnull)
+
+        # Con rotación cada refresh token sirve una sola vez
+        user = _usuario()
+        tokens = iter([str(RefreshToken.for_user(user)) for _ in range(contexto['llamadas'])])
+        client = APIClient()
+
+        def llamar():
+            response = client.post('/api/auth/refresh/', {'refresh': next(tokens)}, format='json')
+            if response.status_code != 200:
+                raise RuntimeError(f'refresh respondió {response.status_code}')
+        return llamar
+    return preparar
+
+
+benchmark('auth.refresh[antes-de-podar]', numero=50)(_refresh(podar=False))
+benchmark('auth.refresh[despues-de-podar]', numero=50)(_refresh(podar=True))
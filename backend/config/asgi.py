@@ -7,5 +7,7 @@ import os
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'config.settings')
+# Activa las vistas async de lectura y ajusta las conexiones (ver settings)
+os.environ.setdefault('DJANGO_ASGI', 'True')
 
 application = get_asgi_application()
@@ -0,0 +1,90 @@
+"""
+Perfil de despliegue: workers de gunicorn y conexiones a la base de datos.
+
+Lo usan `gunicorn.conf.py` (configuración del servidor) y settings (límite
+de conexiones que validan los system checks), para que ambos lean las mismas
+variables de entorno:
+
+- WEB_CONCURRENCY:        procesos worker (default: 2 × CPUs + 1, máx. GUNICORN_MAX_WORKERS)
+- GUNICORN_MAX_WORKERS:   tope del default anterior (default: 4; cada worker es un proceso Django)
+- GUNICORN_THREADS:       hilos por worker (default: 4; con más de 1 se usa gthread)
+- GUNICORN_WORKER_CLASS:  sync | gthread | uvicorn (default: según GUNICORN_THREADS);
+                          uvicorn sirve config.asgi con un solo hilo por worker
+- GUNICORN_TIMEOUT:       segundos antes de reiniciar un worker bloqueado (default: 60)
+- GUNICORN_KEEPALIVE:     segundos que se mantiene una conexión HTTP inactiva (default: 5)
+- GUNICORN_MAX_REQUESTS:  requests antes de reciclar un worker, 0 = nunca (default: 1000)
+
+Con gthread cada hilo abre su propia conexión a la base de datos, así que un
+despliegue mantiene hasta WEB_CONCURRENCY × GUNICORN_THREADS conexiones
+persistentes (ver DB_MAX_CONNECTIONS en settings). Con uvicorn las consultas
+de cada worker pasan por un hilo a la vez.
+
+    gunicorn -c gunicorn.conf.py config.wsgi
+    GUNICORN_WORKER_CLASS=uvicorn gunicorn -c gunicorn.conf.py config.asgi
+"""
+import multiprocessing
+import os
+
+# Nombre en GUNICORN_WORKER_CLASS → worker_class de gunicorn
+CLASES_WORKER = {
+    'sync': 'sync',
+    'gthread': 'gthread',
+    'uvicorn': 'uvicorn.workers.UvicornWorker',
+}
+
+
+def _entero(entorno, nombre, default, minimo):
+    valor = entorno.get(nombre)
+    if valor in (None, ''):
+        return default
+    try:
+        numero = int(valor)
+    except ValueError:
+        raise ValueError(f'{nombre} debe ser un entero (recibido: {valor!r})')
+    if numero < minimo:
+        raise ValueError(f'{nombre} debe ser mayor o igual a {minimo} (recibido: {numero})')
+    return numero
+
+
+def perfil_gunicorn(entorno=None):
+    """
+    Configuración de gunicorn según las variables de entorno.
+
+    Returns:
+        dict: workers, threads, worker_class, timeout, keepalive, max_requests
+              y max_requests_jitter
+
+    Raises:
+        ValueError: si alguna variable tiene un valor inválido
+    """
+    entorno = os.environ if entorno is None else entorno
+
+    maximo = _entero(entorno, 'GUNICORN_MAX_WORKERS', 4, 1)
+    workers = _entero(entorno, 'WEB_CONCURRENCY', min(multiprocessing.cpu_count() * 2 + 1, maximo), 1)
+    clase = entorno.get('GUNICORN_WORKER_CLASS')
+    threads = _entero(entorno, 'GUNICORN_THREADS', 1 if clase == 'uvicorn' else 4, 1)
+
+    clase = clase or ('gthread' if threads > 1 else 'sync')
+    if clase not in CLASES_WORKER:
+        raise ValueError(
+            f'GUNICORN_WORKER_CLASS inválido: {clase!r} (opciones: {", ".join(CLASES_WORKER)})'
+        )
+    if clase != 'gthread' and threads > 1:
+        raise ValueError('GUNICORN_THREADS > 1 requiere GUNICORN_WORKER_CLASS=gthread')
+
+    max_requests = _entero(entorno, 'GUNICORN_MAX_REQUESTS', 1000, 0)
+    return {
+        'workers': workers,
+        'threads': threads,
+        'worker_class': CLASES_WORKER[clase],
+        'timeout': _entero(entorno, 'GUNICORN_TIMEOUT', 60, 1),
+        'keepalive': _entero(entorno, 'GUNICORN_KEEPALIVE', 5, 0),
+        'max_requests': max_requests,
+        # Evita que todos los workers se reciclen a la vez
+        'max_requests_jitter': max_requests // 10,
+    }
+
+
+def conexiones_por_instancia(perfil):
+    """Conexiones a la base de datos que puede abrir una instancia con `perfil`."""
+    return perfil['workers'] * perfil['threads']
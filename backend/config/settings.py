@@ -5,6 +5,7 @@ Django settings for USDA Inspection System.
 from pathlib import Path
 import os
 import dj_database_url
+from corsheaders.defaults import default_headers
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
@@ -46,6 +47,8 @@ MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
     'whitenoise.middleware.WhiteNoiseMiddleware',  # Whitenoise for static files in production
     'corsheaders.middleware.CorsMiddleware',
+    'inspections.middleware.CompressionMiddleware',  # brotli/gzip negociado
+    'django.middleware.http.ConditionalGetMiddleware',  # ETag y respuestas 304
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -54,6 +57,26 @@ MIDDLEWARE = [
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
 
+# Compresión de respuestas: tamaño mínimo (bytes) y calidad brotli (0-11)
+COMPRESSION_MIN_BYTES = int(os.environ.get('COMPRESSION_MIN_BYTES', '1024'))
+BROTLI_QUALITY = int(os.environ.get('BROTLI_QUALITY', '5'))
+# Prefijos de rutas que nunca se comprimen: sus respuestas llevan secretos (JWT)
+# junto a datos enviados por el cliente, y brotli no tiene relleno contra BREACH
+COMPRESSION_EXCLUDE_PATHS = tuple(
+    ruta for ruta in os.environ.get('COMPRESSION_EXCLUDE_PATHS', '/api/auth/').split(',') if ruta
+)
+
+# Perfilado por request (opcional): Server-Timing, log de requests lentos,
+# histograma en /api/admin/profiling/ y muestreo de pilas cada N requests
+PROFILING_ENABLED = os.environ.get('PROFILING_ENABLED', 'False') == 'True'
+PROFILING_SLOW_MS = float(os.environ.get('PROFILING_SLOW_MS', '500'))
+PROFILING_SAMPLE_EVERY = int(os.environ.get('PROFILING_SAMPLE_EVERY', '0'))  # 0 = sin muestreo
+PROFILING_SAMPLE_INTERVAL = float(os.environ.get('PROFILING_SAMPLE_INTERVAL', '0.005'))
+PROFILING_DIR = os.environ.get('PROFILING_DIR', str(BASE_DIR / 'profiles'))
+
+if PROFILING_ENABLED:
+    MIDDLEWARE.insert(0, 'inspections.middleware.ProfilingMiddleware')
+
 ROOT_URLCONF = 'config.urls'
 
 TEMPLATES = [
@@ -74,28 +97,59 @@ TEMPLATES = [
 
 WSGI_APPLICATION = 'config.wsgi.application'
 
+# Bajo ASGI (config/asgi.py fija DJANGO_ASGI) las lecturas más usadas se
+# atienden con vistas async (inspections/views_async.py)
+ASGI = os.environ.get('DJANGO_ASGI', 'False') == 'True'
+ASYNC_READ_VIEWS = os.environ.get('ASYNC_READ_VIEWS', str(ASGI)) == 'True'
+
 
 # Database
 # https://docs.djangoproject.com/en/4.2/ref/settings/#databases
 
+# Conexiones (Django 4.2 no trae pool propio; ver config/despliegue.py):
+# - persistent: cada hilo reutiliza su conexión hasta DB_CONN_MAX_AGE segundos
+# - pgbouncer:  igual, detrás de PgBouncer en modo transaction (sin cursores
+#               del lado del servidor, que no sobreviven entre transacciones)
+# - none:       una conexión nueva por request
+DB_POOL_MODE = os.environ.get('DB_POOL_MODE', 'persistent')
+# Bajo ASGI el código síncrono de cada request corre en su propio hilo y las
+# conexiones persistentes no se reutilizan: por defecto se cierran al terminar
+DB_CONN_MAX_AGE = 0 if DB_POOL_MODE == 'none' else int(
+    os.environ.get('DB_CONN_MAX_AGE', '0' if ASGI else '600')
+)
+# max_connections del servidor (o default_pool_size de PgBouncer); 0 = no validar
+DB_MAX_CONNECTIONS = int(os.environ.get('DB_MAX_CONNECTIONS', '0'))
+# Instancias del servicio que comparten la base de datos
+DB_INSTANCES = int(os.environ.get('DB_INSTANCES', '1'))
+
 if os.environ.get('DATABASE_URL'):
     # Production: Use PostgreSQL from Railway/Render
     DATABASES = {
         'default': dj_database_url.config(
             default=os.environ.get('DATABASE_URL'),
-            conn_max_age=600,
+            conn_max_age=DB_CONN_MAX_AGE,
             conn_health_checks=True,
         )
     }
+    if DB_POOL_MODE == 'pgbouncer':
+        DATABASES['default']['DISABLE_SERVER_SIDE_CURSORS'] = True
 else:
     # Development: Use SQLite
     DATABASES = {
         'default': {
             'ENGINE': 'django.db.backends.sqlite3',
             'NAME': BASE_DIR / 'db.sqlite3',
+            'CONN_MAX_AGE': DB_CONN_MAX_AGE,
+            'OPTIONS': {
+                # Segundos que una escritura espera el lock antes de "database is locked"
+                'timeout': float(os.environ.get('SQLITE_BUSY_TIMEOUT', '20')),
+            },
         }
     }
 
+# Journal WAL en SQLite: lecturas concurrentes con una escritura en curso
+SQLITE_WAL = os.environ.get('SQLITE_WAL', 'True') == 'True'
+
 
 # Password validation
 # https://docs.djangoproject.com/en/4.2/ref/settings/#auth-password-validators
@@ -147,6 +201,8 @@ STORAGES = {
 # Media files (Uploads)
 MEDIA_URL = 'media/'
 MEDIA_ROOT = BASE_DIR / 'media'
+# Sirve /media/ desde Django también con DEBUG=False (logos y favicons de temas)
+SERVE_MEDIA = os.environ.get('SERVE_MEDIA', 'False') == 'True'
 
 # Default primary key field type
 # https://docs.djangoproject.com/en/4.2/ref/settings/#default-auto-field
@@ -154,16 +210,40 @@ MEDIA_ROOT = BASE_DIR / 'media'
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 
+# Cache (memoria local por proceso; suficiente para los reportes cacheados)
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'proyecto-usda',
+    }
+}
+
+# Filas de datos que procesa POST /api/muestreo/importar/ por archivo
+IMPORTACION_MAX_FILAS = int(os.environ.get('IMPORTACION_MAX_FILAS', '10000'))
+
+# Segundos que se cachean las respuestas de /api/admin/analytics/
+ANALYTICS_CACHE_TTL = int(os.environ.get('ANALYTICS_CACHE_TTL', '300'))
+
+# Segundos que se reutiliza el snapshot en memoria de suscripciones (inspections.suscripciones)
+SUBSCRIPTION_CACHE_TTL = int(os.environ.get('SUBSCRIPTION_CACHE_TTL', '60'))
+
+# Segundos que se cachea el tema serializado (la clave incluye la versión del tema)
+THEME_CACHE_TTL = int(os.environ.get('THEME_CACHE_TTL', '86400'))
+
+
 # REST Framework Configuration
 REST_FRAMEWORK = {
+    # Misma salida que JSONRenderer/JSONParser usando orjson si está instalado
+    # (salvo la notación de floats exponenciales, ver inspections.renderers)
     'DEFAULT_RENDERER_CLASSES': [
-        'rest_framework.renderers.JSONRenderer',
+        'inspections.renderers.ORJSONRenderer',
     ],
     'DEFAULT_PARSER_CLASSES': [
-        'rest_framework.parsers.JSONParser',
+        'inspections.renderers.ORJSONParser',
     ],
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        # JWTAuthentication que carga perfil y establecimiento en la misma consulta
+        'inspections.authentication.PrincipalJWTAuthentication',
         'rest_framework.authentication.SessionAuthentication',
     ],
 }
@@ -176,10 +256,16 @@ SIMPLE_JWT = {
     'REFRESH_TOKEN_LIFETIME': timedelta(days=7),
     'ROTATE_REFRESH_TOKENS': True,
     'BLACKLIST_AFTER_ROTATION': True,
-    'UPDATE_LAST_LOGIN': True,
+    # last_login se registra según LAST_LOGIN_MODE (inspections.ultimo_acceso)
+    'UPDATE_LAST_LOGIN': False,
     'AUTH_HEADER_TYPES': ('Bearer',),
 }
 
+# Registro de last_login al iniciar sesión: always | throttle | buffered | off
+LAST_LOGIN_MODE = os.environ.get('LAST_LOGIN_MODE', 'throttle')
+LAST_LOGIN_THROTTLE_MINUTES = int(os.environ.get('LAST_LOGIN_THROTTLE_MINUTES', '15'))
+LAST_LOGIN_FLUSH_SECONDS = float(os.environ.get('LAST_LOGIN_FLUSH_SECONDS', '30'))
+
 # CORS Configuration
 CORS_ALLOWED_ORIGINS = os.environ.get(
     'CORS_ALLOWED_ORIGINS',
@@ -187,3 +273,6 @@ CORS_ALLOWED_ORIGINS = os.environ.get(
 ).split(',')
 
 CORS_ALLOW_CREDENTIALS = True
+
+# Idempotency-Key: reintentos seguros de POST /api/muestreo/generar/
+CORS_ALLOW_HEADERS = (*default_headers, 'idempotency-key')
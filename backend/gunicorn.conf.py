@@ -0,0 +1,18 @@
+"""
+Configuración de gunicorn (ver config/despliegue.py para las variables):
+
+    gunicorn -c gunicorn.conf.py config.wsgi
+"""
+import os
+
+from config.despliegue import perfil_gunicorn
+
+bind = f"0.0.0.0:{os.environ.get('PORT', '8000')}"
+globals().update(perfil_gunicorn())
+
+# Sin preload: cada worker abre sus propias conexiones después del fork
+preload_app = False
+graceful_timeout = 30
+accesslog = None
+errorlog = '-'
+
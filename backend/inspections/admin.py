@@ -1,5 +1,12 @@
 from django.contrib import admin
-from .models import Establishment, Inspection, SamplingResult, EstablishmentTheme, UserProfile
+from .models import (
+    Establishment,
+    Inspection,
+    SamplingResult,
+    InspectionDailySummary,
+    EstablishmentTheme,
+    UserProfile
+)
 
 
 @admin.register(Establishment)
@@ -43,10 +50,19 @@ class SamplingResultAdmin(admin.ModelAdmin):
     readonly_fields = ['created_at']
 
 
+@admin.register(InspectionDailySummary)
+class InspectionDailySummaryAdmin(admin.ModelAdmin):
+    list_display = ['fecha', 'establishment', 'especie', 'tipo_tabla', 'cantidad_inspecciones', 'total_cajas', 'total_cajas_muestreadas']
+    list_filter = ['especie', 'tipo_tabla', 'fecha']
+    date_hierarchy = 'fecha'
+    readonly_fields = ['updated_at']
+
+
 @admin.register(EstablishmentTheme)
 class EstablishmentThemeAdmin(admin.ModelAdmin):
-    list_display = ['establishment', 'primary_color', 'show_logo', 'dark_mode']
+    list_display = ['establishment', 'primary_color', 'show_logo', 'dark_mode', 'version']
     search_fields = ['establishment__planta_fruticola', 'establishment__exportadora']
+    readonly_fields = ['version']
     
     fieldsets = (
         ('Establecimiento', {
@@ -62,7 +78,7 @@ class EstablishmentThemeAdmin(admin.ModelAdmin):
             'fields': ('company_name', 'welcome_message', 'footer_text')
         }),
         ('Configuración', {
-            'fields': ('dark_mode',)
+            'fields': ('dark_mode', 'version')
         }),
     )
 
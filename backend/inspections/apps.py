@@ -1,7 +1,16 @@
 from django.apps import AppConfig
+from django.db.backends.signals import connection_created
 
 
 class InspectionsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'inspections'
     verbose_name = 'Sistema de Inspecciones SAG-USDA'
+
+    def ready(self):
+        from . import checks  # noqa: F401 - registra los system checks
+        from . import resumen_diario
+        from .conexiones import al_crear_conexion
+
+        connection_created.connect(al_crear_conexion, dispatch_uid='inspections.conexiones')
+        resumen_diario.conectar()
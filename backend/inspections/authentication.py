@@ -0,0 +1,112 @@
+"""
+Autenticación y principal del usuario autenticado.
+
+El rol y el establecimiento de un usuario salen de relaciones inversas
+(`user.profile`, `user.establishment_admin`) y cada `hasattr` sobre una
+relación inversa inexistente repite la consulta. `obtener_principal` las
+resuelve una sola vez por instancia de usuario (un SELECT con JOINs) y
+permisos, vistas y serializers comparten el resultado.
+"""
+from django.contrib.auth.models import User
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.utils import get_md5_hash_password
+
+RELACIONES = ('profile__establishment', 'establishment_admin')
+_RELACIONES_USUARIO = ('profile', 'establishment_admin')
+
+
+class Principal:
+    """Usuario autenticado con su perfil y establecimiento ya resueltos."""
+
+    __slots__ = ('user', 'profile', 'establishment_admin', 'establishment')
+
+    def __init__(self, user, profile, establishment_admin):
+        self.user = user
+        self.profile = profile
+        self.establishment_admin = establishment_admin
+        # Primero como admin, luego el asignado en el perfil
+        self.establishment = establishment_admin or (profile.establishment if profile else None)
+
+    @property
+    def role(self):
+        return self.profile.role if self.profile else None
+
+    @property
+    def establishment_id(self):
+        return self.establishment.id if self.establishment else None
+
+    def is_superadmin(self):
+        return bool(self.profile and self.profile.is_superadmin())
+
+    def is_establishment_admin(self):
+        return bool(self.profile and self.profile.is_establishment_admin())
+
+
+def cargar_relaciones(user):
+    """
+    Deja cacheadas en `user` las relaciones de RELACIONES (también su
+    ausencia), con una consulta solo si no venían de un select_related.
+    """
+    campos = [User._meta.get_field(nombre) for nombre in _RELACIONES_USUARIO]
+    if all(campo.is_cached(user) for campo in campos):
+        return user
+
+    cargado = User.objects.select_related(*RELACIONES).get(pk=user.pk)
+    for campo in campos:
+        campo.set_cached_value(user, campo.get_cached_value(cargado, default=None))
+    return user
+
+
+def obtener_principal(user):
+    """
+    Principal de `user`, calculado una vez por instancia.
+
+    Returns:
+        Principal o None si el usuario no está autenticado
+    """
+    if user is None or not user.is_authenticated:
+        return None
+    principal = getattr(user, '_principal', None)
+    if principal is None:
+        cargar_relaciones(user)
+        principal = Principal(
+            user,
+            getattr(user, 'profile', None),
+            getattr(user, 'establishment_admin', None)
+        )
+        user._principal = principal
+    return principal
+
+
+class PrincipalJWTAuthentication(JWTAuthentication):
+    """
+    JWTAuthentication que carga el usuario con perfil y establecimientos en
+    la misma consulta, para que `obtener_principal` no consulte de nuevo.
+    """
+
+    def get_user(self, validated_token):
+        try:
+            user_id = validated_token[api_settings.USER_ID_CLAIM]
+        except KeyError:
+            raise InvalidToken(_('Token contained no recognizable user identification'))
+
+        try:
+            user = self.user_model.objects.select_related(*RELACIONES).get(
+                **{api_settings.USER_ID_FIELD: user_id}
+            )
+        except self.user_model.DoesNotExist:
+            raise AuthenticationFailed(_('User not found'), code='user_not_found')
+
+        if not user.is_active:
+            raise AuthenticationFailed(_('User is inactive'), code='user_inactive')
+
+        if api_settings.CHECK_REVOKE_TOKEN:
+            if validated_token.get(api_settings.REVOKE_TOKEN_CLAIM) != get_md5_hash_password(user.password):
+                raise AuthenticationFailed(
+                    _("The user's password has been changed."), code='password_changed'
+                )
+
+        return user
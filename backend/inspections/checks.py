@@ -0,0 +1,69 @@
+"""
+System checks de la configuración de despliegue.
+
+Corren con `manage.py check` y al iniciar `migrate`/`runserver`; el comando de
+inicio en producción ejecuta `migrate` antes de gunicorn, así que una
+configuración inválida detiene el despliegue en vez de fallar en runtime.
+"""
+from django.conf import settings
+from django.core.checks import Error, Warning, register
+from django.db import connections
+
+from config.despliegue import conexiones_por_instancia, perfil_gunicorn
+
+from .ultimo_acceso import MODOS as MODOS_ULTIMO_ACCESO
+
+MODOS_POOL = ('persistent', 'pgbouncer', 'none')
+
+
+@register('despliegue')
+def revisar_despliegue(app_configs, **kwargs):
+    errores = []
+
+    try:
+        perfil = perfil_gunicorn()
+    except ValueError as e:
+        errores.append(Error(str(e), id='inspections.E001'))
+        perfil = None
+
+    if settings.DB_POOL_MODE not in MODOS_POOL:
+        errores.append(Error(
+            f'DB_POOL_MODE inválido: {settings.DB_POOL_MODE!r}',
+            hint=f'Opciones: {", ".join(MODOS_POOL)}',
+            id='inspections.E002',
+        ))
+
+    if settings.LAST_LOGIN_MODE not in MODOS_ULTIMO_ACCESO:
+        errores.append(Error(
+            f'LAST_LOGIN_MODE inválido: {settings.LAST_LOGIN_MODE!r}',
+            hint=f'Opciones: {", ".join(MODOS_ULTIMO_ACCESO)}',
+            id='inspections.E003',
+        ))
+
+    base = connections.settings['default']
+    if base['ENGINE'].endswith('postgresql'):
+        if settings.DB_POOL_MODE == 'pgbouncer' and not base.get('DISABLE_SERVER_SIDE_CURSORS'):
+            errores.append(Error(
+                'DB_POOL_MODE=pgbouncer requiere DISABLE_SERVER_SIDE_CURSORS=True',
+                hint='Con pooling en modo transaction los cursores de .iterator() fallan',
+                id='inspections.E004',
+            ))
+        if base['CONN_MAX_AGE'] and not base['CONN_HEALTH_CHECKS']:
+            errores.append(Warning(
+                'Conexiones persistentes sin CONN_HEALTH_CHECKS',
+                hint='Una conexión cortada por el servidor falla en el primer request que la usa',
+                id='inspections.W001',
+            ))
+
+    if perfil is not None and settings.DB_MAX_CONNECTIONS:
+        necesarias = conexiones_por_instancia(perfil) * settings.DB_INSTANCES
+        if necesarias > settings.DB_MAX_CONNECTIONS:
+            errores.append(Warning(
+                f'{settings.DB_INSTANCES} instancia(s) × {perfil["workers"]} workers × '
+                f'{perfil["threads"]} hilos = {necesarias} conexiones, más que '
+                f'DB_MAX_CONNECTIONS={settings.DB_MAX_CONNECTIONS}',
+                hint='Reduce WEB_CONCURRENCY o GUNICORN_THREADS, o usa DB_POOL_MODE=pgbouncer',
+                id='inspections.W002',
+            ))
+
+    return errores
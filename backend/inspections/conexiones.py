@@ -0,0 +1,45 @@
+"""
+Ajustes y métricas de las conexiones a la base de datos.
+
+`al_crear_conexion` se conecta a la señal `connection_created` (ver
+InspectionsConfig.ready): en SQLite activa el journal WAL, para que los
+requests de lectura no esperen a una escritura en curso, y en todos los
+motores cuenta las conexiones abiertas por el proceso. Con conexiones
+persistentes el contador debería quedarse cerca de workers × hilos;
+si crece con cada request, las conexiones no se están reutilizando.
+"""
+import threading
+
+from django.conf import settings
+
+
+class ContadorConexiones:
+    """Conexiones abiertas por alias de base de datos en este proceso."""
+
+    def __init__(self):
+        self._abiertas = {}
+        self._lock = threading.Lock()
+
+    def registrar(self, alias):
+        with self._lock:
+            self._abiertas[alias] = self._abiertas.get(alias, 0) + 1
+
+    def snapshot(self):
+        with self._lock:
+            return dict(self._abiertas)
+
+    def reiniciar(self):
+        with self._lock:
+            self._abiertas.clear()
+
+
+contador = ContadorConexiones()
+
+
+def al_crear_conexion(sender, connection, **kwargs):
+    contador.registrar(connection.alias)
+    if connection.vendor == 'sqlite' and settings.SQLITE_WAL and not connection.is_in_memory_db():
+        with connection.cursor() as cursor:
+            # WAL queda guardado en el archivo; synchronous=NORMAL es seguro con WAL
+            cursor.execute('PRAGMA journal_mode=WAL')
+            cursor.execute('PRAGMA synchronous=NORMAL')
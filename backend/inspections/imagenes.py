@@ -0,0 +1,158 @@
+"""
+Pipeline de imágenes de temas y avatares.
+
+Al subir un logo, favicon o avatar se generan versiones redimensionadas
+(WebP y PNG en anchos estándar; el favicon además en ICO multi-tamaño) sin
+metadatos EXIF/ICC. Los nombres se derivan del hash del contenido original,
+por lo que regenerar es idempotente y las URLs se pueden cachear como
+inmutables.
+
+Estructura guardada en el campo `renditions` del modelo:
+
+    {
+        'logo': {'webp': {'128': 'renditions/<hash>/logo-128.webp', ...},
+                 'png': {'128': '...', ...}},
+        'favicon': {'ico': '...', 'png': {'180': '...', '192': '...'}},
+    }
+"""
+import hashlib
+import logging
+from io import BytesIO
+
+from django.core.files.base import ContentFile
+from PIL import Image, ImageOps
+
+logger = logging.getLogger(__name__)
+
+# Anchos (px) generados por campo
+ANCHOS = {
+    'logo': (128, 256, 512),
+    'logo_dark': (128, 256, 512),
+    'avatar': (64, 128, 256),
+    'favicon': (180, 192),
+}
+TAMANOS_ICO = [(16, 16), (32, 32), (48, 48)]
+
+CALIDAD_WEBP = 80
+DIRECTORIO = 'renditions'
+
+
+def _leer(archivo):
+    """Contenido completo del archivo, dejando el puntero al inicio."""
+    archivo.open('rb')
+    archivo.seek(0)
+    contenido = archivo.read()
+    archivo.seek(0)
+    return contenido
+
+
+def _normalizar(imagen):
+    """Aplica la orientación EXIF y deja la imagen en RGB o RGBA."""
+    imagen = ImageOps.exif_transpose(imagen)
+    if imagen.mode not in ('RGB', 'RGBA'):
+        transparente = 'A' in imagen.getbands() or 'transparency' in imagen.info
+        imagen = imagen.convert('RGBA' if transparente else 'RGB')
+    return imagen
+
+
+def _redimensionar(imagen, ancho):
+    """Escala a `ancho` manteniendo proporción (nunca agranda)."""
+    if imagen.width > ancho:
+        alto = max(1, round(imagen.height * ancho / imagen.width))
+        imagen = imagen.resize((ancho, alto), Image.Resampling.LANCZOS)
+    else:
+        imagen = imagen.copy()
+    # Sin EXIF, ICC ni textos: solo píxeles
+    imagen.info = {}
+    return imagen
+
+
+def _codificar(imagen, formato):
+    buffer = BytesIO()
+    if formato == 'webp':
+        imagen.save(buffer, 'WEBP', quality=CALIDAD_WEBP, method=6)
+    elif formato == 'png':
+        imagen.save(buffer, 'PNG', optimize=True)
+    else:
+        imagen.save(buffer, 'ICO', sizes=TAMANOS_ICO)
+    return buffer.getvalue()
+
+
+def _guardar(storage, nombre, contenido):
+    """Guarda si no existe: el nombre ya identifica el contenido."""
+    if not storage.exists(nombre):
+        storage.save(nombre, ContentFile(contenido))
+    return nombre
+
+
+def generar_renditions(archivo, campo):
+    """
+    Genera las versiones de una imagen y las guarda en su storage.
+
+    Args:
+        archivo: FieldFile o archivo subido (con `.storage` del campo)
+        campo (str): Nombre del campo ('logo', 'logo_dark', 'favicon', 'avatar')
+
+    Returns:
+        dict: Nombres en el storage por formato y ancho, o {} si no es una imagen válida
+    """
+    contenido = _leer(archivo)
+    try:
+        with Image.open(BytesIO(contenido)) as original:
+            imagen = _normalizar(original)
+    except (OSError, Image.DecompressionBombError) as e:
+        logger.warning('No se pudieron generar versiones de %s: %s', archivo.name, e)
+        return {}
+
+    storage = archivo.storage
+    base = f'{DIRECTORIO}/{hashlib.sha256(contenido).hexdigest()[:20]}/{campo}'
+    renditions = {}
+
+    formatos = ('png',) if campo == 'favicon' else ('webp', 'png')
+    for formato in formatos:
+        renditions[formato] = {
+            str(ancho): _guardar(
+                storage,
+                f'{base}-{ancho}.{formato}',
+                _codificar(_redimensionar(imagen, ancho), formato)
+            )
+            for ancho in ANCHOS[campo]
+        }
+
+    if campo == 'favicon':
+        lado = max(tamano[0] for tamano in TAMANOS_ICO)
+        # Cuadrada con relleno transparente (o negro si no hay canal alfa)
+        cuadrada = ImageOps.pad(imagen, (lado, lado), method=Image.Resampling.LANCZOS)
+        cuadrada.info = {}
+        renditions['ico'] = _guardar(storage, f'{base}.ico', _codificar(cuadrada, 'ico'))
+
+    return renditions
+
+
+def actualizar_renditions(instancia, campos):
+    """
+    Regenera `instancia.renditions` para las imágenes recién subidas de
+    `campos` y quita las de imágenes eliminadas. No guarda la instancia.
+    """
+    renditions = dict(instancia.renditions or {})
+    for campo in campos:
+        archivo = getattr(instancia, campo)
+        if not archivo:
+            renditions.pop(campo, None)
+        elif not archivo._committed:
+            renditions[campo] = generar_renditions(archivo, campo)
+    instancia.renditions = renditions
+
+
+def mapear_renditions(renditions, fn):
+    """
+    Aplica `fn` a cada nombre (o URL) de `renditions` conservando la estructura,
+    p. ej. `mapear_renditions(r, default_storage.url)`.
+    """
+    return {
+        campo: {
+            formato: fn(valor) if isinstance(valor, str) else {ancho: fn(n) for ancho, n in valor.items()}
+            for formato, valor in formatos.items()
+        }
+        for campo, formatos in (renditions or {}).items()
+    }
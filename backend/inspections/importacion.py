@@ -0,0 +1,425 @@
+"""
+Importación masiva de lotes desde CSV o Excel (POST /api/muestreo/importar/).
+
+Los exportadores ya tienen sus manifiestos de lotes en planillas. Cada fila se
+valida con las mismas reglas que POST /api/muestreo/generar/
+(GenerarMuestreoSerializer y validate_stage_sampling), se calcula su muestreo
+y las filas válidas se guardan por bloques con bulk_create.
+
+Los archivos se leen fila a fila: el CSV línea a línea y el XLSX (un ZIP de
+XML) con iterparse, liberando cada fila ya procesada. Solo la tabla de textos
+compartidos del XLSX queda en memoria, como en cualquier lector de Excel.
+"""
+import codecs
+import csv
+import itertools
+import json
+import re
+import unicodedata
+import zipfile
+import xml.etree.ElementTree as ET
+from posixpath import dirname, join, normpath
+
+from django.db import transaction
+from rest_framework.exceptions import ValidationError
+
+from .models import Inspection, InspectionDailySummary, SamplingResult
+from .serializers import GenerarMuestreoSerializer
+from .utils import generar_muestreo_inspeccion, permite_incremento_intensidad, validate_stage_sampling
+
+# Nombre de columna normalizado (ver _normalizar) → campo de GenerarMuestreoSerializer
+COLUMNAS = {
+    'numero_lote': 'numero_lote',
+    'lote': 'numero_lote',
+    'n_lote': 'numero_lote',
+    'nro_lote': 'numero_lote',
+    'especie': 'especie',
+    'tamano_lote': 'tamano_lote',
+    'tamano': 'tamano_lote',
+    'tamano_del_lote': 'tamano_lote',
+    'total_cajas': 'tamano_lote',
+    'cantidad_pallets': 'cantidad_pallets',
+    'pallets': 'cantidad_pallets',
+    'n_pallets': 'cantidad_pallets',
+    'nro_pallets': 'cantidad_pallets',
+    'boxes_per_pallet': 'boxes_per_pallet',
+    'cajas_por_pallet': 'boxes_per_pallet',
+    'tipo_muestreo': 'tipo_muestreo',
+    'muestreo': 'tipo_muestreo',
+    'incremento_intensidad': 'incremento_intensidad',
+    'incremento': 'incremento_intensidad',
+    'exportador': 'exportador',
+    'exportadora': 'exportador',
+    'establecimiento_nombre': 'establecimiento_nombre',
+    'establecimiento': 'establecimiento_nombre',
+    'planta': 'establecimiento_nombre',
+    'inspector_sag': 'inspector_sag',
+    'contraparte_sag': 'contraparte_sag',
+    'tipo_despacho': 'tipo_despacho',
+    'despacho': 'tipo_despacho',
+}
+
+# Campos que se pueden enviar una vez en el formulario y aplican a todas las filas
+CAMPOS_COMUNES = (
+    'exportador', 'establecimiento_nombre', 'inspector_sag', 'contraparte_sag',
+    'tipo_despacho', 'especie', 'tipo_muestreo', 'incremento_intensidad',
+)
+
+# Filas válidas que se guardan por transacción
+TAMANO_BLOQUE = 500
+# Errores de fila incluidos en la respuesta (el total se informa aparte)
+MAX_ERRORES_REPORTADOS = 1000
+# Filas de una hoja de Excel: un atributo r="..." mayor es un archivo dañado
+MAX_FILAS_XLSX = 1048576
+# Columnas de una hoja de Excel (A..XFD): una referencia mayor es un archivo dañado
+MAX_COLUMNAS_XLSX = 16384
+
+_NS = '{http://schemas.openxmlformats.org/spreadsheetml/2006/main}'
+_NS_REL = '{http://schemas.openxmlformats.org/officeDocument/2006/relationships}'
+_NS_PKG = '{http://schemas.openxmlformats.org/package/2006/relationships}'
+
+
+class ArchivoInvalido(Exception):
+    """El archivo no se puede leer como planilla de lotes."""
+
+
+def _normalizar(nombre):
+    """'Tamaño del Lote ' → 'tamano_del_lote'"""
+    sin_tildes = unicodedata.normalize('NFKD', nombre).encode('ascii', 'ignore').decode()
+    return re.sub(r'[^a-z0-9]+', '_', sin_tildes.lower()).strip('_')
+
+
+def _decodificar(lineas):
+    # Excel en español guarda los CSV en Windows-1252; se decide por línea
+    for linea in lineas:
+        try:
+            yield linea.decode('utf-8')
+        except UnicodeDecodeError:
+            yield linea.decode('cp1252', errors='replace')
+
+
+def leer_csv(archivo):
+    """Filas (listas de textos) de un CSV separado por coma o punto y coma."""
+    lineas = _decodificar(archivo)
+    primera = next(lineas, '').lstrip(codecs.BOM_UTF8.decode())
+    delimitador = ';' if primera.count(';') > primera.count(',') else ','
+    return csv.reader(itertools.chain([primera], lineas), delimiter=delimitador)
+
+
+def _columna(referencia):
+    """
+    'AB12' → 27 (índice desde 0)
+
+    Raises:
+        ArchivoInvalido: si la columna está más allá de XFD
+    """
+    indice = 0
+    for letra in referencia:
+        if not letra.isalpha():
+            break
+        indice = indice * 26 + ord(letra.upper()) - 64
+        if indice > MAX_COLUMNAS_XLSX:
+            raise ArchivoInvalido(f'Referencia de celda inválida en la hoja de Excel: {referencia[:20]}')
+    return indice - 1
+
+
+def _textos_compartidos(libro):
+    if 'xl/sharedStrings.xml' not in libro.namelist():
+        return []
+    textos = []
+    with libro.open('xl/sharedStrings.xml') as xml:
+        for _, elemento in ET.iterparse(xml):
+            if elemento.tag == f'{_NS}si':
+                # <t> directo, o varios <r><t> si el texto tiene formato; la
+                # guía fonética (<rPh>) no es parte del valor
+                partes = [elemento.find(f'{_NS}t')] + [r.find(f'{_NS}t') for r in elemento.findall(f'{_NS}r')]
+                textos.append(''.join(t.text or '' for t in partes if t is not None))
+                elemento.clear()
+    return textos
+
+
+def _primera_hoja(libro):
+    """Ruta dentro del ZIP de la primera hoja del libro."""
+    try:
+        workbook = ET.fromstring(libro.read('xl/workbook.xml'))
+        relaciones = ET.fromstring(libro.read('xl/_rels/workbook.xml.rels'))
+    except KeyError:
+        raise ArchivoInvalido('El archivo no es un libro de Excel (.xlsx)')
+    hoja = workbook.find(f'{_NS}sheets/{_NS}sheet')
+    if hoja is None:
+        raise ArchivoInvalido('El libro de Excel no tiene hojas')
+    destino = next((
+        r.get('Target') for r in relaciones.iter(f'{_NS_PKG}Relationship')
+        if r.get('Id') == hoja.get(f'{_NS_REL}id')
+    ), None)
+    if destino is None:
+        raise ArchivoInvalido('No se encontró la primera hoja del libro de Excel')
+    return destino.lstrip('/') if destino.startswith('/') else normpath(join(dirname('xl/workbook.xml'), destino))
+
+
+def _valor_celda(celda, textos):
+    tipo = celda.get('t')
+    if tipo == 'inlineStr':
+        return ''.join(t.text or '' for t in celda.iter(f'{_NS}t'))
+    valor = celda.find(f'{_NS}v')
+    if valor is None or valor.text is None:
+        return ''
+    if tipo == 's':
+        try:
+            return textos[int(valor.text)]
+        except (ValueError, IndexError):
+            raise ArchivoInvalido(f'Texto compartido inválido en la celda {celda.get("r", "?")}')
+    if tipo in (None, 'n') and valor.text.endswith('.0'):
+        # Excel guarda los enteros de algunas celdas como "120.0"
+        return valor.text[:-2]
+    return valor.text
+
+
+def leer_xlsx(archivo):
+    """Filas (listas de textos) de la primera hoja de un XLSX."""
+    try:
+        libro = zipfile.ZipFile(archivo)
+    except zipfile.BadZipFile:
+        raise ArchivoInvalido('El archivo no es un libro de Excel (.xlsx)')
+    return _filas_xlsx(libro)
+
+
+def _filas_xlsx(libro):
+    textos = _textos_compartidos(libro)
+    with libro, libro.open(_primera_hoja(libro)) as xml:
+        contenedor = None
+        siguiente = 1
+        for evento, elemento in ET.iterparse(xml, events=('start', 'end')):
+            if evento == 'start':
+                if elemento.tag == f'{_NS}sheetData':
+                    contenedor = elemento
+                continue
+            if elemento.tag != f'{_NS}row':
+                continue
+
+            # Las filas vacías no aparecen en el XML: se rellenan para que
+            # el número de fila coincida con el que muestra Excel
+            try:
+                numero = int(elemento.get('r', siguiente))
+            except ValueError:
+                numero = 0
+            if not siguiente <= numero <= MAX_FILAS_XLSX:
+                raise ArchivoInvalido(f'Número de fila inválido en la hoja de Excel: {elemento.get("r")}')
+            for _ in range(siguiente, numero):
+                yield []
+            siguiente = numero + 1
+
+            fila = []
+            for celda in elemento.iter(f'{_NS}c'):
+                indice = _columna(celda.get('r')) if celda.get('r') else len(fila)
+                fila.extend([''] * (indice - len(fila)))
+                fila.append(_valor_celda(celda, textos))
+            yield fila
+            # Libera las filas ya leídas
+            contenedor.clear()
+
+
+def leer_filas(archivo):
+    """
+    Filas de una planilla CSV o XLSX según su extensión (o contenido).
+
+    Raises:
+        ArchivoInvalido: si el formato no es CSV ni XLSX
+    """
+    nombre = (getattr(archivo, 'name', '') or '').lower()
+    if nombre.endswith('.xls'):
+        raise ArchivoInvalido('Formato .xls no soportado: guarde la planilla como .xlsx o .csv')
+    inicio = archivo.read(4)
+    archivo.seek(0)
+    if nombre.endswith('.xlsx') or inicio == b'PK\x03\x04':
+        return leer_xlsx(archivo)
+    return leer_csv(archivo)
+
+
+def _valores_fila(encabezados, fila):
+    """Dict campo → valor con las celdas no vacías de la fila."""
+    datos = {}
+    for campo, valor in zip(encabezados, fila):
+        valor = valor.strip()
+        if campo is None or not valor:
+            continue
+        if campo == 'boxes_per_pallet':
+            valor = [x for x in re.split(r'[\s,;|/]+', valor) if x]
+        elif campo == 'tipo_muestreo':
+            valor = _normalizar(valor).upper()
+        datos[campo] = valor
+    return datos
+
+
+def _validar_fila(serializer, datos):
+    """Datos validados de la fila, o (None, errores) con los mismos mensajes que generar."""
+    # Sin columna de tipo de muestreo: por etapa si trae cajas por pallet
+    datos.setdefault('tipo_muestreo', 'POR_ETAPA' if datos.get('boxes_per_pallet') else 'NORMAL')
+
+    # Equivale a GenerarMuestreoSerializer(data=datos).is_valid(), reutilizando
+    # los campos ya construidos (construirlos por fila es la mayor parte del costo)
+    try:
+        data = serializer.run_validation(datos)
+    except ValidationError as e:
+        return None, e.detail
+
+    # calcular_muestreo lo rechaza con ValueError: se informa como error de la fila
+    if data.get('incremento_intensidad') and not permite_incremento_intensidad(data['especie']):
+        return None, {'incremento_intensidad': [
+            'No se puede aplicar incremento de intensidad a especies con tabla hipergeométrica'
+        ]}
+
+    if data['tipo_muestreo'] == 'POR_ETAPA':
+        if not data.get('boxes_per_pallet'):
+            return None, {'boxes_per_pallet': ['Debe especificar las cajas por pallet para muestreo por etapa']}
+        es_valido, errores, _ = validate_stage_sampling(
+            total_pallets=data['cantidad_pallets'],
+            boxes_per_pallet=data['boxes_per_pallet'],
+            total_boxes_lot=data['tamano_lote']
+        )
+        if not es_valido:
+            return None, {'muestreo_por_etapa': errores}
+    return data, None
+
+
+def _nueva_inspeccion(data):
+    """Inspección y resultado (sin guardar) con el muestreo ya calculado."""
+    muestreo = generar_muestreo_inspeccion(data)
+    resultado_muestreo = muestreo['resultado_muestreo']
+    inspection = Inspection(
+        exportador=data['exportador'],
+        establecimiento_nombre=data['establecimiento_nombre'],
+        establishment=None,
+        inspector_sag=data['inspector_sag'],
+        contraparte_sag=data['contraparte_sag'],
+        especie=data['especie'],
+        numero_lote=data['numero_lote'],
+        tamano_lote=data['tamano_lote'],
+        tipo_muestreo=data['tipo_muestreo'],
+        tipo_despacho=data['tipo_despacho'],
+        cantidad_pallets=data['cantidad_pallets'],
+        boxes_per_pallet=data.get('boxes_per_pallet', []),
+        selected_pallets=muestreo['selected_pallets']
+    )
+    sampling_result = SamplingResult(
+        tipo_tabla=resultado_muestreo['tipo_tabla'],
+        nombre_tabla=resultado_muestreo['nombre_tabla'],
+        muestra_base=resultado_muestreo.get('muestra_base'),
+        incremento_aplicado=resultado_muestreo.get('incremento_aplicado', 0),
+        muestra_final=resultado_muestreo.get('muestra_final'),
+        tamano_muestra=muestreo['tamano_muestra'],
+        cajas_seleccionadas=json.dumps(muestreo['cajas_seleccionadas'])
+    )
+    return inspection, sampling_result
+
+
+def _guardar_bloque(bloque):
+    """Guarda un bloque de (fila, inspección, resultado) en una transacción."""
+    with transaction.atomic():
+        Inspection.objects.bulk_create([inspection for _, inspection, _ in bloque])
+        for _, inspection, sampling_result in bloque:
+            sampling_result.inspection = inspection
+        SamplingResult.objects.bulk_create([sampling_result for _, _, sampling_result in bloque])
+        InspectionDailySummary.registrar_varios((inspection, sampling_result) for _, inspection, sampling_result in bloque)
+    return [
+        {
+            'fila': fila,
+            'id': inspection.id,
+            'numero_lote': inspection.numero_lote,
+            'tamano_muestra': sampling_result.tamano_muestra,
+        }
+        for fila, inspection, sampling_result in bloque
+    ]
+
+
+def importar_lotes(archivo, comunes=None, solo_validar=False, max_filas=10000):
+    """
+    Crea una inspección con su muestreo por cada fila válida de la planilla.
+
+    La primera fila no vacía son los encabezados (ver COLUMNAS; se aceptan con tildes,
+    mayúsculas y espacios). Las columnas ausentes se toman de `comunes`. Las
+    filas con errores se informan y no detienen la importación; las válidas
+    se guardan en bloques de TAMANO_BLOQUE, cada uno en su transacción.
+
+    Args:
+        archivo: Archivo subido (CSV o XLSX)
+        comunes (dict): Valores para todas las filas (ver CAMPOS_COMUNES)
+        solo_validar (bool): Valida y calcula sin guardar nada
+        max_filas (int): Filas de datos a procesar; las siguientes se ignoran
+
+    Returns:
+        dict: filas, validas, importadas, inspecciones, cantidad_errores,
+              errores, columnas_ignoradas y truncado
+
+    Raises:
+        ArchivoInvalido: si no se puede leer o le faltan columnas obligatorias
+    """
+    comunes = {campo: valor for campo, valor in (comunes or {}).items() if valor not in (None, '')}
+    # Número de fila como lo muestra la planilla; la primera no vacía son los encabezados
+    filas = enumerate(leer_filas(archivo), start=1)
+    try:
+        _, encabezado = next(((n, fila) for n, fila in filas if any(c.strip() for c in fila)), (None, None))
+    except (zipfile.BadZipFile, ET.ParseError, KeyError, csv.Error) as e:
+        raise ArchivoInvalido(f'No se pudo leer el archivo: {e}')
+    if encabezado is None:
+        raise ArchivoInvalido('El archivo está vacío o no tiene fila de encabezados')
+
+    encabezados = [COLUMNAS.get(_normalizar(c)) for c in encabezado]
+    ignoradas = [c for c, campo in zip(encabezado, encabezados) if c.strip() and campo is None]
+    serializer = GenerarMuestreoSerializer()
+    requeridos = [
+        nombre for nombre, campo in serializer.fields.items()
+        if campo.required and nombre != 'tipo_muestreo'
+    ]
+    faltantes = [c for c in requeridos if c not in encabezados and c not in comunes]
+    if faltantes:
+        raise ArchivoInvalido(f'Faltan columnas obligatorias: {", ".join(faltantes)}')
+
+    resultado = {
+        'filas': 0,
+        'validas': 0,
+        'importadas': 0,
+        'inspecciones': [],
+        'cantidad_errores': 0,
+        'errores': [],
+        'columnas_ignoradas': ignoradas,
+        'truncado': False,
+    }
+    bloque = []
+    try:
+        for numero, fila in filas:
+            datos = _valores_fila(encabezados, fila)
+            if not datos:
+                continue
+            if resultado['filas'] >= max_filas:
+                resultado['truncado'] = True
+                break
+            resultado['filas'] += 1
+
+            data, errores = _validar_fila(serializer, {**comunes, **datos})
+            if errores:
+                resultado['cantidad_errores'] += 1
+                if len(resultado['errores']) < MAX_ERRORES_REPORTADOS:
+                    resultado['errores'].append({
+                        'fila': numero,
+                        'numero_lote': datos.get('numero_lote', ''),
+                        'errores': errores,
+                    })
+                continue
+
+            resultado['validas'] += 1
+            if solo_validar:
+                continue
+            bloque.append((numero, *_nueva_inspeccion(data)))
+            if len(bloque) >= TAMANO_BLOQUE:
+                resultado['inspecciones'].extend(_guardar_bloque(bloque))
+                bloque = []
+    except (ArchivoInvalido, ET.ParseError, zipfile.BadZipFile, csv.Error) as e:
+        # Lo ya guardado se mantiene; se informa desde dónde no se pudo leer
+        resultado['cantidad_errores'] += 1
+        resultado['errores'].append({'fila': None, 'numero_lote': '', 'errores': {'archivo': [str(e)]}})
+
+    if bloque:
+        resultado['inspecciones'].extend(_guardar_bloque(bloque))
+    resultado['importadas'] = len(resultado['inspecciones'])
+    return resultado
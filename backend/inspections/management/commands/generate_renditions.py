@@ -0,0 +1,96 @@
+"""
+Management command para generar las versiones redimensionadas de logos,
+favicons y avatares ya subidos (las nuevas se generan al guardar).
+
+Las imágenes se procesan en paralelo con hilos: Pillow libera el GIL al
+decodificar, redimensionar y codificar.
+"""
+import os
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from django.core.management.base import BaseCommand
+from django.db.models import F, Q
+from inspections.imagenes import generar_renditions
+from inspections.models import EstablishmentTheme, UserProfile
+
+MODELOS = {
+    'temas': EstablishmentTheme,
+    'avatares': UserProfile,
+}
+
+
+def _procesar(instancia, campos):
+    """Genera las versiones de los campos con imagen de una instancia."""
+    renditions = dict(instancia.renditions or {})
+    for campo in campos:
+        archivo = getattr(instancia, campo)
+        try:
+            renditions[campo] = generar_renditions(archivo, campo)
+        finally:
+            archivo.close()
+    return renditions
+
+
+class Command(BaseCommand):
+    help = 'Genera versiones WebP/PNG/ICO de las imágenes de temas y avatares existentes'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--modelo', choices=['temas', 'avatares', 'todos'], default='todos',
+                            help='Qué imágenes procesar (default: todos)')
+        parser.add_argument('--workers', type=int, default=min(8, os.cpu_count() or 1),
+                            help='Hilos en paralelo (default: CPUs, máx. 8)')
+        parser.add_argument('--forzar', action='store_true',
+                            help='Regenera también las imágenes que ya tienen versiones')
+
+    def handle(self, *args, **options):
+        modelos = MODELOS.values() if options['modelo'] == 'todos' else [MODELOS[options['modelo']]]
+
+        # (instancia, campos) a procesar; la base de datos solo se toca en este hilo
+        pendientes = []
+        for modelo in modelos:
+            con_imagen = Q()
+            for campo in modelo.IMAGENES:
+                con_imagen |= Q(**{f'{campo}__gt': ''})
+            for instancia in modelo.objects.filter(con_imagen).iterator():
+                campos = [
+                    campo for campo in modelo.IMAGENES
+                    if getattr(instancia, campo) and (options['forzar'] or campo not in instancia.renditions)
+                ]
+                if campos:
+                    pendientes.append((instancia, campos))
+
+        if not pendientes:
+            self.stdout.write('No hay imágenes pendientes')
+            return
+
+        procesadas = 0
+        errores = 0
+        with ThreadPoolExecutor(max_workers=max(1, options['workers'])) as executor:
+            futuros = {
+                executor.submit(_procesar, instancia, campos): instancia
+                for instancia, campos in pendientes
+            }
+            for futuro in as_completed(futuros):
+                instancia = futuros[futuro]
+                try:
+                    renditions = futuro.result()
+                except Exception as e:
+                    errores += 1
+                    self.stderr.write(f'❌ {instancia._meta.model_name} {instancia.pk}: {e}')
+                    continue
+                self._guardar(instancia, renditions)
+                procesadas += 1
+
+        self.stdout.write(
+            self.style.SUCCESS(f'✅ Versiones generadas para {procesadas} registros ({errores} errores)')
+        )
+
+    def _guardar(self, instancia, renditions):
+        """Actualiza sin pasar por save(): no renombra ni regenera archivos."""
+        modelo = type(instancia)
+        if modelo is EstablishmentTheme:
+            # La caché del tema se indexa por versión (tema_cacheado): al
+            # incrementarla en la base de datos todos los workers la descartan
+            modelo.objects.filter(pk=instancia.pk).update(renditions=renditions, version=F('version') + 1)
+        else:
+            modelo.objects.filter(pk=instancia.pk).update(renditions=renditions)
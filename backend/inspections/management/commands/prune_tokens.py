@@ -0,0 +1,127 @@
+"""
+Management command para podar los tokens expirados de token_blacklist.
+
+Con ROTATE_REFRESH_TOKENS y BLACKLIST_AFTER_ROTATION cada refresh agrega
+filas a OutstandingToken y BlacklistedToken. A diferencia de
+`flushexpiredtokens` (un solo DELETE sin límite), borra en lotes acotados
+por el índice de expires_at, con transacciones cortas y una pausa entre
+lotes para no bloquear las tablas. Pensado para ejecutarse periódicamente:
+
+    python manage.py prune_tokens --batch-size 5000 --pausa 0.1
+"""
+import logging
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken, OutstandingToken
+from rest_framework_simplejwt.utils import aware_utcnow
+
+logger = logging.getLogger('inspections.tokens')
+
+TABLAS = (OutstandingToken._meta.db_table, BlacklistedToken._meta.db_table)
+
+
+def metricas_tablas():
+    """Filas (y bytes en PostgreSQL) de las tablas de token_blacklist."""
+    ahora = aware_utcnow()
+    metricas = {
+        'outstanding': OutstandingToken.objects.count(),
+        'outstanding_expirados': OutstandingToken.objects.filter(expires_at__lte=ahora).count(),
+        'blacklisted': BlacklistedToken.objects.count(),
+    }
+    if connection.vendor == 'postgresql':
+        with connection.cursor() as cursor:
+            for tabla in TABLAS:
+                cursor.execute('SELECT pg_total_relation_size(%s)', [tabla])
+                metricas[f'bytes_{tabla}'] = cursor.fetchone()[0]
+    return metricas
+
+
+class Command(BaseCommand):
+    help = 'Elimina en lotes los tokens JWT expirados (OutstandingToken y BlacklistedToken)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=5000,
+                            help='Tokens eliminados por transacción (default: 5000)')
+        parser.add_argument('--pausa', type=float, default=0.1,
+                            help='Segundos de espera entre lotes (default: 0.1)')
+        parser.add_argument('--max-lotes', type=int, default=None,
+                            help='Detiene la poda después de N lotes (default: sin límite)')
+        parser.add_argument('--dry-run', action='store_true',
+                            help='Solo reporta métricas, sin eliminar')
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        if batch_size < 1:
+            raise CommandError('--batch-size debe ser mayor que 0')
+
+        antes = metricas_tablas()
+        self.stdout.write(
+            f"Tokens: {antes['outstanding']} outstanding ({antes['outstanding_expirados']} expirados), "
+            f"{antes['blacklisted']} en blacklist"
+        )
+        if options['dry_run']:
+            logger.info('prune_tokens dry_run %s', _formatear(antes))
+            return
+
+        # Corte fijo: los tokens que expiren durante la poda quedan para la próxima
+        corte = aware_utcnow()
+        eliminados = {'outstanding': 0, 'blacklisted': 0}
+        lotes = 0
+        inicio = time.perf_counter()
+        while options['max_lotes'] is None or lotes < options['max_lotes']:
+            ids = list(
+                OutstandingToken.objects.filter(expires_at__lte=corte)
+                .order_by('expires_at')
+                .values_list('id', flat=True)[:batch_size]
+            )
+            if not ids:
+                break
+            blacklisted, outstanding = _eliminar_lote(ids)
+            eliminados['blacklisted'] += blacklisted
+            eliminados['outstanding'] += outstanding
+            lotes += 1
+            if len(ids) < batch_size:
+                break
+            if options['pausa']:
+                time.sleep(options['pausa'])
+        duracion = time.perf_counter() - inicio
+
+        despues = metricas_tablas()
+        resumen = {
+            'lotes': lotes,
+            'eliminados_outstanding': eliminados['outstanding'],
+            'eliminados_blacklisted': eliminados['blacklisted'],
+            'segundos': round(duracion, 2),
+            **{f'antes_{k}': v for k, v in antes.items()},
+            **{f'despues_{k}': v for k, v in despues.items()},
+        }
+        logger.info('prune_tokens %s', _formatear(resumen))
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"✅ {eliminados['outstanding']} tokens expirados eliminados "
+                f"({eliminados['blacklisted']} en blacklist) en {lotes} lotes, {duracion:.1f} s. "
+                f"Quedan {despues['outstanding']} outstanding y {despues['blacklisted']} en blacklist"
+            )
+        )
+
+
+def _eliminar_lote(ids):
+    """
+    DELETE directo por id: QuerySet.delete() cargaría cada fila (incluido el
+    token completo) en memoria para resolver la cascada a BlacklistedToken.
+    """
+    marcadores = ', '.join(['%s'] * len(ids))
+    outstanding, blacklisted = (connection.ops.quote_name(tabla) for tabla in TABLAS)
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {blacklisted} WHERE token_id IN ({marcadores})', ids)
+        eliminados_blacklisted = cursor.rowcount
+        cursor.execute(f'DELETE FROM {outstanding} WHERE id IN ({marcadores})', ids)
+        return eliminados_blacklisted, cursor.rowcount
+
+
+def _formatear(metricas):
+    """key=value para que el log sea fácil de procesar."""
+    return ' '.join(f'{k}={v}' for k, v in metricas.items())
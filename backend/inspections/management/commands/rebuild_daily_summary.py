@@ -0,0 +1,46 @@
+"""
+Management command para reconstruir el resumen diario de inspecciones.
+Recalcula InspectionDailySummary a partir de Inspection y SamplingResult
+para un rango de fechas (por defecto, todo el historial).
+"""
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+from inspections.models import InspectionDailySummary
+
+
+def _parse_fecha(valor):
+    try:
+        return date.fromisoformat(valor)
+    except ValueError:
+        raise CommandError(f'Fecha inválida: {valor} (formato esperado AAAA-MM-DD)')
+
+
+class Command(BaseCommand):
+    help = 'Reconstruye el resumen diario de inspecciones para un rango de fechas'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--desde', type=_parse_fecha, help='Fecha inicial (AAAA-MM-DD), inclusive')
+        parser.add_argument('--hasta', type=_parse_fecha, help='Fecha final (AAAA-MM-DD), inclusive')
+        parser.add_argument('--batch-size', type=int, default=1000, help='Filas por INSERT (default: 1000)')
+
+    def handle(self, *args, **options):
+        desde = options['desde']
+        hasta = options['hasta']
+        
+        if desde and hasta and desde > hasta:
+            raise CommandError('--desde no puede ser posterior a --hasta')
+        
+        eliminadas, creadas = InspectionDailySummary.reconstruir(
+            desde=desde,
+            hasta=hasta,
+            batch_size=options['batch_size']
+        )
+        
+        rango = f'{desde or "inicio"} → {hasta or "hoy"}'
+        self.stdout.write(
+            self.style.SUCCESS(
+                f'✅ Resumen diario reconstruido ({rango}): '
+                f'{eliminadas} filas eliminadas, {creadas} filas creadas'
+            )
+        )
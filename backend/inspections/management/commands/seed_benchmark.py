@@ -0,0 +1,235 @@
+"""
+Management command para generar datos sintéticos de alto volumen.
+Crea establecimientos, inspecciones y resultados de muestreo con
+distribuciones realistas para pruebas de carga y benchmarks.
+
+Ejemplo:
+    python manage.py seed_benchmark --inspecciones 1000000 --seed 7
+"""
+import json
+import random
+import time
+from datetime import time as dtime, timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.utils import timezone
+
+from inspections.models import Establishment, EstablishmentTheme, Inspection, SamplingResult, InspectionDailySummary
+from inspections.utils import (
+    calcular_muestreo,
+    validate_stage_sampling,
+    select_stage_sampling_pallets,
+    distribute_samples_proportionally,
+    generate_stage_sampling_numbers,
+    permite_incremento_intensidad
+)
+
+PREFIJO_LICENCIA = 'BENCH-'
+
+# (especie, peso relativo en la temporada, cajas por pallet mín., máx.)
+ESPECIES = [
+    ('Cereza', 30, 150, 260),
+    ('Uva de Mesa', 18, 90, 130),
+    ('Arándano', 12, 180, 320),
+    ('Manzana', 10, 48, 60),
+    ('Kiwi', 6, 80, 110),
+    ('Ciruela', 6, 90, 120),
+    ('Nectarino', 5, 90, 120),
+    ('Durazno', 4, 90, 120),
+    ('Pera', 4, 48, 60),
+    ('Mandarina', 3, 60, 80),
+    ('Damasco', 2, 100, 140),
+]
+
+EXPORTADORAS = [
+    'Frutas del Valle', 'Andes Export', 'Pacific Fruit', 'Agrícola Santa Rosa',
+    'Cordillera Fresh', 'Del Maipo', 'Sur Frutícola', 'Valle Central Export',
+]
+
+TIPOS_DESPACHO = [('Marítimo', 80), ('Aéreo', 15), ('Terrestre', 5)]
+
+# Proporción de lotes con muestreo por etapa (solo lotes con ≥ 6 pallets)
+PROPORCION_POR_ETAPA = 0.2
+
+# Incremento de intensidad (%) y su peso, para especies que lo permiten
+INCREMENTOS = [(0, 85), (20, 10), (40, 5)]
+
+
+class Command(BaseCommand):
+    help = 'Genera establecimientos, inspecciones y muestreos sintéticos para benchmarks'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--establecimientos', type=int, default=20, help='Cantidad de establecimientos (default: 20)')
+        parser.add_argument('--inspecciones', type=int, default=10000, help='Cantidad de inspecciones (default: 10000)')
+        parser.add_argument('--dias', type=int, default=120, help='Días de temporada hacia atrás desde hoy (default: 120)')
+        parser.add_argument('--seed', type=int, default=42, help='Semilla para resultados reproducibles (default: 42)')
+        parser.add_argument('--batch-size', type=int, default=5000, help='Inspecciones por lote de INSERT (default: 5000)')
+        parser.add_argument('--limpiar', action='store_true', help='Elimina antes los datos sintéticos existentes')
+
+    def handle(self, *args, **options):
+        if options['establecimientos'] < 1 or options['inspecciones'] < 0 or options['dias'] < 1:
+            raise CommandError('Parámetros inválidos: se requiere al menos 1 establecimiento y 1 día')
+        if not connection.features.can_return_rows_from_bulk_insert:
+            raise CommandError(f'El motor {connection.vendor} no retorna IDs en bulk_create')
+
+        # utils.py usa el generador global de random: sembrarlo hace
+        # reproducibles también las cajas seleccionadas
+        random.seed(options['seed'])
+
+        if options['limpiar']:
+            eliminados, _ = Establishment.objects.filter(license_key__startswith=PREFIJO_LICENCIA).delete()
+            self.stdout.write(f'Eliminados {eliminados} registros sintéticos previos')
+
+        inicio = time.perf_counter()
+        establecimientos = self._crear_establecimientos(options['establecimientos'], options['seed'])
+
+        hoy = timezone.now().date()
+        desde = hoy - timedelta(days=options['dias'] - 1)
+        total = options['inspecciones']
+        batch_size = options['batch_size']
+
+        creadas = 0
+        while creadas < total:
+            n = min(batch_size, total - creadas)
+            self._crear_lote(n, creadas, establecimientos, desde, options['dias'], options['seed'])
+            creadas += n
+            transcurrido = time.perf_counter() - inicio
+            self.stdout.write(f'  {creadas}/{total} inspecciones ({creadas / transcurrido:,.0f}/s)')
+
+        eliminadas, resumenes = InspectionDailySummary.reconstruir(desde=desde, hasta=hoy)
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f'\n✅ {len(establecimientos)} establecimientos y {total} inspecciones en '
+                f'{time.perf_counter() - inicio:.1f}s ({resumenes} filas de resumen diario)'
+            )
+        )
+
+    def _crear_establecimientos(self, cantidad, seed):
+        """Crea (o reutiliza) los establecimientos sintéticos de esta semilla."""
+        hoy = timezone.now().date()
+        establecimientos = []
+        for i in range(cantidad):
+            exportadora = EXPORTADORAS[i % len(EXPORTADORAS)]
+            establecimientos.append(Establishment(
+                exportadora=exportadora,
+                planta_fruticola=f'Planta {exportadora} {i + 1:03d}',
+                license_key=f'{PREFIJO_LICENCIA}{seed}-{i + 1:05d}',
+                subscription_status='ACTIVE',
+                subscription_start=hoy - timedelta(days=random.randint(30, 365)),
+                subscription_expiry=hoy + timedelta(days=random.randint(-10, 90)),
+            ))
+        Establishment.objects.bulk_create(establecimientos, ignore_conflicts=True)
+        establecimientos = list(
+            Establishment.objects.filter(license_key__in=[e.license_key for e in establecimientos])
+            .order_by('license_key')
+        )
+        # bulk_create no pasa por Establishment.save(), que crea el tema
+        EstablishmentTheme.objects.bulk_create(
+            [EstablishmentTheme(establishment=e) for e in establecimientos], ignore_conflicts=True
+        )
+        return establecimientos
+
+    def _crear_lote(self, cantidad, offset, establecimientos, desde, dias, seed):
+        """Genera y guarda un lote de inspecciones con sus resultados de muestreo."""
+        especies = [e[0] for e in ESPECIES]
+        pesos = [e[1] for e in ESPECIES]
+        rangos = {e[0]: (e[2], e[3]) for e in ESPECIES}
+        despachos = [d[0] for d in TIPOS_DESPACHO]
+        pesos_despacho = [d[1] for d in TIPOS_DESPACHO]
+        incrementos = [i[0] for i in INCREMENTOS]
+        pesos_incremento = [i[1] for i in INCREMENTOS]
+
+        inspecciones = []
+        resultados = []
+        for i in range(cantidad):
+            establecimiento = random.choice(establecimientos)
+            especie = random.choices(especies, pesos)[0]
+            minimo, maximo = rangos[especie]
+
+            cantidad_pallets = max(1, min(40, int(random.lognormvariate(2.5, 0.5))))
+            base = random.randint(minimo, maximo)
+            # Pallets homogéneos (±15%) para que el muestreo por etapa sea válido
+            boxes_per_pallet = [
+                max(1, round(base * random.uniform(0.85, 1.15)))
+                for _ in range(cantidad_pallets)
+            ]
+            tamano_lote = sum(boxes_per_pallet)
+
+            tipo_muestreo = 'NORMAL'
+            if cantidad_pallets >= 6 and random.random() < PROPORCION_POR_ETAPA:
+                es_valido, _, _ = validate_stage_sampling(cantidad_pallets, boxes_per_pallet, tamano_lote)
+                if es_valido:
+                    tipo_muestreo = 'POR_ETAPA'
+
+            incremento = 0
+            if permite_incremento_intensidad(especie):
+                incremento = random.choices(incrementos, pesos_incremento)[0]
+            resultado, selected_pallets = self._muestrear(
+                tipo_muestreo, especie, tamano_lote, cantidad_pallets, boxes_per_pallet, incremento
+            )
+
+            fecha = desde + timedelta(days=random.randrange(dias))
+            inspecciones.append(Inspection(
+                exportador=establecimiento.exportadora,
+                establishment=establecimiento,
+                establecimiento_nombre=establecimiento.planta_fruticola,
+                inspector_sag=f'Inspector {random.randint(1, 60):02d}',
+                contraparte_sag=f'Contraparte {random.randint(1, 120):03d}',
+                fecha=fecha,
+                hora=dtime(random.randint(7, 21), random.randrange(60)),
+                especie=especie,
+                numero_lote=f'B{seed}-{offset + i + 1:08d}',
+                tamano_lote=tamano_lote,
+                tipo_muestreo=tipo_muestreo,
+                tipo_despacho=random.choices(despachos, pesos_despacho)[0],
+                cantidad_pallets=cantidad_pallets,
+                boxes_per_pallet=boxes_per_pallet if tipo_muestreo == 'POR_ETAPA' else [],
+                selected_pallets=selected_pallets,
+            ))
+            resultados.append(resultado)
+
+        with transaction.atomic():
+            Inspection.objects.bulk_create(inspecciones)
+            SamplingResult.objects.bulk_create(
+                (
+                    SamplingResult(
+                        inspection=inspection,
+                        tipo_tabla=resultado['tipo_tabla'],
+                        nombre_tabla=resultado['nombre_tabla'],
+                        muestra_base=resultado.get('muestra_base'),
+                        incremento_aplicado=resultado.get('incremento_aplicado', 0),
+                        muestra_final=resultado.get('muestra_final'),
+                        tamano_muestra=resultado['tamano_muestra'],
+                        cajas_seleccionadas=json.dumps(resultado['cajas_seleccionadas'])
+                    )
+                    for inspection, resultado in zip(inspecciones, resultados)
+                ),
+                batch_size=1000
+            )
+
+    @staticmethod
+    def _muestrear(tipo_muestreo, especie, tamano_lote, cantidad_pallets, boxes_per_pallet, incremento):
+        """Ejecuta el mismo cálculo de muestreo que /api/muestreo/generar/."""
+        if tipo_muestreo != 'POR_ETAPA':
+            return calcular_muestreo(tamano_lote=tamano_lote, especie=especie, incremento_intensidad=incremento), []
+
+        selected_pallets = select_stage_sampling_pallets(cantidad_pallets)
+        cajas_seleccionadas_pallets = sum(boxes_per_pallet[i - 1] for i in selected_pallets)
+        base = calcular_muestreo(
+            tamano_lote=cajas_seleccionadas_pallets,
+            especie=especie,
+            incremento_intensidad=incremento
+        )
+        distribucion = distribute_samples_proportionally(
+            boxes_per_pallet=boxes_per_pallet,
+            selected_pallet_indices=selected_pallets,
+            total_sample_size=base['tamano_muestra']
+        )
+        cajas = generate_stage_sampling_numbers(
+            boxes_per_pallet=boxes_per_pallet,
+            selected_pallet_indices=selected_pallets,
+            sample_distribution=distribucion
+        )
+        return dict(base, tamano_muestra=len(cajas), cajas_seleccionadas=cajas), selected_pallets
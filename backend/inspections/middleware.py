@@ -0,0 +1,289 @@
+"""
+Middlewares del proyecto.
+
+CompressionMiddleware: compresión negociada brotli/gzip de las respuestas.
+
+ProfilingMiddleware (opcional, ver PROFILING_* en settings):
+
+Por cada request registra tiempo total, cantidad de consultas y tiempo en base
+de datos; agrega la cabecera `Server-Timing` (con `conn` indicando si el request
+abrió una conexión nueva o reutilizó una persistente), registra en el log los
+requests lentos con sus consultas más costosas y alimenta un histograma de
+latencias por endpoint. Cada N requests puede además muestrear la pila del hilo y guardar
+stacks en formato "folded" (flamegraph.pl, speedscope).
+"""
+import itertools
+import logging
+import re
+import sys
+import threading
+import time
+from collections import Counter, defaultdict, deque
+from datetime import datetime
+from pathlib import Path
+
+from django.conf import settings
+from django.db import connections
+from django.middleware.gzip import GZipMiddleware
+from django.utils.cache import patch_vary_headers
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover - depende del entorno
+    brotli = None
+
+logger = logging.getLogger('inspections.profiling')
+
+# Límites superiores (ms) de los buckets del histograma
+BUCKETS_MS = [5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, float('inf')]
+
+
+class RegistroConsultas:
+    """execute_wrapper que acumula duración por sentencia SQL."""
+
+    def __init__(self):
+        self.cantidad = 0
+        self.tiempo = 0.0
+        self.por_sql = defaultdict(lambda: [0, 0.0])
+
+    def __call__(self, execute, sql, params, many, context):
+        inicio = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            duracion = time.perf_counter() - inicio
+            self.cantidad += 1
+            self.tiempo += duracion
+            # El SQL llega con placeholders: las repeticiones (N+1) se agrupan solas
+            entrada = self.por_sql[sql]
+            entrada[0] += 1
+            entrada[1] += duracion
+
+    def top(self, n=5):
+        """Sentencias con más tiempo acumulado: [(sql, veces, ms), ...]."""
+        ordenadas = sorted(self.por_sql.items(), key=lambda e: e[1][1], reverse=True)
+        return [(sql, veces, round(t * 1000, 2)) for sql, (veces, t) in ordenadas[:n]]
+
+
+class HistogramaLatencias:
+    """Histograma deslizante de latencias por endpoint (últimos N requests)."""
+
+    def __init__(self, ventana=1000):
+        self.ventana = ventana
+        self._datos = {}
+        self._lock = threading.Lock()
+
+    def registrar(self, endpoint, ms):
+        with self._lock:
+            datos = self._datos.get(endpoint)
+            if datos is None:
+                datos = self._datos[endpoint] = deque(maxlen=self.ventana)
+            datos.append(ms)
+
+    def snapshot(self):
+        with self._lock:
+            copia = {endpoint: sorted(datos) for endpoint, datos in self._datos.items()}
+
+        resultado = {}
+        for endpoint, latencias in sorted(copia.items()):
+            buckets = Counter()
+            for ms in latencias:
+                buckets[next(b for b in BUCKETS_MS if ms <= b)] += 1
+            n = len(latencias)
+            resultado[endpoint] = {
+                'requests': n,
+                'p50_ms': _percentil(latencias, 50),
+                'p95_ms': _percentil(latencias, 95),
+                'p99_ms': _percentil(latencias, 99),
+                'max_ms': latencias[-1],
+                'buckets': {
+                    ('+Inf' if b == float('inf') else f'le_{b}'): buckets[b]
+                    for b in BUCKETS_MS
+                },
+            }
+        return resultado
+
+    def reiniciar(self):
+        with self._lock:
+            self._datos.clear()
+
+
+def _percentil(ordenados, p):
+    k = max(0, -(-p * len(ordenados) // 100) - 1)
+    return round(ordenados[k], 2)
+
+
+histograma = HistogramaLatencias()
+
+
+class MuestreadorPila(threading.Thread):
+    """Muestrea la pila de un hilo a intervalos fijos y cuenta stacks únicos."""
+
+    def __init__(self, thread_id, intervalo):
+        super().__init__(daemon=True, name='profiling-sampler')
+        self.thread_id = thread_id
+        self.intervalo = intervalo
+        self.stacks = Counter()
+        self._detener = threading.Event()
+
+    def run(self):
+        while not self._detener.wait(self.intervalo):
+            frame = sys._current_frames().get(self.thread_id)
+            pila = []
+            while frame is not None:
+                codigo = frame.f_code
+                pila.append(f"{frame.f_globals.get('__name__', '?')}:{codigo.co_name}")
+                frame = frame.f_back
+            if pila:
+                self.stacks[';'.join(reversed(pila))] += 1
+
+    def detener(self):
+        self._detener.set()
+        self.join()
+
+    def guardar(self, directorio, nombre):
+        """Escribe los stacks en formato folded ("a;b;c cantidad")."""
+        directorio = Path(directorio)
+        directorio.mkdir(parents=True, exist_ok=True)
+        ruta = directorio / f'{nombre}.folded'
+        with open(ruta, 'w', encoding='utf-8') as f:
+            for pila, cantidad in self.stacks.most_common():
+                f.write(f'{pila} {cantidad}\n')
+        return ruta
+
+
+def _endpoint(request):
+    """Ruta del resolver (sin ids) para agrupar requests del mismo endpoint."""
+    match = getattr(request, 'resolver_match', None)
+    if match is None:
+        return f'{request.method} <sin ruta>'
+    ruta = re.sub(r'\(\?P<(\w+)>[^)]*\)', r'<\1>', match.route).replace('^', '').replace('$', '')
+    return f'{request.method} /{ruta}'
+
+
+class ProfilingMiddleware:
+    """
+    Mide cada request y expone los resultados en Server-Timing, el log y el
+    histograma consultable en /api/admin/profiling/.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.lento_ms = settings.PROFILING_SLOW_MS
+        self.muestrear_cada = settings.PROFILING_SAMPLE_EVERY
+        self.intervalo = settings.PROFILING_SAMPLE_INTERVAL
+        self.directorio = settings.PROFILING_DIR
+        self._contador = itertools.count(1)
+
+    def __call__(self, request):
+        muestreador = None
+        if self.muestrear_cada and next(self._contador) % self.muestrear_cada == 0:
+            muestreador = MuestreadorPila(threading.get_ident(), self.intervalo)
+            muestreador.start()
+
+        # request_started ya cerró las conexiones vencidas: sin conexión aquí,
+        # la primera consulta del request abre una nueva
+        conexion_nueva = connections['default'].connection is None
+        consultas = RegistroConsultas()
+        inicio = time.perf_counter()
+        try:
+            with connections['default'].execute_wrapper(consultas):
+                response = self.get_response(request)
+        finally:
+            if muestreador is not None:
+                muestreador.detener()
+        total_ms = (time.perf_counter() - inicio) * 1000
+        db_ms = consultas.tiempo * 1000
+
+        endpoint = _endpoint(request)
+        histograma.registrar(endpoint, total_ms)
+
+        response['Server-Timing'] = (
+            f'db;dur={db_ms:.1f};desc="{consultas.cantidad} consultas", '
+            f'app;dur={total_ms - db_ms:.1f}, '
+            f'total;dur={total_ms:.1f}'
+        )
+        if consultas.cantidad:
+            response['Server-Timing'] += f', conn;desc="{"nueva" if conexion_nueva else "reutilizada"}"'
+
+        if total_ms >= self.lento_ms:
+            detalle = '\n'.join(
+                f'    {ms:8.1f} ms  x{veces:<3} {sql[:300]}'
+                for sql, veces, ms in consultas.top()
+            )
+            logger.warning(
+                'Request lento: %s %s → %s en %.0f ms (%d consultas, %.0f ms en BD)\n%s',
+                request.method, request.get_full_path(), response.status_code,
+                total_ms, consultas.cantidad, db_ms, detalle
+            )
+
+        if muestreador is not None:
+            nombre = '{}-{}'.format(
+                datetime.now().strftime('%Y%m%d-%H%M%S-%f'),
+                re.sub(r'[^A-Za-z0-9]+', '_', endpoint).strip('_')[:80]
+            )
+            try:
+                ruta = muestreador.guardar(self.directorio, nombre)
+                logger.info('Perfil de %s guardado en %s', endpoint, ruta)
+            except OSError as e:
+                logger.error('No se pudo guardar el perfil de %s: %s', endpoint, e)
+
+        return response
+
+
+def _codificaciones_aceptadas(accept_encoding):
+    """Codificaciones de Accept-Encoding con q > 0 ("br;q=0" las excluye)."""
+    aceptadas = set()
+    for parte in accept_encoding.split(','):
+        nombre, _, parametros = parte.strip().partition(';')
+        q = 1.0
+        parametros = parametros.strip()
+        if parametros.startswith('q='):
+            try:
+                q = float(parametros[2:])
+            except ValueError:
+                q = 0.0
+        if nombre and q > 0:
+            aceptadas.add(nombre.strip().lower())
+    return aceptadas
+
+
+class CompressionMiddleware(GZipMiddleware):
+    """
+    Comprime respuestas sobre COMPRESSION_MIN_BYTES con brotli (si el cliente
+    lo acepta y el paquete está instalado) o gzip.
+
+    gzip y las respuestas streaming usan GZipMiddleware de Django, que agrega
+    relleno aleatorio contra BREACH; brotli no tiene dónde agregarlo. Por eso
+    las rutas de COMPRESSION_EXCLUDE_PATHS (login y refresh, que devuelven JWT)
+    no se comprimen con ninguno de los dos. Debe ir antes de
+    ConditionalGetMiddleware para que el ETag se calcule sobre el contenido
+    sin comprimir.
+    """
+
+    def process_response(self, request, response):
+        if request.path.startswith(settings.COMPRESSION_EXCLUDE_PATHS):
+            return response
+        if not response.streaming and len(response.content) < settings.COMPRESSION_MIN_BYTES:
+            return response
+        if response.has_header('Content-Encoding'):
+            return response
+
+        if (
+            brotli is None or response.streaming or
+            'br' not in _codificaciones_aceptadas(request.META.get('HTTP_ACCEPT_ENCODING', ''))
+        ):
+            return super().process_response(request, response)
+
+        patch_vary_headers(response, ('Accept-Encoding',))
+        comprimido = brotli.compress(response.content, quality=settings.BROTLI_QUALITY)
+        if len(comprimido) >= len(response.content):
+            return response
+        response.content = comprimido
+        response.headers['Content-Length'] = str(len(comprimido))
+
+        etag = response.get('ETag')
+        if etag and etag.startswith('"'):
+            response.headers['ETag'] = 'W/' + etag
+        response.headers['Content-Encoding'] = 'br'
+        return response
@@ -0,0 +1,57 @@
+# Generated by Django 4.2.9 on 2026-10-19 13:13
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inspections', '0014_inspection_establecimiento_nombre_and_more'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='establishment',
+            index=models.Index(fields=['subscription_status', 'subscription_expiry'], name='estab_status_expiry_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='establishment',
+            index=models.Index(condition=models.Q(('subscription_status', 'ACTIVE')), fields=['subscription_expiry'], name='estab_active_expiry_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='establishment',
+            index=models.Index(condition=models.Q(('is_active', True)), fields=['planta_fruticola'], name='estab_active_name_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='inspection',
+            index=models.Index(fields=['-created_at'], name='insp_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='inspection',
+            index=models.Index(fields=['establishment', '-created_at'], name='insp_estab_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='inspection',
+            index=models.Index(fields=['tipo_muestreo', '-created_at'], name='insp_tipo_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='inspection',
+            index=models.Index(fields=['especie', 'fecha'], name='insp_especie_fecha_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='inspection',
+            index=models.Index(fields=['exportador', 'fecha'], name='insp_exportador_fecha_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='inspection',
+            index=models.Index(fields=['fecha'], name='insp_fecha_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='inspection',
+            index=models.Index(fields=['numero_lote'], name='insp_lote_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='samplingresult',
+            index=models.Index(fields=['-created_at'], name='sampling_created_idx'),
+        ),
+    ]
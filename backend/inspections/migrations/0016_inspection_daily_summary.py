@@ -0,0 +1,42 @@
+# Generated by Django 4.2.9 on 2026-10-19 13:15
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inspections', '0015_inspection_query_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='InspectionDailySummary',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('fecha', models.DateField(verbose_name='Fecha')),
+                ('especie', models.CharField(max_length=100, verbose_name='Especie')),
+                ('tipo_tabla', models.CharField(blank=True, default='', max_length=50, verbose_name='Tipo de Tabla')),
+                ('cantidad_inspecciones', models.PositiveIntegerField(default=0, verbose_name='Cantidad de Inspecciones')),
+                ('total_cajas', models.PositiveBigIntegerField(default=0, verbose_name='Total de Cajas')),
+                ('total_cajas_muestreadas', models.PositiveBigIntegerField(default=0, verbose_name='Total de Cajas Muestreadas')),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('establishment', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='daily_summaries', to='inspections.establishment', verbose_name='Establecimiento')),
+            ],
+            options={
+                'verbose_name': 'Resumen Diario de Inspecciones',
+                'verbose_name_plural': 'Resúmenes Diarios de Inspecciones',
+                'ordering': ['-fecha', 'especie', 'tipo_tabla'],
+                'indexes': [models.Index(fields=['especie', 'fecha'], name='summary_especie_fecha_idx')],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='inspectiondailysummary',
+            constraint=models.UniqueConstraint(fields=('fecha', 'establishment', 'especie', 'tipo_tabla'), name='daily_summary_unique'),
+        ),
+        migrations.AddConstraint(
+            model_name='inspectiondailysummary',
+            constraint=models.UniqueConstraint(condition=models.Q(('establishment__isnull', True)), fields=('fecha', 'especie', 'tipo_tabla'), name='daily_summary_unique_sin_estab'),
+        ),
+    ]
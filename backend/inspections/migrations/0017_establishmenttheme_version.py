@@ -0,0 +1,34 @@
+# Generated by Django 4.2.9 on 2026-10-19 13:31
+
+from django.db import migrations, models
+
+
+def crear_temas_faltantes(apps, schema_editor):
+    """
+    my-theme ya no crea el tema al leerlo: se crea para los establecimientos
+    que todavía no lo tienen.
+    """
+    Establishment = apps.get_model('inspections', 'Establishment')
+    EstablishmentTheme = apps.get_model('inspections', 'EstablishmentTheme')
+    
+    sin_tema = Establishment.objects.filter(theme__isnull=True).values_list('id', flat=True)
+    EstablishmentTheme.objects.bulk_create(
+        [EstablishmentTheme(establishment_id=establishment_id) for establishment_id in sin_tema.iterator()],
+        batch_size=500
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inspections', '0016_inspection_daily_summary'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='establishmenttheme',
+            name='version',
+            field=models.PositiveIntegerField(default=1, editable=False, help_text='Se incrementa en cada guardado; invalida cachés y ETag', verbose_name='Versión'),
+        ),
+        migrations.RunPython(crear_temas_faltantes, migrations.RunPython.noop),
+    ]
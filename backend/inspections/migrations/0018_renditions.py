@@ -0,0 +1,23 @@
+# Generated by Django 4.2.9 on 2026-10-19 13:33
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inspections', '0017_establishmenttheme_version'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='establishmenttheme',
+            name='renditions',
+            field=models.JSONField(blank=True, default=dict, editable=False, help_text='Logos y favicon redimensionados (ver inspections.imagenes)', verbose_name='Versiones de Imágenes'),
+        ),
+        migrations.AddField(
+            model_name='userprofile',
+            name='renditions',
+            field=models.JSONField(blank=True, default=dict, editable=False, verbose_name='Versiones del Avatar'),
+        ),
+    ]
@@ -0,0 +1,33 @@
+from django.db import migrations
+
+INDICE = 'outstandingtoken_expires_at_idx'
+TABLA = 'token_blacklist_outstandingtoken'
+
+
+def crear_indice(apps, schema_editor):
+    """
+    Índice sobre expires_at para que prune_tokens recorra solo los tokens
+    expirados. En PostgreSQL se crea CONCURRENTLY para no bloquear escrituras.
+    """
+    concurrente = 'CONCURRENTLY ' if schema_editor.connection.vendor == 'postgresql' else ''
+    schema_editor.execute(
+        f'CREATE INDEX {concurrente}IF NOT EXISTS {INDICE} ON {TABLA} (expires_at)'
+    )
+
+
+def eliminar_indice(apps, schema_editor):
+    schema_editor.execute(f'DROP INDEX IF EXISTS {INDICE}')
+
+
+class Migration(migrations.Migration):
+    # CREATE INDEX CONCURRENTLY no puede ejecutarse dentro de una transacción
+    atomic = False
+
+    dependencies = [
+        ('inspections', '0018_renditions'),
+        ('token_blacklist', '0012_alter_outstandingtoken_user'),
+    ]
+
+    operations = [
+        migrations.RunPython(crear_indice, eliminar_indice),
+    ]
@@ -1,12 +1,18 @@
 """
 Modelos para el sistema de inspecciones SAG-USDA.
 """
-from django.db import models
-from django.db.models import JSONField
+import hashlib
+import os
+
+from django.db import models, transaction, IntegrityError
+from django.db.models import JSONField, Q, F, Count, Sum, Value
+from django.db.models.functions import Coalesce, Greatest
 from django.core.validators import MinValueValidator
 from django.utils import timezone
 from django.contrib.auth.models import User
 
+from .imagenes import actualizar_renditions
+
 
 def get_current_date():
     """Retorna la fecha actual."""
@@ -88,10 +94,37 @@ class Establishment(models.Model):
         verbose_name = 'Establecimiento'
         verbose_name_plural = 'Establecimientos'
         ordering = ['planta_fruticola']
+        indexes = [
+            # Dashboard y listados de suscripciones (activos, por vencer, expirados)
+            models.Index(fields=['subscription_status', 'subscription_expiry'], name='estab_status_expiry_idx'),
+            models.Index(
+                fields=['subscription_expiry'],
+                condition=Q(subscription_status='ACTIVE'),
+                name='estab_active_expiry_idx'
+            ),
+            # Listado público: solo activos, ordenados por nombre
+            models.Index(
+                fields=['planta_fruticola'],
+                condition=Q(is_active=True),
+                name='estab_active_name_idx'
+            ),
+        ]
     
     def __str__(self):
         return self.planta_fruticola or 'Sin nombre'
     
+    def save(self, *args, **kwargs):
+        """
+        Crea el tema por defecto junto con el establecimiento, venga del
+        panel de superadmin, del admin de Django o de la shell.
+        """
+        if not self._state.adding:
+            super().save(*args, **kwargs)
+            return
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+            EstablishmentTheme.objects.create(establishment=self)
+    
     def has_active_subscription(self):
         """Verifica si la suscripción está activa."""
         if self.subscription_status != 'ACTIVE':
@@ -189,6 +222,17 @@ class Inspection(models.Model):
         help_text='Índices de pallets seleccionados para muestreo (solo para muestreo por etapa)'
     )
     
+    # Cabecera Idempotency-Key de POST /api/muestreo/generar/: un reintento
+    # con la misma clave retorna esta inspección en vez de crear otra
+    idempotency_key = models.CharField(
+        max_length=100,
+        unique=True,
+        null=True,
+        blank=True,
+        editable=False,
+        verbose_name='Clave de Idempotencia'
+    )
+    
     # Metadata
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
@@ -197,6 +241,17 @@ class Inspection(models.Model):
         verbose_name = 'Inspección'
         verbose_name_plural = 'Inspecciones'
         ordering = ['-created_at']
+        indexes = [
+            # Orden por defecto y filtros por rango de creación (dashboard)
+            models.Index(fields=['-created_at'], name='insp_created_idx'),
+            models.Index(fields=['establishment', '-created_at'], name='insp_estab_created_idx'),
+            models.Index(fields=['tipo_muestreo', '-created_at'], name='insp_tipo_created_idx'),
+            # Filtros del admin y reportes por temporada
+            models.Index(fields=['especie', 'fecha'], name='insp_especie_fecha_idx'),
+            models.Index(fields=['exportador', 'fecha'], name='insp_exportador_fecha_idx'),
+            models.Index(fields=['fecha'], name='insp_fecha_idx'),
+            models.Index(fields=['numero_lote'], name='insp_lote_idx'),
+        ]
     
     def __str__(self):
         return f"Inspección {self.numero_lote} - {self.exportador}"
@@ -270,6 +325,9 @@ class SamplingResult(models.Model):
         verbose_name = 'Resultado de Muestreo'
         verbose_name_plural = 'Resultados de Muestreo'
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['-created_at'], name='sampling_created_idx'),
+        ]
     
     def __str__(self):
         return f"Muestreo para {self.inspection.numero_lote}"
@@ -280,6 +338,200 @@ class SamplingResult(models.Model):
         return json.loads(self.cajas_seleccionadas)
 
 
+class InspectionDailySummary(models.Model):
+    """
+    Resumen diario desnormalizado de inspecciones para reportes.
+    
+    Una fila por (fecha, establecimiento, especie, tipo de tabla). Se mantiene
+    de forma incremental al generar cada muestreo, al editar o borrar
+    inspecciones (ver resumen_diario.py) y puede reconstruirse por rango de
+    fechas con el comando `rebuild_daily_summary`.
+    """
+    fecha = models.DateField(verbose_name='Fecha')
+    establishment = models.ForeignKey(
+        Establishment,
+        on_delete=models.CASCADE,
+        related_name='daily_summaries',
+        verbose_name='Establecimiento',
+        null=True,
+        blank=True
+    )
+    especie = models.CharField(max_length=100, verbose_name='Especie')
+    tipo_tabla = models.CharField(max_length=50, blank=True, default='', verbose_name='Tipo de Tabla')
+    
+    # Totales del día
+    cantidad_inspecciones = models.PositiveIntegerField(default=0, verbose_name='Cantidad de Inspecciones')
+    total_cajas = models.PositiveBigIntegerField(default=0, verbose_name='Total de Cajas')
+    total_cajas_muestreadas = models.PositiveBigIntegerField(default=0, verbose_name='Total de Cajas Muestreadas')
+    
+    # Metadata
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        verbose_name = 'Resumen Diario de Inspecciones'
+        verbose_name_plural = 'Resúmenes Diarios de Inspecciones'
+        ordering = ['-fecha', 'especie', 'tipo_tabla']
+        constraints = [
+            models.UniqueConstraint(
+                fields=['fecha', 'establishment', 'especie', 'tipo_tabla'],
+                name='daily_summary_unique'
+            ),
+            # NULL no es igual a NULL en los índices únicos: las inspecciones
+            # sin establecimiento necesitan su propia restricción
+            models.UniqueConstraint(
+                fields=['fecha', 'especie', 'tipo_tabla'],
+                condition=Q(establishment__isnull=True),
+                name='daily_summary_unique_sin_estab'
+            ),
+        ]
+        indexes = [
+            models.Index(fields=['especie', 'fecha'], name='summary_especie_fecha_idx'),
+        ]
+    
+    def __str__(self):
+        return f"{self.fecha} - {self.especie} ({self.cantidad_inspecciones})"
+    
+    @classmethod
+    def _clave(cls, fecha, establishment_id, especie, tipo_tabla):
+        """Filtros que identifican una fila del resumen."""
+        clave = {'fecha': fecha, 'especie': especie, 'tipo_tabla': tipo_tabla or ''}
+        if establishment_id is None:
+            clave['establishment__isnull'] = True
+        else:
+            clave['establishment_id'] = establishment_id
+        return clave
+    
+    @classmethod
+    def registrar(cls, inspection, sampling_result):
+        """
+        Suma una inspección al resumen de su día.
+        
+        Debe llamarse dentro de la misma transacción que crea la inspección.
+        El UPDATE con F() es atómico; si la fila no existe se crea dentro de un
+        savepoint y, si otra transacción la creó primero, se reintenta el UPDATE.
+        """
+        cls._sumar(
+            inspection.fecha,
+            inspection.establishment_id,
+            inspection.especie,
+            sampling_result.tipo_tabla,
+            1,
+            inspection.tamano_lote,
+            sampling_result.tamano_muestra
+        )
+    
+    @classmethod
+    def descontar(cls, fecha, establishment_id, especie, tipo_tabla, cajas, muestreadas):
+        """
+        Resta una inspección del resumen de su día (al editarla o borrarla).
+        
+        Los totales no bajan de cero aunque el resumen estuviera desfasado, y
+        la fila se elimina cuando ya no le quedan inspecciones.
+        """
+        clave = cls._clave(fecha, establishment_id, especie, tipo_tabla)
+        cls.objects.filter(**clave).update(
+            cantidad_inspecciones=Greatest(F('cantidad_inspecciones') - 1, 0),
+            total_cajas=Greatest(F('total_cajas') - cajas, 0),
+            total_cajas_muestreadas=Greatest(F('total_cajas_muestreadas') - muestreadas, 0),
+            updated_at=timezone.now(),
+        )
+        cls.objects.filter(**clave, cantidad_inspecciones=0).delete()
+    
+    @classmethod
+    def registrar_varios(cls, pares):
+        """
+        Como `registrar` para muchas inspecciones (importación masiva): agrupa
+        los pares (inspección, resultado) por fila del resumen y hace un solo
+        UPDATE por grupo.
+        """
+        grupos = {}
+        for inspection, sampling_result in pares:
+            clave = (inspection.fecha, inspection.establishment_id, inspection.especie, sampling_result.tipo_tabla or '')
+            cantidad, cajas, muestreadas = grupos.get(clave, (0, 0, 0))
+            grupos[clave] = (cantidad + 1, cajas + inspection.tamano_lote, muestreadas + sampling_result.tamano_muestra)
+        
+        for clave, totales in grupos.items():
+            cls._sumar(*clave, *totales)
+    
+    @classmethod
+    def _sumar(cls, fecha, establishment_id, especie, tipo_tabla, cantidad, cajas, muestreadas):
+        clave = cls._clave(fecha, establishment_id, especie, tipo_tabla)
+        incrementos = {
+            'cantidad_inspecciones': F('cantidad_inspecciones') + cantidad,
+            'total_cajas': F('total_cajas') + cajas,
+            'total_cajas_muestreadas': F('total_cajas_muestreadas') + muestreadas,
+            'updated_at': timezone.now(),
+        }
+        
+        if cls.objects.filter(**clave).update(**incrementos):
+            return
+        
+        try:
+            with transaction.atomic():
+                cls.objects.create(
+                    fecha=fecha,
+                    establishment_id=establishment_id,
+                    especie=especie,
+                    tipo_tabla=tipo_tabla or '',
+                    cantidad_inspecciones=cantidad,
+                    total_cajas=cajas,
+                    total_cajas_muestreadas=muestreadas
+                )
+        except IntegrityError:
+            cls.objects.filter(**clave).update(**incrementos)
+    
+    @classmethod
+    def reconstruir(cls, desde=None, hasta=None, batch_size=1000):
+        """
+        Recalcula el resumen para un rango de fechas (inclusive).
+        
+        Agrupa en la base de datos las inspecciones con resultado de muestreo
+        y reemplaza las filas del rango con bulk_create.
+        
+        Returns:
+            tuple: (filas eliminadas, filas creadas)
+        """
+        inspecciones = Inspection.objects.filter(sampling_result__isnull=False)
+        resumenes = cls.objects.all()
+        if desde:
+            inspecciones = inspecciones.filter(fecha__gte=desde)
+            resumenes = resumenes.filter(fecha__gte=desde)
+        if hasta:
+            inspecciones = inspecciones.filter(fecha__lte=hasta)
+            resumenes = resumenes.filter(fecha__lte=hasta)
+        
+        grupos = (
+            inspecciones
+            .annotate(tabla=Coalesce('sampling_result__tipo_tabla', Value('')))
+            .values('fecha', 'establishment_id', 'especie', 'tabla')
+            .annotate(
+                cantidad=Count('id'),
+                cajas=Sum('tamano_lote'),
+                muestreadas=Sum('sampling_result__tamano_muestra')
+            )
+            .order_by()
+        )
+        
+        with transaction.atomic():
+            eliminadas, _ = resumenes.delete()
+            creadas = cls.objects.bulk_create(
+                (
+                    cls(
+                        fecha=g['fecha'],
+                        establishment_id=g['establishment_id'],
+                        especie=g['especie'],
+                        tipo_tabla=g['tabla'],
+                        cantidad_inspecciones=g['cantidad'],
+                        total_cajas=g['cajas'] or 0,
+                        total_cajas_muestreadas=g['muestreadas'] or 0
+                    )
+                    for g in grupos.iterator()
+                ),
+                batch_size=batch_size
+            )
+        return eliminadas, len(creadas)
+
+
 class EstablishmentTheme(models.Model):
     """
     Modelo para personalización visual de establecimientos.
@@ -355,16 +607,74 @@ class EstablishmentTheme(models.Model):
     show_logo = models.BooleanField(default=True, verbose_name='Mostrar Logo')
     dark_mode = models.BooleanField(default=False, verbose_name='Modo Oscuro por Defecto')
     
+    renditions = JSONField(
+        default=dict,
+        blank=True,
+        editable=False,
+        verbose_name='Versiones de Imágenes',
+        help_text='Logos y favicon redimensionados (ver inspections.imagenes)'
+    )
+    
     # Metadata
+    version = models.PositiveIntegerField(
+        default=1,
+        editable=False,
+        verbose_name='Versión',
+        help_text='Se incrementa en cada guardado; invalida cachés y ETag'
+    )
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
+    IMAGENES = ('logo', 'logo_dark', 'favicon')
+    
     class Meta:
         verbose_name = 'Tema de Establecimiento'
         verbose_name_plural = 'Temas de Establecimientos'
     
     def __str__(self):
         return f"Tema de {self.establishment.planta_fruticola or 'Sin nombre'}"
+    
+    @staticmethod
+    def clave_cache(establishment_id, version):
+        """
+        Clave del payload serializado del tema en la caché. Incluye la versión
+        leída de la base de datos, así un guardado hecho en otro proceso (otro
+        worker, un management command) deja de usar la entrada anterior.
+        """
+        return f'tema:{establishment_id}:v{version}'
+    
+    def save(self, *args, **kwargs):
+        """
+        Nombra las imágenes nuevas por el hash de su contenido (se pueden
+        cachear como inmutables) e incrementa la versión en la base de datos
+        (F('version') + 1: dos guardados simultáneos no pierden incrementos).
+        """
+        for campo in self.IMAGENES:
+            archivo = getattr(self, campo)
+            if archivo and not archivo._committed:
+                archivo.name = _nombre_con_hash(archivo)
+        actualizar_renditions(self, self.IMAGENES)
+        
+        if self.pk is None:
+            super().save(*args, **kwargs)
+            return
+        self.version = F('version') + 1
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None:
+            kwargs['update_fields'] = set(update_fields) | {'version', 'renditions', 'updated_at'}
+        super().save(*args, **kwargs)
+        self.refresh_from_db(fields=['version'])
+
+
+def _nombre_con_hash(archivo):
+    """Nombre `<sha256[:20]><extensión>` a partir del contenido del archivo."""
+    sha = hashlib.sha256()
+    archivo.seek(0)
+    for bloque in archivo.chunks():
+        sha.update(bloque)
+    archivo.seek(0)
+    extension = os.path.splitext(archivo.name)[1].lower()
+    return f'{sha.hexdigest()[:20]}{extension}'
 
 
 class UserProfile(models.Model):
@@ -410,11 +720,19 @@ class UserProfile(models.Model):
         blank=True,
         verbose_name='Avatar'
     )
+    renditions = JSONField(
+        default=dict,
+        blank=True,
+        editable=False,
+        verbose_name='Versiones del Avatar'
+    )
     
     # Metadata
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
+    IMAGENES = ('avatar',)
+    
     class Meta:
         verbose_name = 'Perfil de Usuario'
         verbose_name_plural = 'Perfiles de Usuario'
@@ -422,6 +740,14 @@ class UserProfile(models.Model):
     def __str__(self):
         return f"{self.user.username} - {self.get_role_display()}"
     
+    def save(self, *args, **kwargs):
+        """Genera las versiones redimensionadas del avatar recién subido."""
+        actualizar_renditions(self, self.IMAGENES)
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None:
+            kwargs['update_fields'] = set(update_fields) | {'renditions'}
+        super().save(*args, **kwargs)
+    
     def is_superadmin(self):
         return self.role == 'SUPERADMIN'
     
@@ -0,0 +1,110 @@
+"""
+Renderer y parser JSON para DRF respaldados por orjson.
+
+Producen la misma salida que `rest_framework.renderers.JSONRenderer` (formato
+compacto, UTF-8 sin escapar, U+2028/U+2029 escapados y fechas, Decimal y UUID
+serializados con el encoder de DRF), con una excepción: los floats que Python
+escribe en notación exponencial salen en la notación de orjson (1e16 en vez de
+1e+16, 1e-5 en vez de 1e-05), que es JSON válido con el mismo valor.
+
+Si orjson no está instalado, o el dato no es representable (p. ej. enteros de
+más de 64 bits), se usa la implementación estándar de DRF. Igual que DRF, NaN e
+infinitos se rechazan con ValueError (orjson los escribiría como null).
+"""
+import math
+from decimal import Decimal
+
+from django.conf import settings
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - depende del entorno
+    orjson = None
+
+
+# Las fechas pasan al encoder de DRF para conservar su formato (milisegundos, 'Z').
+# Las llaves no-str (p. ej. índices de pallet en sample_distribution) se convierten
+# a str como hace json.dumps.
+OPCIONES_ORJSON = (
+    orjson.OPT_PASSTHROUGH_DATETIME |
+    orjson.OPT_PASSTHROUGH_DATACLASS |
+    orjson.OPT_NON_STR_KEYS
+) if orjson else 0
+
+# Tipos que no contienen floats: no hace falta revisarlos
+_ESCALARES = frozenset((str, int, bool, type(None)))
+
+_LS = '\u2028'.encode()
+_PS = '\u2029'.encode()
+
+
+def _floats_finitos(data):
+    """
+    False si `data` contiene NaN o infinito en algún nivel (float, o Decimal,
+    que el encoder de DRF convierte a float). Los tipos de cada contenedor se
+    obtienen con map(type, ...), que corre en C: las listas de enteros o
+    textos (cajas, ids) no se recorren elemento a elemento.
+    """
+    pendientes = [data]
+    while pendientes:
+        valor = pendientes.pop()
+        if isinstance(valor, dict):
+            if float in set(map(type, valor)):
+                pendientes.extend([k for k in valor if type(k) is float])
+            valor = valor.values()
+        elif not isinstance(valor, (list, tuple)):
+            if isinstance(valor, (float, Decimal)) and not math.isfinite(valor):
+                return False
+            continue
+        if not set(map(type, valor)) <= _ESCALARES:
+            pendientes.extend([v for v in valor if type(v) not in _ESCALARES])
+    return True
+
+
+class ORJSONRenderer(JSONRenderer):
+    """JSONRenderer compatible con DRF, serializado con orjson."""
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        if orjson is None or not self.compact or self.ensure_ascii:
+            return super().render(data, accepted_media_type, renderer_context)
+
+        # orjson no soporta indentación arbitraria (API navegable, ?indent=4)
+        if self.get_indent(accepted_media_type, renderer_context or {}) is not None:
+            return super().render(data, accepted_media_type, renderer_context)
+
+        try:
+            ret = orjson.dumps(data, default=self.encoder_class().default, option=OPCIONES_ORJSON)
+        except orjson.JSONEncodeError:
+            return super().render(data, accepted_media_type, renderer_context)
+
+        # orjson escribe NaN e infinitos como null: solo si hay algún null se
+        # revisan los datos, y DRF lanza el mismo error que JSONRenderer
+        if b'null' in ret and not _floats_finitos(data):
+            return super().render(data, accepted_media_type, renderer_context)
+
+        # Igual que DRF: la salida debe ser un subconjunto estricto de JavaScript
+        if _LS in ret or _PS in ret:
+            ret = ret.replace(_LS, b'\\u2028').replace(_PS, b'\\u2029')
+        return ret
+
+
+class ORJSONParser(JSONParser):
+    """JSONParser compatible con DRF, decodificado con orjson."""
+
+    renderer_class = ORJSONRenderer
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        parser_context = parser_context or {}
+        encoding = parser_context.get('encoding', settings.DEFAULT_CHARSET)
+        if orjson is None or not self.strict or encoding.lower().replace('-', '') != 'utf8':
+            return super().parse(stream, media_type, parser_context)
+
+        try:
+            return orjson.loads(stream.read())
+        except orjson.JSONDecodeError as exc:
+            raise ParseError('JSON parse error - %s' % str(exc))
@@ -0,0 +1,76 @@
+"""
+Mantiene InspectionDailySummary al editar o borrar inspecciones.
+
+Las altas suman al resumen en la misma transacción que crea la inspección
+(generar_muestreo e importación masiva). Estas señales (ver
+InspectionsConfig.ready) cubren lo demás, venga del ViewSet, del admin o de
+la shell:
+
+- Editar una inspección con resultado de muestreo cambiando fecha,
+  establecimiento, especie o tamaño del lote resta su aporte de la fila
+  anterior y lo suma a la nueva.
+- Borrar un resultado de muestreo (también en cascada al borrar la
+  inspección) resta su aporte.
+"""
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_save
+
+from .models import Inspection, InspectionDailySummary, SamplingResult
+
+# Campos de la inspección que determinan su aporte al resumen
+CAMPOS_RESUMEN = ('fecha', 'establishment', 'especie', 'tamano_lote')
+
+
+def _aporte(inspection):
+    return inspection.fecha, inspection.establishment_id, inspection.especie, inspection.tamano_lote
+
+
+def antes_de_guardar_inspeccion(sender, instance, raw=False, update_fields=None, **kwargs):
+    """Guarda el aporte anterior de la inspección (una consulta, solo si puede cambiar)."""
+    if raw or instance._state.adding or instance.pk is None:
+        return
+    if update_fields is not None and not set(update_fields) & set(CAMPOS_RESUMEN):
+        return
+    instance._resumen_anterior = Inspection.objects.filter(
+        pk=instance.pk, sampling_result__isnull=False
+    ).values_list(
+        'fecha', 'establishment_id', 'especie', 'tamano_lote',
+        'sampling_result__tipo_tabla', 'sampling_result__tamano_muestra'
+    ).first()
+
+
+def al_guardar_inspeccion(sender, instance, created=False, raw=False, **kwargs):
+    """Mueve el aporte de la inspección a su nueva fila del resumen."""
+    anterior = instance.__dict__.pop('_resumen_anterior', None)
+    if created or raw or anterior is None:
+        return
+    *aporte_anterior, tipo_tabla, muestreadas = anterior
+    if tuple(aporte_anterior) == _aporte(instance):
+        return
+
+    fecha, establishment_id, especie, cajas = aporte_anterior
+    with transaction.atomic():
+        InspectionDailySummary.descontar(fecha, establishment_id, especie, tipo_tabla, cajas, muestreadas)
+        fecha, establishment_id, especie, cajas = _aporte(instance)
+        InspectionDailySummary._sumar(fecha, establishment_id, especie, tipo_tabla, 1, cajas, muestreadas)
+
+
+def al_borrar_resultado(sender, instance, **kwargs):
+    """Resta la inspección del resumen cuando se borra su muestreo."""
+    # Al borrar en cascada, el resultado se elimina antes que la inspección
+    fila = Inspection.objects.filter(pk=instance.inspection_id).values_list(
+        'fecha', 'establishment_id', 'especie', 'tamano_lote'
+    ).first()
+    if fila is None:
+        return
+    fecha, establishment_id, especie, cajas = fila
+    InspectionDailySummary.descontar(
+        fecha, establishment_id, especie, instance.tipo_tabla, cajas, instance.tamano_muestra
+    )
+
+
+def conectar():
+    """Conecta las señales (llamado desde InspectionsConfig.ready)."""
+    pre_save.connect(antes_de_guardar_inspeccion, sender=Inspection, dispatch_uid='inspections.resumen.pre_save')
+    post_save.connect(al_guardar_inspeccion, sender=Inspection, dispatch_uid='inspections.resumen.post_save')
+    post_delete.connect(al_borrar_resultado, sender=SamplingResult, dispatch_uid='inspections.resumen.post_delete')
@@ -1,8 +1,11 @@
 """
 Serializers para la API REST.
 """
+import json
+
 from rest_framework import serializers
 from .models import Establishment, Inspection, SamplingResult
+from .utils import construir_diagrama_pallets
 
 
 class EstablishmentSerializer(serializers.ModelSerializer):
@@ -51,17 +54,16 @@ class InspectionSerializer(serializers.ModelSerializer):
         return value
 
 
-class SamplingResultSerializer(serializers.ModelSerializer):
+class SamplingResultResumenSerializer(serializers.ModelSerializer):
     """
-    Serializer para el modelo SamplingResult.
+    SamplingResult sin los datos de la inspección (ya vienen en el paquete).
     """
     cajas_list = serializers.SerializerMethodField()
-    inspection_data = InspectionSerializer(source='inspection', read_only=True)
     
     class Meta:
         model = SamplingResult
         fields = [
-            'id', 'inspection', 'inspection_data', 'porcentaje_muestreo',
+            'id', 'inspection', 'porcentaje_muestreo',
             'tipo_tabla', 'nombre_tabla',
             'tamano_muestra', 'cajas_seleccionadas', 'cajas_list',
             'created_at'
@@ -72,6 +74,50 @@ class SamplingResultSerializer(serializers.ModelSerializer):
         return obj.get_cajas_list()
 
 
+class SamplingResultSerializer(SamplingResultResumenSerializer):
+    """
+    Serializer para el modelo SamplingResult.
+    """
+    inspection_data = InspectionSerializer(source='inspection', read_only=True)
+    
+    class Meta(SamplingResultResumenSerializer.Meta):
+        fields = [
+            'id', 'inspection', 'inspection_data', 'porcentaje_muestreo',
+            'tipo_tabla', 'nombre_tabla',
+            'tamano_muestra', 'cajas_seleccionadas', 'cajas_list',
+            'created_at'
+        ]
+
+
+class InspectionBundleSerializer(InspectionSerializer):
+    """
+    Inspección con su resultado de muestreo y el diagrama de pallets.
+    
+    La inspección debe venir de `select_related(*RELACIONES)`: así no se
+    consulta la base de datos al serializar. `sampling_result` es null si la
+    inspección no tiene resultado, y `layout` si además faltan las
+    configuraciones de pallets.
+    """
+    RELACIONES = ('establishment', 'sampling_result')
+    
+    sampling_result = SamplingResultResumenSerializer(read_only=True)
+    layout = serializers.SerializerMethodField()
+    
+    class Meta(InspectionSerializer.Meta):
+        fields = InspectionSerializer.Meta.fields + ['sampling_result', 'layout']
+    
+    def get_layout(self, obj):
+        sampling_result = getattr(obj, 'sampling_result', None)
+        if sampling_result is None or not obj.pallet_configurations:
+            return None
+        return construir_diagrama_pallets(
+            obj.tipo_muestreo,
+            obj.pallet_configurations,
+            obj.selected_pallets,
+            json.loads(sampling_result.cajas_seleccionadas)
+        )
+
+
 class GenerarMuestreoSerializer(serializers.Serializer):
     """
     Serializer para el endpoint de generación de muestreo.
@@ -2,23 +2,45 @@
 Serializers para el panel de administración.
 """
 from rest_framework import serializers
+from django.conf import settings
 from django.contrib.auth.models import User
 from django.contrib.auth.hashers import make_password
+from django.core.cache import cache
+from django.core.files.storage import default_storage
+from django.utils import timezone
+from datetime import timedelta
+from .authentication import obtener_principal
+from .imagenes import mapear_renditions
 from .models import Establishment, EstablishmentTheme, UserProfile
 
 
+class RenditionsField(serializers.Field):
+    """URLs de las versiones redimensionadas guardadas en `renditions`."""
+    
+    def __init__(self, **kwargs):
+        kwargs['read_only'] = True
+        super().__init__(**kwargs)
+    
+    def to_representation(self, value):
+        request = self.context.get('request')
+        if request is None:
+            return mapear_renditions(value, default_storage.url)
+        return mapear_renditions(value, lambda nombre: request.build_absolute_uri(default_storage.url(nombre)))
+
+
 class UserProfileSerializer(serializers.ModelSerializer):
     """Serializer para perfil de usuario."""
     username = serializers.CharField(source='user.username', read_only=True)
     email = serializers.EmailField(source='user.email', read_only=True)
     first_name = serializers.CharField(source='user.first_name', read_only=True)
     last_name = serializers.CharField(source='user.last_name', read_only=True)
+    renditions = RenditionsField()
     
     class Meta:
         model = UserProfile
         fields = [
             'id', 'username', 'email', 'first_name', 'last_name',
-            'role', 'phone', 'avatar', 'created_at'
+            'role', 'phone', 'avatar', 'renditions', 'created_at'
         ]
 
 
@@ -42,33 +64,60 @@ class UserSerializer(serializers.ModelSerializer):
     
     def get_role(self, obj):
         """Obtiene el rol del perfil del usuario."""
-        if hasattr(obj, 'profile'):
-            return obj.profile.role
-        return None
+        return obtener_principal(obj).role
     
     def get_is_superadmin(self, obj):
         """Verifica si el usuario es superadmin."""
-        if hasattr(obj, 'profile'):
-            return obj.profile.is_superadmin()
-        return False
+        return obtener_principal(obj).is_superadmin()
     
     def get_is_establishment_admin(self, obj):
         """Verifica si el usuario es admin de establecimiento."""
-        if hasattr(obj, 'profile'):
-            return obj.profile.is_establishment_admin()
-        return False
+        return obtener_principal(obj).is_establishment_admin()
 
 
 class EstablishmentThemeSerializer(serializers.ModelSerializer):
     """Serializer para tema de establecimiento."""
+    renditions = RenditionsField()
     
     class Meta:
         model = EstablishmentTheme
         fields = [
             'id', 'primary_color', 'secondary_color', 'accent_color',
-            'logo', 'logo_dark', 'favicon', 'company_name',
-            'welcome_message', 'footer_text', 'show_logo', 'dark_mode'
+            'logo', 'logo_dark', 'favicon', 'renditions', 'company_name',
+            'welcome_message', 'footer_text', 'show_logo', 'dark_mode',
+            'version'
         ]
+        read_only_fields = ['version']
+
+
+def tema_cacheado(establishment_id):
+    """
+    Payload serializado del tema de un establecimiento. Se consulta solo la
+    versión del tema y el payload se cachea por versión: cada guardado la
+    incrementa, por lo que ningún proceso sirve un tema desactualizado.
+    
+    Returns:
+        dict: {'version', 'etag', 'data'} o None si el establecimiento no tiene tema
+    """
+    version = EstablishmentTheme.objects.filter(
+        establishment_id=establishment_id
+    ).values_list('version', flat=True).first()
+    if version is None:
+        return None
+    clave = EstablishmentTheme.clave_cache(establishment_id, version)
+    entrada = cache.get(clave)
+    if entrada is None:
+        theme = EstablishmentTheme.objects.filter(establishment_id=establishment_id).first()
+        if theme is None:
+            return None
+        clave = EstablishmentTheme.clave_cache(establishment_id, theme.version)
+        entrada = {
+            'version': theme.version,
+            'etag': f'"tema-{establishment_id}-v{theme.version}"',
+            'data': dict(EstablishmentThemeSerializer(theme).data),
+        }
+        cache.set(clave, entrada, settings.THEME_CACHE_TTL)
+    return entrada
 
 
 class EstablishmentDetailSerializer(serializers.ModelSerializer):
@@ -191,9 +240,7 @@ class EstablishmentCreateSerializer(serializers.ModelSerializer):
             establishment=establishment
         )
         
-        # Crear tema por defecto
-        EstablishmentTheme.objects.create(establishment=establishment)
-        
+        # El tema por defecto lo crea Establishment.save()
         return establishment
 
 
@@ -205,3 +252,25 @@ class DashboardStatsSerializer(serializers.Serializer):
     expired_establishments = serializers.IntegerField()
     total_inspections = serializers.IntegerField()
     inspections_this_month = serializers.IntegerField()
+
+
+class AnalyticsQuerySerializer(serializers.Serializer):
+    """Serializer para los parámetros de consulta de analytics."""
+    GRANULARIDADES = ['dia', 'semana']
+    
+    desde = serializers.DateField(required=False)
+    hasta = serializers.DateField(required=False)
+    granularidad = serializers.ChoiceField(choices=GRANULARIDADES, default='dia')
+    limite = serializers.IntegerField(min_value=1, max_value=100, default=10)
+    
+    def validate(self, attrs):
+        """Completa el rango por defecto (últimos 30 días) y valida su orden."""
+        hasta = attrs.get('hasta') or timezone.now().date()
+        desde = attrs.get('desde') or hasta - timedelta(days=29)
+        if desde > hasta:
+            raise serializers.ValidationError('La fecha inicial no puede ser posterior a la final')
+        if (hasta - desde).days > 366:
+            raise serializers.ValidationError('El rango máximo es de un año')
+        attrs['desde'] = desde
+        attrs['hasta'] = hasta
+        return attrs
@@ -0,0 +1,100 @@
+"""
+Caché en memoria del estado de suscripción de los establecimientos.
+
+Mantiene {establishment_id: (estado, expiración, is_active)} por proceso,
+cargado en bloque con una sola consulta y recargado cada
+SUBSCRIPTION_CACHE_TTL segundos, para que verificar la suscripción en cada
+request no consulte la base de datos.
+
+`invalidar()` fuerza la recarga en este proceso e incrementa un contador de
+generación en la caché de Django, con el que los demás procesos detectan el
+cambio (si la caché es compartida; con LocMem, a más tardar al vencer el TTL).
+"""
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils import timezone
+
+CLAVE_GENERACION = 'suscripciones:generacion'
+
+
+class CacheSuscripciones:
+    """Snapshot del estado de suscripción de todos los establecimientos."""
+
+    def __init__(self):
+        self._datos = {}
+        self._cargado_en = None
+        self._generacion = None
+        self._lock = threading.Lock()
+
+    def _vigente(self):
+        if self._cargado_en is None:
+            return False
+        if time.monotonic() - self._cargado_en >= settings.SUBSCRIPTION_CACHE_TTL:
+            return False
+        return cache.get(CLAVE_GENERACION, 0) == self._generacion
+
+    def _cargar(self):
+        from .models import Establishment
+
+        generacion = cache.get(CLAVE_GENERACION, 0)
+        datos = {
+            establishment_id: (estado, expiracion, activo)
+            for establishment_id, estado, expiracion, activo in Establishment.objects.values_list(
+                'id', 'subscription_status', 'subscription_expiry', 'is_active'
+            ).iterator()
+        }
+        self._datos = datos
+        self._generacion = generacion
+        self._cargado_en = time.monotonic()
+
+    def _cargar_uno(self, establishment_id):
+        """Establecimiento creado después del último snapshot."""
+        from .models import Establishment
+
+        fila = Establishment.objects.filter(pk=establishment_id).values_list(
+            'subscription_status', 'subscription_expiry', 'is_active'
+        ).first()
+        if fila is not None:
+            self._datos[establishment_id] = fila
+        return fila
+
+    def estado(self, establishment_id):
+        """
+        Returns:
+            tuple: (estado, expiración, is_active) o None si el establecimiento no existe
+        """
+        with self._lock:
+            if not self._vigente():
+                self._cargar()
+            fila = self._datos.get(establishment_id)
+            if fila is None:
+                fila = self._cargar_uno(establishment_id)
+            return fila
+
+    def activa(self, establishment_id):
+        """
+        Misma regla que Establishment.has_active_subscription, exigiendo
+        además que el establecimiento esté activo.
+        """
+        fila = self.estado(establishment_id)
+        if fila is None:
+            return False
+        estado, expiracion, activo = fila
+        if not activo or estado != 'ACTIVE':
+            return False
+        return not (expiracion and expiracion < timezone.now().date())
+
+    def invalidar(self):
+        """Descarta el snapshot aquí y avisa a los demás procesos."""
+        with self._lock:
+            self._cargado_en = None
+        try:
+            cache.incr(CLAVE_GENERACION)
+        except ValueError:
+            cache.set(CLAVE_GENERACION, 1, None)
+
+
+suscripciones = CacheSuscripciones()
@@ -1,12 +1,52 @@
 """
 Tests para el sistema de inspecciones.
 """
-from django.test import TestCase
+from asgiref.sync import async_to_sync, sync_to_async
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import connection, models
+from django.db.models import F
+from django.db.utils import ConnectionHandler
+from django.test import AsyncRequestFactory, RequestFactory, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.utils import timezone
-from datetime import timedelta
-from .models import Establishment, Inspection, SamplingResult
+from datetime import date, datetime, time as dt_time, timedelta
+from decimal import Decimal
+from rest_framework.exceptions import ParseError
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken, OutstandingToken
+from rest_framework_simplejwt.tokens import AccessToken
+from .middleware import histograma
+from .renderers import ORJSONRenderer, ORJSONParser
+from .models import (
+    Establishment, EstablishmentTheme, Inspection, SamplingResult, InspectionDailySummary, UserProfile
+)
 from .utils import calcular_muestreo, generar_cajas_aleatorias, validar_datos_inspeccion
+from .authentication import obtener_principal
+from .checks import revisar_despliegue
+from .conexiones import contador as contador_conexiones
+from .serializers_admin import EstablishmentThemeSerializer, tema_cacheado
+from .suscripciones import suscripciones
+from .ultimo_acceso import buffer as buffer_ultimo_acceso, registrar_login
+from .views import InspectionViewSet, servir_media
+from . import importacion, views as views_module
+from . import views_async
+from config.despliegue import perfil_gunicorn
+import io
 import json
+import tempfile
+import time
+import uuid
+import zipfile
+from unittest import mock
+from io import BytesIO, StringIO
+from pathlib import Path
+from PIL import Image
 
 
 class EstablishmentModelTest(TestCase):
@@ -179,3 +219,1417 @@ class ValidationTest(TestCase):
         
         es_valido, errores = validar_datos_inspeccion(data)
         self.assertFalse(es_valido)
+
+
+class QueryIndexUsageTest(TestCase):
+    """Verifica con EXPLAIN que el planificador usa los índices de las consultas frecuentes"""
+    
+    @classmethod
+    def setUpTestData(cls):
+        hoy = timezone.now().date()
+        cls.establishments = [
+            Establishment.objects.create(
+                planta_fruticola=f'Planta {i}',
+                subscription_status='ACTIVE' if i % 3 else 'EXPIRED',
+                subscription_expiry=hoy + timedelta(days=i - 5),
+                license_key=f'IDX-KEY-{i:03d}'
+            )
+            for i in range(10)
+        ]
+        especies = ['Cereza', 'Ciruela', 'Manzana', 'Uva de Mesa', 'Kiwi']
+        Inspection.objects.bulk_create([
+            Inspection(
+                exportador=f'Exportador {i % 7}',
+                establishment=cls.establishments[i % 10],
+                inspector_sag='Inspector',
+                contraparte_sag='Contraparte',
+                fecha=hoy - timedelta(days=i % 60),
+                especie=especies[i % 5],
+                numero_lote=f'LOTE-{i:05d}',
+                tamano_lote=1000,
+                tipo_muestreo='NORMAL' if i % 4 else 'POR_ETAPA',
+                tipo_despacho='Marítimo',
+                cantidad_pallets=10
+            )
+            for i in range(500)
+        ])
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE')
+    
+    def assertUsesIndex(self, queryset, *index_names):
+        """Falla si el plan de la consulta no menciona ninguno de los índices dados."""
+        if connection.vendor == 'postgresql':
+            # Con pocas filas PostgreSQL prefiere un seq scan; forzar la evaluación de índices
+            with connection.cursor() as cursor:
+                cursor.execute('SET enable_seqscan = off')
+        plan = queryset.explain()
+        self.assertTrue(
+            any(name in plan for name in index_names),
+            f"El plan no usa {index_names}:\n{plan}"
+        )
+    
+    def test_inspecciones_por_establecimiento(self):
+        """Listado de un establecimiento ordenado por creación"""
+        qs = Inspection.objects.filter(establishment=self.establishments[0]).order_by('-created_at')
+        self.assertUsesIndex(qs, 'insp_estab_created_idx')
+    
+    def test_inspecciones_por_especie_y_fecha(self):
+        """Filtro de temporada por especie y rango de fechas"""
+        desde = timezone.now().date() - timedelta(days=7)
+        qs = Inspection.objects.filter(especie='Cereza', fecha__gte=desde)
+        self.assertUsesIndex(qs, 'insp_especie_fecha_idx')
+    
+    def test_inspecciones_del_mes(self):
+        """Conteo del dashboard por fecha de creación"""
+        desde = timezone.now() - timedelta(days=3)
+        qs = Inspection.objects.filter(created_at__gte=desde)
+        self.assertUsesIndex(qs, 'insp_created_idx')
+    
+    def test_establecimientos_por_vencer(self):
+        """Suscripciones activas que vencen en los próximos días"""
+        hoy = timezone.now().date()
+        qs = Establishment.objects.filter(
+            subscription_status='ACTIVE',
+            subscription_expiry__gte=hoy,
+            subscription_expiry__lte=hoy + timedelta(days=7)
+        )
+        self.assertUsesIndex(qs, 'estab_active_expiry_idx', 'estab_status_expiry_idx')
+
+
+class InspectionDailySummaryTest(TestCase):
+    """Tests para el resumen diario de inspecciones"""
+    
+    def generar(self, especie, tamano_lote, numero_lote):
+        response = self.client.post('/api/muestreo/generar/', {
+            'exportador': 'Exportadora Test',
+            'establecimiento_nombre': 'Planta Test',
+            'inspector_sag': 'Inspector Test',
+            'contraparte_sag': 'Contraparte Test',
+            'especie': especie,
+            'numero_lote': numero_lote,
+            'tamano_lote': tamano_lote,
+            'tipo_muestreo': 'NORMAL',
+            'tipo_despacho': 'Marítimo',
+            'cantidad_pallets': 10,
+        }, content_type='application/json')
+        self.assertEqual(response.status_code, 201)
+        return response.json()['data']
+    
+    def test_generar_muestreo_actualiza_resumen(self):
+        """Verifica que cada muestreo suma al resumen de su día"""
+        a = self.generar('Uva de Mesa', 1000, 'LOTE-1')
+        b = self.generar('Uva de Mesa', 500, 'LOTE-2')
+        self.generar('Cereza', 300, 'LOTE-3')
+        
+        resumen = InspectionDailySummary.objects.get(
+            fecha=timezone.now().date(),
+            establishment__isnull=True,
+            especie='Uva de Mesa'
+        )
+        self.assertEqual(resumen.cantidad_inspecciones, 2)
+        self.assertEqual(resumen.total_cajas, 1500)
+        self.assertEqual(
+            resumen.total_cajas_muestreadas,
+            a['sampling_result']['tamano_muestra'] + b['sampling_result']['tamano_muestra']
+        )
+        self.assertEqual(InspectionDailySummary.objects.count(), 2)
+    
+    def test_rebuild_reproduce_resumen_incremental(self):
+        """Verifica que la reconstrucción coincide con el mantenimiento incremental"""
+        for i in range(3):
+            self.generar('Uva de Mesa', 400 + i, f'LOTE-{i}')
+        campos = ('fecha', 'especie', 'tipo_tabla', 'cantidad_inspecciones', 'total_cajas', 'total_cajas_muestreadas')
+        incremental = list(InspectionDailySummary.objects.values_list(*campos))
+        
+        hoy = timezone.now().date().isoformat()
+        call_command('rebuild_daily_summary', '--desde', hoy, '--hasta', hoy, stdout=StringIO())
+        
+        self.assertEqual(list(InspectionDailySummary.objects.values_list(*campos)), incremental)
+    
+    def test_editar_y_borrar_actualizan_resumen(self):
+        """Verifica que editar o borrar inspecciones mantiene el resumen igual a una reconstrucción"""
+        campos = ('fecha', 'establishment_id', 'especie', 'tipo_tabla', 'cantidad_inspecciones', 'total_cajas', 'total_cajas_muestreadas')
+        
+        def assert_igual_a_reconstruir():
+            incremental = set(InspectionDailySummary.objects.values_list(*campos))
+            InspectionDailySummary.reconstruir()
+            self.assertEqual(incremental, set(InspectionDailySummary.objects.values_list(*campos)))
+        
+        a = self.generar('Uva de Mesa', 1000, 'LOTE-1')['inspection']['id']
+        b = self.generar('Uva de Mesa', 500, 'LOTE-2')['inspection']['id']
+        c = self.generar('Cereza', 300, 'LOTE-3')['inspection']['id']
+        establishment = Establishment.objects.create(planta_fruticola='Planta Resumen', license_key='RESUMEN-1')
+        client = APIClient()
+        client.force_authenticate(User.objects.create_user(username='editor', password='x'))
+        
+        response = client.patch(f'/api/inspections/{a}/', {'especie': 'Cereza', 'tamano_lote': 1200}, format='json')
+        self.assertEqual(response.status_code, 200)
+        assert_igual_a_reconstruir()
+        
+        # Cambio desde el admin o la shell
+        inspection = Inspection.objects.get(pk=b)
+        inspection.fecha = timezone.now().date() - timedelta(days=1)
+        inspection.establishment = establishment
+        inspection.save()
+        assert_igual_a_reconstruir()
+        
+        self.assertEqual(client.delete(f'/api/inspections/{c}/').status_code, 204)
+        assert_igual_a_reconstruir()
+        Inspection.objects.filter(pk=b).delete()
+        assert_igual_a_reconstruir()
+        self.assertEqual(
+            list(InspectionDailySummary.objects.values_list('especie', 'cantidad_inspecciones', 'total_cajas')),
+            [('Cereza', 1, 1200)]
+        )
+    
+    def test_configurar_pallets_no_consulta_el_resumen(self):
+        """Verifica que guardar campos ajenos al resumen no agrega consultas"""
+        inspection = Inspection.objects.get(pk=self.generar('Cereza', 300, 'LOTE-1')['inspection']['id'])
+        with self.assertNumQueries(1):
+            inspection.save(update_fields=['pallet_configurations', 'updated_at'])
+
+
+class AdminAnalyticsTest(TestCase):
+    """Tests para los endpoints de analytics de temporada"""
+    
+    def setUp(self):
+        cache.clear()
+        self.admin = User.objects.create_user(username='superadmin', password='x')
+        UserProfile.objects.create(user=self.admin, role='SUPERADMIN')
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+        
+        hoy = timezone.now().date()
+        self.hoy = hoy
+        datos = [
+            # (fecha, exportador, especie, tipo_tabla, cajas, muestra)
+            (hoy, 'Exp A', 'Uva de Mesa', 'HIPERGEOMETRICA_6', 1000, 20),
+            (hoy, 'Exp A', 'Uva de Mesa', 'HIPERGEOMETRICA_6', 500, 10),
+            (hoy - timedelta(days=1), 'Exp B', 'Cereza', 'HIPERGEOMETRICA_6', 300, 6),
+            (hoy - timedelta(days=1), 'Exp A', 'Kiwi', 'UNIFORME', 400, 4),
+        ]
+        for i, (fecha, exportador, especie, tabla, cajas, muestra) in enumerate(datos):
+            inspection = Inspection.objects.create(
+                exportador=exportador, inspector_sag='I', contraparte_sag='C',
+                especie=especie, numero_lote=f'L-{i}', tamano_lote=cajas,
+                tipo_despacho='Marítimo', cantidad_pallets=1, fecha=fecha
+            )
+            SamplingResult.objects.create(
+                inspection=inspection, tipo_tabla=tabla,
+                tamano_muestra=muestra, cajas_seleccionadas='[]'
+            )
+        InspectionDailySummary.reconstruir()
+    
+    def test_requiere_superadmin(self):
+        """Verifica que los endpoints son solo para superadmin"""
+        response = APIClient().get('/api/admin/analytics/series/')
+        self.assertIn(response.status_code, (401, 403))
+    
+    def test_series_por_dia(self):
+        """Verifica la serie diaria de inspecciones y cajas"""
+        response = self.client.get('/api/admin/analytics/series/')
+        self.assertEqual(response.status_code, 200)
+        resultados = response.json()['resultados']
+        self.assertEqual([r['inspecciones'] for r in resultados], [2, 2])
+        self.assertEqual(resultados[-1]['cajas'], 1500)
+        self.assertEqual(resultados[-1]['cajas_muestreadas'], 30)
+    
+    def test_proporcion_por_tabla(self):
+        """Verifica la proporción de muestreo agregada por tipo de tabla"""
+        response = self.client.get('/api/admin/analytics/tablas/')
+        tablas = {r['tipo_tabla']: r for r in response.json()['resultados']}
+        self.assertAlmostEqual(tablas['HIPERGEOMETRICA_6']['proporcion_muestreo'], 36 / 1800)
+        self.assertAlmostEqual(tablas['UNIFORME']['proporcion_muestreo'], 0.01)
+    
+    def test_top_exportadores_y_cache(self):
+        """Verifica el ranking de exportadores y que la respuesta queda cacheada"""
+        url = '/api/admin/analytics/exportadores/?limite=1'
+        response = self.client.get(url)
+        self.assertEqual(response.json()['resultados'], [
+            {'exportador': 'Exp A', 'inspecciones': 3, 'cajas': 1900, 'cajas_muestreadas': 34}
+        ])
+        with self.assertNumQueries(0):
+            self.assertEqual(self.client.get(url).json(), response.json())
+    
+    def test_rango_invalido(self):
+        """Verifica que rechaza rangos invertidos"""
+        response = self.client.get('/api/admin/analytics/series/?desde=2024-02-01&hasta=2024-01-01')
+        self.assertEqual(response.status_code, 400)
+
+
+class SeedBenchmarkCommandTest(TestCase):
+    """Tests para el generador de datos sintéticos"""
+    
+    def test_seed_genera_datos_consistentes(self):
+        """Verifica volumen, resultados de muestreo y resumen diario"""
+        call_command('seed_benchmark', '--establecimientos', '3', '--inspecciones', '120',
+                     '--batch-size', '50', '--seed', '5', stdout=StringIO())
+        
+        self.assertEqual(Establishment.objects.filter(license_key__startswith='BENCH-').count(), 3)
+        self.assertEqual(Inspection.objects.count(), 120)
+        self.assertEqual(SamplingResult.objects.count(), 120)
+        
+        for sr in SamplingResult.objects.select_related('inspection')[:20]:
+            cajas = sr.get_cajas_list()
+            self.assertEqual(len(cajas), sr.tamano_muestra)
+            self.assertLessEqual(max(cajas), sr.inspection.tamano_lote)
+        
+        total = InspectionDailySummary.objects.aggregate(n=models.Sum('cantidad_inspecciones'))['n']
+        self.assertEqual(total, 120)
+    
+    def test_seed_es_determinista(self):
+        """Verifica que la misma semilla produce los mismos lotes"""
+        def generar():
+            call_command('seed_benchmark', '--establecimientos', '2', '--inspecciones', '30',
+                         '--seed', '9', '--limpiar', stdout=StringIO())
+            return list(
+                Inspection.objects.order_by('numero_lote')
+                .values_list('especie', 'tamano_lote', 'fecha', 'sampling_result__cajas_seleccionadas')
+            )
+        
+        self.assertEqual(generar(), generar())
+
+
+@override_settings(
+    MIDDLEWARE=['inspections.middleware.ProfilingMiddleware'] + settings.MIDDLEWARE,
+    PROFILING_SLOW_MS=10000,
+    PROFILING_SAMPLE_EVERY=0,
+)
+class ProfilingMiddlewareTest(TestCase):
+    """Tests para el middleware de perfilado"""
+    
+    def setUp(self):
+        histograma.reiniciar()
+    
+    def test_server_timing_y_histograma(self):
+        """Verifica la cabecera Server-Timing y el histograma por endpoint"""
+        response = self.client.get('/api/establishments/')
+        self.assertRegex(response['Server-Timing'], r'db;dur=[\d.]+;desc="\d+ consultas", app;dur=[\d.]+, total;dur=[\d.]+')
+        self.client.get('/api/establishments/')
+        
+        admin = User.objects.create_user(username='superadmin', password='x')
+        UserProfile.objects.create(user=admin, role='SUPERADMIN')
+        client = APIClient()
+        client.force_authenticate(admin)
+        endpoints = client.get('/api/admin/profiling/').json()['endpoints']
+        self.assertEqual(endpoints['GET /api/establishments/']['requests'], 2)
+        
+        self.assertIn(APIClient().get('/api/admin/profiling/').status_code, (401, 403))
+    
+    def test_server_timing_conexion(self):
+        """Verifica que Server-Timing indica si se reutilizó la conexión"""
+        # En TestCase la conexión sigue abierta entre requests
+        response = self.client.get('/api/establishments/')
+        self.assertIn('conn;desc="reutilizada"', response['Server-Timing'])
+    
+    def test_request_lento_registra_consultas(self):
+        """Verifica que los requests lentos se registran con su SQL"""
+        with self.settings(PROFILING_SLOW_MS=0), self.assertLogs('inspections.profiling', 'WARNING') as logs:
+            self.client.get('/api/establishments/')
+        self.assertIn('inspections_establishment', logs.output[0])
+    
+    def test_muestreo_guarda_stacks(self):
+        """Verifica que el muestreo escribe stacks en formato folded"""
+        with tempfile.TemporaryDirectory() as directorio:
+            with self.settings(PROFILING_SAMPLE_EVERY=1, PROFILING_SAMPLE_INTERVAL=0.0005, PROFILING_DIR=directorio):
+                for i in range(3):
+                    self.generar_lento()
+            archivos = list(Path(directorio).glob('*.folded'))
+            self.assertEqual(len(archivos), 3)
+            lineas = [l for a in archivos for l in a.read_text().splitlines()]
+            self.assertTrue(lineas)
+            self.assertRegex(lineas[0], r'^\S+:\S+(;\S+:\S+)* \d+$')
+    
+    def generar_lento(self):
+        # La espera tiene que ocurrir dentro del request para que haya muestras
+        original = InspectionViewSet.list
+        
+        def lista_lenta(viewset, request, *args, **kwargs):
+            time.sleep(0.01)
+            return original(viewset, request, *args, **kwargs)
+        
+        with mock.patch.object(InspectionViewSet, 'list', lista_lenta):
+            self.client.get('/api/inspections/')
+
+
+class ORJSONRendererTest(TestCase):
+    """Tests de compatibilidad del renderer/parser orjson con los de DRF"""
+    
+    def payload(self):
+        return {
+            'fecha': date(2026, 1, 15),
+            'creado': datetime(2026, 1, 15, 10, 30, 45, 123456),
+            'hora': dt_time(8, 5, 1, 999999),
+            'porcentaje': Decimal('2.50'),
+            'id': uuid.UUID('12345678-1234-5678-1234-567812345678'),
+            'sample_distribution': {3: 12, 7: 11},
+            'texto': 'Ñuble — línea\u2028separada\u2029',
+            'cajas': [1, 2, 3],
+            'tupla': (1.5, None, True),
+            'vacio': {},
+        }
+    
+    def test_salida_identica_a_drf(self):
+        """Verifica que la salida es byte a byte igual a JSONRenderer"""
+        datos = self.payload()
+        self.assertEqual(ORJSONRenderer().render(datos), JSONRenderer().render(datos))
+    
+    def test_floats_comparados_con_drf(self):
+        """Verifica floats y nulls frente a JSONRenderer, incluidos NaN e infinitos"""
+        datos = {'floats': [0.1, 1 / 3, 2.5, -0.0, 1e-4, 123456.789, 1e15], 'nulo': None,
+                 'filas': [{'p': 0.25, 'x': None}] * 3}
+        self.assertEqual(ORJSONRenderer().render(datos), JSONRenderer().render(datos))
+        
+        # Notación exponencial: distinta escritura, mismo valor
+        datos = {'grandes': [1e16, -1.5e300], 'chicos': [1e-5, 4.2e-7]}
+        self.assertEqual(json.loads(ORJSONRenderer().render(datos)), json.loads(JSONRenderer().render(datos)))
+        
+        casos = [{'v': Decimal('NaN')}]
+        for valor in (float('nan'), float('inf'), -float('inf')):
+            casos += [{'v': valor}, [{'cajas': [1, 2], 'v': [valor]}, None], {valor: 1, 'x': None}]
+        for datos in casos:
+            with self.subTest(datos=datos):
+                with self.assertRaisesMessage(ValueError, 'Out of range float values are not JSON compliant'):
+                    JSONRenderer().render(datos)
+                with self.assertRaisesMessage(ValueError, 'Out of range float values are not JSON compliant'):
+                    ORJSONRenderer().render(datos)
+    
+    def test_fallback_sin_orjson(self):
+        """Verifica el fallback a la implementación estándar"""
+        datos = self.payload()
+        with mock.patch('inspections.renderers.orjson', None):
+            self.assertEqual(ORJSONRenderer().render(datos), JSONRenderer().render(datos))
+            self.assertEqual(ORJSONParser().parse(BytesIO(b'{"a": [1, 2]}')), {'a': [1, 2]})
+    
+    def test_indent_y_enteros_grandes(self):
+        """Verifica los casos que delegan en DRF"""
+        self.assertEqual(
+            ORJSONRenderer().render({'a': 1}, 'application/json; indent=2'),
+            JSONRenderer().render({'a': 1}, 'application/json; indent=2')
+        )
+        self.assertEqual(ORJSONRenderer().render({'n': 2 ** 70}), b'{"n":1180591620717411303424}')
+    
+    def test_parser(self):
+        """Verifica el parseo y los errores de JSON inválido"""
+        self.assertEqual(ORJSONParser().parse(BytesIO('{"especie": "Ñame"}'.encode())), {'especie': 'Ñame'})
+        with self.assertRaises(ParseError):
+            ORJSONParser().parse(BytesIO(b'{"a": NaN}'))
+        with self.assertRaises(ParseError):
+            ORJSONParser().parse(BytesIO(b'{"a": '))
+
+
+class CompressionConditionalGetTest(TestCase):
+    """Tests de compresión negociada, ETag y cabeceras de caché"""
+    
+    def setUp(self):
+        inspection = Inspection.objects.create(
+            exportador='Exp', inspector_sag='I', contraparte_sag='C',
+            especie='Uva de Mesa', numero_lote='L-1', tamano_lote=5000,
+            tipo_despacho='Marítimo', cantidad_pallets=1, fecha=date(2026, 1, 15)
+        )
+        self.sampling_result = SamplingResult.objects.create(
+            inspection=inspection, tipo_tabla='HIPERGEOMETRICA_6', tamano_muestra=1000,
+            cajas_seleccionadas=json.dumps(list(range(1, 5001, 5)))
+        )
+        self.url = f'/api/sampling-results/{self.sampling_result.id}/'
+    
+    def test_gzip_sobre_umbral(self):
+        """Verifica que las respuestas grandes se comprimen con gzip"""
+        response = self.client.get(self.url, HTTP_ACCEPT_ENCODING='gzip')
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertIn('Accept-Encoding', response['Vary'])
+        self.assertNotIn('Content-Encoding', self.client.get(self.url))
+    
+    def test_sin_compresion_bajo_umbral(self):
+        """Verifica que las respuestas pequeñas no se comprimen"""
+        with self.settings(COMPRESSION_MIN_BYTES=10 ** 6):
+            response = self.client.get(self.url, HTTP_ACCEPT_ENCODING='gzip, br')
+        self.assertFalse(response.has_header('Content-Encoding'))
+    
+    def test_brotli_negociado(self):
+        """Verifica que se prefiere brotli si el cliente lo acepta"""
+        brotli = mock.Mock()
+        brotli.compress.return_value = b'comprimido'
+        with mock.patch('inspections.middleware.brotli', brotli):
+            response = self.client.get(self.url, HTTP_ACCEPT_ENCODING='gzip, br')
+            self.assertEqual(response['Content-Encoding'], 'br')
+            self.assertEqual(response.content, b'comprimido')
+            self.assertTrue(response['ETag'].startswith('W/'))
+            
+            response = self.client.get(self.url, HTTP_ACCEPT_ENCODING='gzip, br;q=0')
+            self.assertEqual(response['Content-Encoding'], 'gzip')
+    
+    def test_rutas_con_secretos_sin_comprimir(self):
+        """Verifica que login y refresh (JWT) no se comprimen con ninguna codificación"""
+        User.objects.create_user(username='compresion', password='clave-segura')
+        brotli = mock.Mock()
+        brotli.compress.return_value = b'comprimido'
+        with self.settings(COMPRESSION_MIN_BYTES=1), mock.patch('inspections.middleware.brotli', brotli):
+            for encoding in ('br', 'gzip'):
+                response = self.client.post(
+                    '/api/auth/login/', {'username': 'compresion', 'password': 'clave-segura'},
+                    content_type='application/json', HTTP_ACCEPT_ENCODING=encoding
+                )
+                self.assertEqual(response.status_code, 200)
+                self.assertFalse(response.has_header('Content-Encoding'))
+                self.assertIn('access', response.json())
+            self.assertEqual(self.client.get(self.url, HTTP_ACCEPT_ENCODING='br')['Content-Encoding'], 'br')
+        brotli.compress.assert_called_once()
+    
+    def test_etag_y_304(self):
+        """Verifica la revalidación con If-None-Match, también comprimida"""
+        etag = self.client.get(self.url)['ETag']
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.content, b'')
+        
+        etag_gzip = self.client.get(self.url, HTTP_ACCEPT_ENCODING='gzip')['ETag']
+        response = self.client.get(self.url, HTTP_ACCEPT_ENCODING='gzip', HTTP_IF_NONE_MATCH=etag_gzip)
+        self.assertEqual(response.status_code, 304)
+    
+    def test_cache_control(self):
+        """Verifica la caché corta y que editar la inspección cambia el ETag"""
+        response = self.client.get(self.url)
+        self.assertEqual(response['Cache-Control'], 'public, max-age=60')
+        self.assertFalse(response.has_header('Last-Modified'))
+        
+        Inspection.objects.filter(pk=self.sampling_result.inspection_id).update(cantidad_pallets=2)
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['inspection_data']['cantidad_pallets'], 2)
+
+
+class ThemeCacheTest(TestCase):
+    """Tests para la entrega cacheada y versionada del tema"""
+    
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='planta', password='x')
+        self.establishment = Establishment.objects.create(
+            planta_fruticola='Planta Tema',
+            admin_user=self.user,
+            license_key='TEST-KEY-TEMA'
+        )
+        self.theme = self.establishment.theme
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+    
+    def test_etag_y_cache(self):
+        """Verifica el ETag por versión, el 304 y que la segunda lectura no consulta el tema"""
+        response = self.client.get('/api/themes/my-theme/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['ETag'], f'"tema-{self.establishment.id}-v1"')
+        self.assertEqual(response.json()['version'], 1)
+        
+        # El establecimiento queda cargado en el usuario; solo se consulta la versión
+        with self.assertNumQueries(1):
+            response = self.client.get('/api/themes/my-theme/', HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, 304)
+    
+    def test_guardar_invalida(self):
+        """Verifica que guardar el tema incrementa la versión e invalida la caché"""
+        self.client.get('/api/themes/my-theme/')
+        self.theme.primary_color = '#000000'
+        self.theme.save()
+        self.assertEqual(self.theme.version, 2)
+        
+        response = self.client.get('/api/themes/my-theme/')
+        self.assertEqual(response['ETag'], f'"tema-{self.establishment.id}-v2"')
+        self.assertEqual(response.json()['primary_color'], '#000000')
+        self.assertEqual(
+            self.client.get('/api/users/current/me/').json()['establishment']['theme']['version'], 2
+        )
+    
+    def test_guardado_en_otro_proceso(self):
+        """Verifica que un cambio hecho sin pasar por esta caché (otro worker) se ve de inmediato"""
+        self.client.get('/api/themes/my-theme/')
+        EstablishmentTheme.objects.filter(pk=self.theme.pk).update(
+            primary_color='#123456', version=F('version') + 1
+        )
+        response = self.client.get('/api/themes/my-theme/')
+        self.assertEqual(response['ETag'], f'"tema-{self.establishment.id}-v2"')
+        self.assertEqual(response.json()['primary_color'], '#123456')
+    
+    def test_establecimiento_creado_desde_el_admin(self):
+        """Verifica que un establecimiento creado fuera del serializer también tiene tema"""
+        superusuario = User.objects.create_superuser(username='root', password='x')
+        self.client.force_login(superusuario)
+        response = self.client.post('/admin/inspections/establishment/add/', {
+            'planta_fruticola': 'Planta Admin', 'subscription_status': 'ACTIVE', 'is_active': 'on',
+        })
+        self.assertEqual(response.status_code, 302)
+        establishment = Establishment.objects.get(planta_fruticola='Planta Admin')
+        self.assertEqual(establishment.theme.version, 1)
+        
+        usuario = User.objects.create_user(username='planta-admin', password='x')
+        establishment.admin_user = usuario
+        establishment.save()
+        self.client.force_authenticate(usuario)
+        response = self.client.get('/api/themes/my-theme/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['ETag'], f'"tema-{establishment.id}-v1"')
+    
+    def test_guardados_concurrentes_no_pierden_versiones(self):
+        """Verifica que dos instancias guardadas a la vez incrementan la versión dos veces"""
+        otra = EstablishmentTheme.objects.get(pk=self.theme.pk)
+        self.theme.save()
+        otra.save()
+        self.assertEqual((self.theme.version, otra.version), (2, 3))
+        self.assertEqual(EstablishmentTheme.objects.get(pk=self.theme.pk).version, 3)
+    
+    def test_no_crea_tema(self):
+        """Verifica que my-theme no escribe si el establecimiento no tiene tema"""
+        self.theme.delete()
+        response = self.client.get('/api/themes/my-theme/')
+        self.assertEqual(response.status_code, 404)
+        self.assertFalse(EstablishmentTheme.objects.exists())
+    
+    def test_imagenes_con_hash_inmutables(self):
+        """Verifica el nombre por hash de contenido y la cabecera immutable"""
+        with tempfile.TemporaryDirectory() as media, self.settings(MEDIA_ROOT=media):
+            self.theme.logo = SimpleUploadedFile('Logo Planta.PNG', imagen_png(40, 20))
+            self.theme.save()
+            self.assertRegex(self.theme.logo.name, r'^logos/[0-9a-f]{20}\.png$')
+            
+            request = RequestFactory().get('/media/' + self.theme.logo.name)
+            response = servir_media(request, self.theme.logo.name)
+            self.assertIn('immutable', response['Cache-Control'])
+            
+            Path(media, 'logos', 'antiguo.png').write_bytes(b'x')
+            response = servir_media(RequestFactory().get('/media/logos/antiguo.png'), 'logos/antiguo.png')
+            self.assertFalse(response.has_header('Cache-Control'))
+
+
+def imagen_png(ancho, alto, exif=False):
+    """PNG en memoria; con `exif` agrega metadatos que deben eliminarse."""
+    imagen = Image.new('RGBA', (ancho, alto), (200, 30, 30, 255))
+    buffer = BytesIO()
+    if exif:
+        datos = Image.Exif()
+        datos[0x010F] = 'Camara'
+        imagen.save(buffer, 'PNG', exif=datos)
+    else:
+        imagen.save(buffer, 'PNG')
+    return buffer.getvalue()
+
+
+class ImageRenditionsTest(TestCase):
+    """Tests para el pipeline de versiones de imágenes"""
+    
+    def setUp(self):
+        cache.clear()
+        self.media = tempfile.TemporaryDirectory()
+        self.addCleanup(self.media.cleanup)
+        ajustes = self.settings(MEDIA_ROOT=self.media.name)
+        ajustes.enable()
+        self.addCleanup(ajustes.disable)
+        
+        self.establishment = Establishment.objects.create(
+            planta_fruticola='Planta Imágenes', license_key='TEST-KEY-IMG'
+        )
+        self.theme = self.establishment.theme
+    
+    def test_logo_y_favicon(self):
+        """Verifica anchos, formatos, ausencia de metadatos y el ICO del favicon"""
+        self.theme.logo = SimpleUploadedFile('logo.png', imagen_png(1600, 400, exif=True))
+        self.theme.favicon = SimpleUploadedFile('favicon.png', imagen_png(300, 300))
+        self.theme.save()
+        
+        logo = self.theme.renditions['logo']
+        self.assertEqual(set(logo), {'webp', 'png'})
+        self.assertEqual(set(logo['webp']), {'128', '256', '512'})
+        with default_storage.open(logo['webp']['256']) as f, Image.open(f) as imagen:
+            self.assertEqual(imagen.format, 'WEBP')
+            self.assertEqual(imagen.size, (256, 64))
+            self.assertNotIn('exif', imagen.info)
+        with default_storage.open(logo['png']['512']) as f, Image.open(f) as imagen:
+            self.assertFalse(imagen.getexif())
+        
+        favicon = self.theme.renditions['favicon']
+        with default_storage.open(favicon['ico']) as f, Image.open(f) as imagen:
+            self.assertEqual(imagen.format, 'ICO')
+            self.assertIn((16, 16), imagen.info['sizes'])
+        
+        data = EstablishmentThemeSerializer(self.theme).data
+        self.assertTrue(data['renditions']['logo']['webp']['128'].startswith('/media/renditions/'))
+        
+        # Quitar la imagen elimina sus versiones
+        self.theme.logo = None
+        self.theme.save()
+        self.assertNotIn('logo', self.theme.renditions)
+    
+    def test_imagen_invalida(self):
+        """Verifica que un archivo que no es imagen no rompe el guardado"""
+        self.theme.logo = SimpleUploadedFile('logo.png', b'no es una imagen')
+        with self.assertLogs('inspections.imagenes', 'WARNING'):
+            self.theme.save()
+        self.assertEqual(self.theme.renditions['logo'], {})
+    
+    def test_backfill(self):
+        """Verifica el comando que genera versiones de imágenes existentes"""
+        nombre = default_storage.save('avatars/antiguo.png', BytesIO(imagen_png(800, 800)))
+        user = User.objects.create_user(username='inspector', password='x')
+        UserProfile.objects.create(user=user, role='INSPECTOR')
+        UserProfile.objects.filter(user=user).update(avatar=nombre)
+        
+        out = StringIO()
+        call_command('generate_renditions', '--workers', '2', stdout=out)
+        self.assertIn('1 registros', out.getvalue())
+        avatar = UserProfile.objects.get(user=user).renditions['avatar']
+        self.assertEqual(set(avatar['webp']), {'64', '128', '256'})
+        
+        # Sin --forzar no vuelve a procesar
+        out = StringIO()
+        call_command('generate_renditions', stdout=out)
+        self.assertIn('No hay imágenes pendientes', out.getvalue())
+    
+    def test_backfill_invalida_tema_cacheado(self):
+        """Verifica que el comando publica las versiones aunque el tema esté en caché"""
+        nombre = default_storage.save('logos/antiguo.png', BytesIO(imagen_png(600, 150)))
+        EstablishmentTheme.objects.filter(pk=self.theme.pk).update(logo=nombre)
+        self.assertEqual(tema_cacheado(self.establishment.id)['data']['renditions'], {})
+        
+        call_command('generate_renditions', '--modelo', 'temas', stdout=StringIO())
+        tema = tema_cacheado(self.establishment.id)
+        self.assertEqual(tema['version'], 2)
+        self.assertIn('webp', tema['data']['renditions']['logo'])
+
+
+class PrincipalAuthenticationTest(TestCase):
+    """Tests para el principal cargado una vez por request"""
+    
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='planta', password='clave-segura')
+        self.establishment = Establishment.objects.create(
+            planta_fruticola='Planta Principal',
+            admin_user=self.user,
+            license_key='TEST-KEY-PRINCIPAL'
+        )
+        UserProfile.objects.create(user=self.user, role='ESTABLISHMENT_ADMIN', establishment=self.establishment)
+    
+    def login(self):
+        response = self.client.post(
+            '/api/auth/login/', {'username': 'planta', 'password': 'clave-segura'}, content_type='application/json'
+        )
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+    
+    def test_claims_y_login(self):
+        """Verifica los claims de rol y establecimiento y la respuesta de login"""
+        data = self.login()
+        token = AccessToken(data['access'])
+        self.assertEqual(token['role'], 'ESTABLISHMENT_ADMIN')
+        self.assertEqual(token['establishment_id'], self.establishment.id)
+        self.assertTrue(data['user']['is_establishment_admin'])
+        self.assertEqual(data['user']['establishment']['id'], self.establishment.id)
+    
+    def test_me_con_una_consulta_de_usuario(self):
+        """Verifica que perfil y establecimiento llegan con el usuario autenticado"""
+        access = self.login()['access']
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f'Bearer {access}')
+        client.get('/api/users/current/me/')  # llena la caché del tema
+        
+        # Usuario con sus relaciones y la versión del tema (clave de su caché)
+        with self.assertNumQueries(2):
+            response = client.get('/api/users/current/me/')
+        self.assertEqual(response.json()['role'], 'ESTABLISHMENT_ADMIN')
+        self.assertEqual(response.json()['establishment']['id'], self.establishment.id)
+        
+        # Sin perfil de superadmin: un solo SELECT también para rechazar
+        with self.assertNumQueries(1):
+            self.assertEqual(client.get('/api/admin/dashboard/stats/').status_code, 403)
+    
+    def test_usuario_sin_perfil(self):
+        """Verifica que la ausencia de relaciones también queda cacheada"""
+        user = User.objects.create_user(username='suelto', password='x')
+        with self.assertNumQueries(1):
+            principal = obtener_principal(user)
+            self.assertIsNone(principal.role)
+            self.assertIsNone(principal.establishment)
+            self.assertFalse(hasattr(user, 'profile'))
+        self.assertIs(obtener_principal(user), principal)
+
+
+class SubscriptionCacheTest(TestCase):
+    """Tests para el snapshot de suscripciones y su permiso"""
+    
+    def setUp(self):
+        cache.clear()
+        suscripciones.invalidar()
+        self.user = User.objects.create_user(username='inspector', password='x')
+        self.establishment = Establishment.objects.create(
+            planta_fruticola='Planta Suscripción',
+            subscription_status='ACTIVE',
+            subscription_expiry=timezone.now().date() + timedelta(days=5),
+            license_key='TEST-KEY-SUSC'
+        )
+        self.vencido = Establishment.objects.create(
+            planta_fruticola='Planta Vencida',
+            subscription_status='ACTIVE',
+            subscription_expiry=timezone.now().date() - timedelta(days=1),
+            license_key='TEST-KEY-VENC'
+        )
+        UserProfile.objects.create(user=self.user, role='INSPECTOR', establishment=self.establishment)
+        
+        self.admin = User.objects.create_user(username='superadmin', password='x')
+        UserProfile.objects.create(user=self.admin, role='SUPERADMIN')
+        self.admin_client = APIClient()
+        self.admin_client.force_authenticate(self.admin)
+    
+    def test_snapshot_sin_consultas(self):
+        """Verifica la carga en bloque y las consultas posteriores sin BD"""
+        with self.assertNumQueries(1):
+            self.assertTrue(suscripciones.activa(self.establishment.id))
+            self.assertFalse(suscripciones.activa(self.vencido.id))
+        with self.assertNumQueries(0):
+            self.assertTrue(suscripciones.activa(self.establishment.id))
+    
+    def test_ttl(self):
+        """Verifica que el snapshot se recarga al vencer el TTL"""
+        suscripciones.activa(self.establishment.id)
+        with self.settings(SUBSCRIPTION_CACHE_TTL=0), self.assertNumQueries(1):
+            suscripciones.activa(self.establishment.id)
+    
+    def test_suspender_y_activar_invalidan(self):
+        """Verifica que las acciones del superadmin invalidan el snapshot"""
+        self.assertTrue(suscripciones.activa(self.establishment.id))
+        self.admin_client.post(f'/api/admin/establishments/{self.establishment.id}/suspend/')
+        self.assertFalse(suscripciones.activa(self.establishment.id))
+        self.admin_client.post(f'/api/admin/establishments/{self.establishment.id}/activate/')
+        self.assertTrue(suscripciones.activa(self.establishment.id))
+        
+        self.assertFalse(suscripciones.activa(self.vencido.id))
+        self.admin_client.post(
+            f'/api/admin/establishments/{self.vencido.id}/renew_subscription/', {'days': 30}, format='json'
+        )
+        self.assertTrue(suscripciones.activa(self.vencido.id))
+    
+    def test_edicion_y_borrado_invalidan(self):
+        """Verifica que PATCH/PUT/DELETE del ViewSet también invalidan el snapshot"""
+        url = f'/api/admin/establishments/{self.establishment.id}/'
+        self.assertTrue(suscripciones.activa(self.establishment.id))
+        response = self.admin_client.patch(url, {'subscription_status': 'SUSPENDED'}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(suscripciones.activa(self.establishment.id))
+        
+        self.admin_client.patch(url, {'subscription_status': 'ACTIVE', 'is_active': False}, format='json')
+        self.assertFalse(suscripciones.activa(self.establishment.id))
+        self.admin_client.patch(url, {'is_active': True}, format='json')
+        self.assertTrue(suscripciones.activa(self.establishment.id))
+        
+        self.assertEqual(self.admin_client.delete(url).status_code, 204)
+        self.assertFalse(suscripciones.activa(self.establishment.id))
+    
+    def test_generar_requiere_suscripcion(self):
+        """Verifica que un usuario de un establecimiento suspendido no genera muestreos"""
+        client = APIClient()
+        client.force_authenticate(self.user)
+        datos = {
+            'exportador': 'Exportadora Test', 'establecimiento_nombre': 'Planta Test',
+            'inspector_sag': 'Inspector Test', 'contraparte_sag': 'Contraparte Test',
+            'especie': 'Cereza', 'numero_lote': 'L-1', 'tamano_lote': 500,
+            'tipo_muestreo': 'NORMAL', 'tipo_despacho': 'Marítimo', 'cantidad_pallets': 5,
+        }
+        self.assertEqual(client.post('/api/muestreo/generar/', datos, format='json').status_code, 201)
+        
+        self.admin_client.post(f'/api/admin/establishments/{self.establishment.id}/suspend/')
+        datos['numero_lote'] = 'L-2'
+        response = client.post('/api/muestreo/generar/', datos, format='json')
+        self.assertEqual(response.status_code, 403)
+        
+        # Los usuarios sin establecimiento (públicos) no se ven afectados
+        self.assertEqual(APIClient().post('/api/muestreo/generar/', datos, format='json').status_code, 201)
+
+
+class PruneTokensCommandTest(TestCase):
+    """Tests para la poda de tokens expirados"""
+    
+    def setUp(self):
+        user = User.objects.create_user(username='tablet', password='x')
+        ahora = timezone.now()
+        for i in range(5):
+            token = OutstandingToken.objects.create(
+                user=user, jti=f'expirado-{i}', token='x', expires_at=ahora - timedelta(days=1)
+            )
+            if i % 2 == 0:
+                BlacklistedToken.objects.create(token=token)
+        vigente = OutstandingToken.objects.create(
+            user=user, jti='vigente', token='x', expires_at=ahora + timedelta(days=1)
+        )
+        BlacklistedToken.objects.create(token=vigente)
+    
+    def test_poda_en_lotes(self):
+        """Verifica que elimina solo los expirados, en lotes, y registra métricas"""
+        out = StringIO()
+        with self.assertLogs('inspections.tokens', 'INFO') as logs:
+            call_command('prune_tokens', '--batch-size', '2', '--pausa', '0', stdout=out)
+        self.assertIn('5 tokens expirados eliminados (3 en blacklist) en 3 lotes', out.getvalue())
+        self.assertEqual(list(OutstandingToken.objects.values_list('jti', flat=True)), ['vigente'])
+        self.assertEqual(BlacklistedToken.objects.count(), 1)
+        self.assertIn('despues_outstanding=1', logs.output[0])
+    
+    def test_max_lotes_y_dry_run(self):
+        """Verifica el límite de lotes y que --dry-run no elimina"""
+        call_command('prune_tokens', '--dry-run', stdout=StringIO())
+        self.assertEqual(OutstandingToken.objects.count(), 6)
+        
+        call_command('prune_tokens', '--batch-size', '2', '--max-lotes', '1', '--pausa', '0', stdout=StringIO())
+        self.assertEqual(OutstandingToken.objects.count(), 4)
+
+
+class LastLoginModeTest(TestCase):
+    """Tests para los modos de registro de last_login"""
+    
+    def setUp(self):
+        self.user = User.objects.create_user(username='estacion', password='clave-segura')
+    
+    def last_login(self):
+        return User.objects.get(pk=self.user.pk).last_login
+    
+    def test_login_usa_throttle(self):
+        """Verifica que el login registra last_login solo si está desactualizado"""
+        def login():
+            self.client.post(
+                '/api/auth/login/', {'username': 'estacion', 'password': 'clave-segura'},
+                content_type='application/json'
+            )
+        
+        login()
+        primero = self.last_login()
+        self.assertIsNotNone(primero)
+        login()
+        self.assertEqual(self.last_login(), primero)
+        
+        User.objects.filter(pk=self.user.pk).update(last_login=timezone.now() - timedelta(minutes=20))
+        login()
+        self.assertGreater(self.last_login(), primero)
+    
+    def test_throttle_no_escribe_si_es_reciente(self):
+        """Verifica que un valor reciente no genera UPDATE"""
+        self.user.last_login = timezone.now() - timedelta(minutes=5)
+        with self.settings(LAST_LOGIN_MODE='throttle'), self.assertNumQueries(0):
+            registrar_login(self.user)
+    
+    def test_buffered(self):
+        """Verifica que los logins se acumulan y se escriben en un solo UPDATE"""
+        otro = User.objects.create_user(username='estacion-2', password='x')
+        with self.settings(LAST_LOGIN_MODE='buffered', LAST_LOGIN_FLUSH_SECONDS=3600):
+            with self.assertNumQueries(0):
+                registrar_login(self.user)
+                registrar_login(otro)
+            self.assertIsNone(self.last_login())
+            with self.assertNumQueries(1):
+                self.assertEqual(buffer_ultimo_acceso.flush(), 2)
+        self.assertIsNotNone(self.last_login())
+        self.assertIsNotNone(User.objects.get(pk=otro.pk).last_login)
+    
+    def test_always_y_off(self):
+        """Verifica los modos always y off"""
+        with self.settings(LAST_LOGIN_MODE='off'):
+            registrar_login(self.user)
+        self.assertIsNone(self.last_login())
+        with self.settings(LAST_LOGIN_MODE='always'):
+            registrar_login(self.user)
+            primero = self.last_login()
+            registrar_login(self.user)
+        self.assertIsNotNone(primero)
+        self.assertGreater(self.last_login(), primero)
+
+
+class DeploymentProfileTest(TestCase):
+    """Tests para el perfil de gunicorn, los checks de despliegue y SQLite"""
+    
+    def ids_checks(self):
+        return [error.id for error in revisar_despliegue(None)]
+    
+    def test_perfil_gunicorn(self):
+        """Verifica workers, hilos y clase de worker según el entorno"""
+        perfil = perfil_gunicorn({'WEB_CONCURRENCY': '3', 'GUNICORN_THREADS': '4'})
+        self.assertEqual((perfil['workers'], perfil['threads'], perfil['worker_class']), (3, 4, 'gthread'))
+        self.assertEqual(perfil['max_requests_jitter'], 100)
+        
+        perfil = perfil_gunicorn({'GUNICORN_THREADS': '1', 'GUNICORN_MAX_WORKERS': '2'})
+        self.assertEqual(perfil['worker_class'], 'sync')
+        self.assertLessEqual(perfil['workers'], 2)
+        
+        perfil = perfil_gunicorn({'GUNICORN_WORKER_CLASS': 'uvicorn'})
+        self.assertEqual((perfil['threads'], perfil['worker_class']), (1, 'uvicorn.workers.UvicornWorker'))
+        
+        for entorno in ({'WEB_CONCURRENCY': 'muchos'}, {'GUNICORN_THREADS': '0'},
+                        {'GUNICORN_WORKER_CLASS': 'gevent'},
+                        {'GUNICORN_WORKER_CLASS': 'sync', 'GUNICORN_THREADS': '4'},
+                        {'GUNICORN_WORKER_CLASS': 'uvicorn', 'GUNICORN_THREADS': '4'}):
+            with self.assertRaises(ValueError):
+                perfil_gunicorn(entorno)
+    
+    def test_checks_de_despliegue(self):
+        """Verifica los errores y advertencias de configuración al iniciar"""
+        self.assertEqual(self.ids_checks(), [])
+        with mock.patch.dict('os.environ', {'WEB_CONCURRENCY': 'x'}):
+            self.assertIn('inspections.E001', self.ids_checks())
+        with self.settings(DB_POOL_MODE='pool', LAST_LOGIN_MODE='siempre'):
+            self.assertEqual(self.ids_checks(), ['inspections.E002', 'inspections.E003'])
+        
+        with mock.patch.dict('os.environ', {'WEB_CONCURRENCY': '4', 'GUNICORN_THREADS': '8'}):
+            with self.settings(DB_MAX_CONNECTIONS=100, DB_INSTANCES=4):
+                self.assertEqual(self.ids_checks(), ['inspections.W002'])
+            with self.settings(DB_MAX_CONNECTIONS=100, DB_INSTANCES=1):
+                self.assertEqual(self.ids_checks(), [])
+    
+    def test_sqlite_wal_y_contador(self):
+        """Verifica que las conexiones SQLite usan WAL y quedan contadas"""
+        contador_conexiones.reiniciar()
+        with tempfile.TemporaryDirectory() as directorio:
+            conexiones = ConnectionHandler({'default': {
+                'ENGINE': 'django.db.backends.sqlite3',
+                'NAME': str(Path(directorio) / 'wal.sqlite3'),
+                'OPTIONS': {'timeout': 7},
+            }})
+            try:
+                with conexiones['default'].cursor() as cursor:
+                    cursor.execute('PRAGMA journal_mode')
+                    self.assertEqual(cursor.fetchone()[0], 'wal')
+                    cursor.execute('PRAGMA busy_timeout')
+                    self.assertEqual(cursor.fetchone()[0], 7000)
+            finally:
+                conexiones.close_all()
+        self.assertEqual(contador_conexiones.snapshot(), {'default': 1})
+
+
+class AsyncReadViewsTest(TestCase):
+    """Tests para las variantes async de los endpoints de lectura"""
+    
+    def setUp(self):
+        self.factory = AsyncRequestFactory()
+        response = self.client.post('/api/muestreo/generar/', {
+            'exportador': 'Exportadora Test',
+            'establecimiento_nombre': 'Planta Test',
+            'inspector_sag': 'Inspector Test',
+            'contraparte_sag': 'Contraparte Test',
+            'especie': 'Cereza',
+            'numero_lote': 'LOTE-ASYNC',
+            'tamano_lote': 300,
+            'tipo_muestreo': 'NORMAL',
+            'tipo_despacho': 'Marítimo',
+            'cantidad_pallets': 3,
+        }, content_type='application/json')
+        self.inspection_id = response.json()['data']['inspection']['id']
+        self.client.post(f'/api/muestreo/configurar-pallets/{self.inspection_id}/', {
+            'configurations': [
+                {'numero_pallet': p, 'base': 8, 'cantidad_cajas': 100, 'distribucion_caras': []}
+                for p in (1, 2, 3)
+            ]
+        }, content_type='application/json')
+        establishment = Establishment.objects.create(planta_fruticola='Planta Tema', license_key='ASYNC-1')
+        self.theme = establishment.theme
+        self.theme.company_name = 'Tema'
+        self.theme.save()
+    
+    async def comparar(self, path, vista, **kwargs):
+        esperado = await self.async_client.get(path)
+        response = await vista(self.factory.get(path), **kwargs)
+        self.assertEqual(response.status_code, esperado.status_code)
+        self.assertEqual(json.loads(response.content), esperado.json())
+        return response
+    
+    async def test_misma_respuesta_que_las_vistas_sync(self):
+        """Verifica que diagrama, inspección y tema responden igual que los ViewSets"""
+        i = self.inspection_id
+        response = await self.comparar(f'/api/muestreo/diagrama-pallets/{i}/', views_async.diagrama_pallets, inspection_id=i)
+        self.assertEqual(json.loads(response.content)['data']['total_pallets_mostrados'], 3)
+        await self.comparar(f'/api/inspections/{i}/', views_async.inspeccion_detalle, pk=i)
+        response = await self.comparar(f'/api/inspections/{i}/bundle/', views_async.inspeccion_bundle, pk=i)
+        self.assertEqual(len(json.loads(response.content)['layout']), 3)
+        response = await self.comparar(f'/api/themes/{self.theme.id}/', views_async.tema_detalle, pk=self.theme.id)
+        self.assertEqual(response['Cache-Control'], 'public, max-age=300')
+        
+        for path, vista, kwargs in (
+            ('/api/muestreo/diagrama-pallets/999999/', views_async.diagrama_pallets, {'inspection_id': 999999}),
+            ('/api/inspections/999999/', views_async.inspeccion_detalle, {'pk': 999999}),
+            ('/api/inspections/999999/bundle/', views_async.inspeccion_bundle, {'pk': 999999}),
+            ('/api/themes/999999/', views_async.tema_detalle, {'pk': 999999}),
+        ):
+            response = await self.comparar(path, vista, **kwargs)
+            self.assertEqual(response.status_code, 404)
+    
+    async def test_autorizacion_invalida(self):
+        """Verifica que un token inválido recibe el mismo 401 que en DRF"""
+        path = f'/api/inspections/{self.inspection_id}/'
+        user = await sync_to_async(User.objects.create_user)(username='lector', password='x')
+        vencido = AccessToken.for_user(user)
+        vencido.set_exp(lifetime=-timedelta(minutes=1))
+        for cabecera in ('Bearer no-es-un-token', 'Bearer', f'Bearer {vencido}'):
+            esperado = await self.async_client.get(path, headers={'Authorization': cabecera})
+            response = await views_async.inspeccion_detalle(
+                self.factory.get(path, headers={'Authorization': cabecera}), pk=self.inspection_id
+            )
+            self.assertEqual(esperado.status_code, 401)
+            self.assertEqual(response.status_code, 401)
+            self.assertEqual(response['WWW-Authenticate'], esperado['WWW-Authenticate'])
+            self.assertEqual(json.loads(response.content), esperado.json())
+        
+        token = str(AccessToken.for_user(user))
+        response = await views_async.inspeccion_detalle(
+            self.factory.get(path, headers={'Authorization': f'Bearer {token}'}), pk=self.inspection_id
+        )
+        self.assertEqual(response.status_code, 200)
+    
+    def test_diagrama_en_una_consulta(self):
+        """Verifica que el diagrama async lee inspección y resultado juntos"""
+        request = self.factory.get(f'/api/muestreo/diagrama-pallets/{self.inspection_id}/')
+        with self.assertNumQueries(1):
+            response = async_to_sync(views_async.diagrama_pallets)(request, inspection_id=self.inspection_id)
+        self.assertEqual(response.status_code, 200)
+    
+    async def test_otros_metodos_usan_la_vista_sync(self):
+        """Verifica que los métodos distintos de GET se delegan al ViewSet"""
+        response = await views_async.tema_detalle(self.factory.post(f'/api/themes/{self.theme.id}/'), pk=self.theme.id)
+        self.assertEqual(response.status_code, 405)
+        response = await views_async.inspeccion_detalle(
+            self.factory.delete(f'/api/inspections/{self.inspection_id}/'), pk=self.inspection_id
+        )
+        self.assertIn(response.status_code, (401, 403))
+
+
+class GenerarMuestreoIdempotencyTest(TestCase):
+    """Tests para generar_muestreo transaccional e idempotente"""
+    
+    def datos(self, **extra):
+        datos = {
+            'exportador': 'Exportadora Test',
+            'establecimiento_nombre': 'Planta Test',
+            'inspector_sag': 'Inspector Test',
+            'contraparte_sag': 'Contraparte Test',
+            'especie': 'Cereza',
+            'numero_lote': 'LOTE-IDEM',
+            'tamano_lote': 800,
+            'tipo_muestreo': 'POR_ETAPA',
+            'tipo_despacho': 'Marítimo',
+            'cantidad_pallets': 8,
+            'boxes_per_pallet': [100] * 8,
+        }
+        datos.update(extra)
+        return datos
+    
+    def generar(self, datos, clave=None):
+        headers = {'HTTP_IDEMPOTENCY_KEY': clave} if clave is not None else {}
+        return self.client.post('/api/muestreo/generar/', datos, content_type='application/json', **headers)
+    
+    def test_un_solo_insert_de_inspeccion(self):
+        """Verifica que la inspección se inserta una vez, con sus pallets seleccionados"""
+        with CaptureQueriesContext(connection) as consultas:
+            response = self.generar(self.datos())
+        self.assertEqual(response.status_code, 201)
+        sql = [q['sql'] for q in consultas.captured_queries]
+        self.assertEqual(sum(s.startswith('INSERT INTO "inspections_inspection"') for s in sql), 1)
+        self.assertFalse(any(s.startswith('UPDATE "inspections_inspection"') for s in sql))
+        
+        stage = response.json()['data']['stage_sampling']
+        self.assertEqual(Inspection.objects.get().selected_pallets, stage['selected_pallets'])
+        self.assertEqual(sum(stage['sample_distribution'].values()), response.json()['data']['sampling_result']['tamano_muestra'])
+    
+    def test_reintento_retorna_el_resultado_original(self):
+        """Verifica que la misma Idempotency-Key no crea otra inspección ni recalcula"""
+        clave = str(uuid.uuid4())
+        primera = self.generar(self.datos(), clave)
+        self.assertEqual(primera.status_code, 201)
+        
+        with self.assertNumQueries(1):
+            segunda = self.generar(self.datos(), clave)
+        self.assertEqual(segunda.status_code, 201)
+        self.assertEqual(segunda['Idempotent-Replayed'], 'true')
+        self.assertEqual(segunda.json(), primera.json())
+        self.assertEqual(Inspection.objects.count(), 1)
+        self.assertEqual(InspectionDailySummary.objects.get().cantidad_inspecciones, 1)
+        
+        # Sin clave, o con otra, se crea una inspección nueva
+        self.generar(self.datos())
+        self.generar(self.datos(), str(uuid.uuid4()))
+        self.assertEqual(Inspection.objects.count(), 3)
+    
+    def test_clave_con_otros_datos_o_invalida(self):
+        """Verifica el 409 por datos distintos y el 400 por clave inválida"""
+        self.generar(self.datos(), 'clave-1')
+        response = self.generar(self.datos(numero_lote='OTRO-LOTE'), 'clave-1')
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(self.generar(self.datos(), 'x' * 101).status_code, 400)
+        self.assertEqual(Inspection.objects.count(), 1)
+    
+    def test_reintento_concurrente(self):
+        """Verifica que si otro request insertó la clave primero se retorna su resultado"""
+        primera = self.generar(self.datos(tipo_muestreo='NORMAL'), 'clave-carrera')
+        original = views_module._inspeccion_por_idempotency_key
+        # La verificación previa no la ve (aún no confirmada); el INSERT choca con la restricción única
+        with mock.patch.object(views_module, '_inspeccion_por_idempotency_key', side_effect=[None, original('clave-carrera')]):
+            segunda = self.generar(self.datos(tipo_muestreo='NORMAL'), 'clave-carrera')
+        self.assertEqual(segunda.status_code, 201)
+        self.assertEqual(segunda.json(), primera.json())
+        self.assertEqual(Inspection.objects.count(), 1)
+    
+    def test_error_no_deja_inspeccion_a_medias(self):
+        """Verifica que un error al guardar revierte la inspección y el resultado"""
+        with mock.patch.object(InspectionDailySummary, 'registrar', side_effect=RuntimeError('falla')):
+            response = self.generar(self.datos(), 'clave-error')
+        self.assertEqual(response.status_code, 500)
+        self.assertFalse(Inspection.objects.exists())
+        self.assertFalse(SamplingResult.objects.exists())
+        # La clave queda libre para el reintento
+        self.assertEqual(self.generar(self.datos(), 'clave-error').status_code, 201)
+
+
+class InspectionBundleTest(TestCase):
+    """Tests para las lecturas de inspección y resultado en una sola consulta"""
+    
+    def setUp(self):
+        response = self.client.post('/api/muestreo/generar/', {
+            'exportador': 'Exportadora Test',
+            'establecimiento_nombre': 'Planta Test',
+            'inspector_sag': 'Inspector Test',
+            'contraparte_sag': 'Contraparte Test',
+            'especie': 'Cereza',
+            'numero_lote': 'LOTE-BUNDLE',
+            'tamano_lote': 300,
+            'tipo_muestreo': 'NORMAL',
+            'tipo_despacho': 'Marítimo',
+            'cantidad_pallets': 3,
+        }, content_type='application/json')
+        self.inspection_id = response.json()['data']['inspection']['id']
+        self.sampling_result_id = response.json()['data']['sampling_result']['id']
+        self.client.post(f'/api/muestreo/configurar-pallets/{self.inspection_id}/', {
+            'configurations': [
+                {'numero_pallet': p, 'base': 8, 'cantidad_cajas': 100, 'distribucion_caras': []}
+                for p in (1, 2, 3)
+            ]
+        }, content_type='application/json')
+        establishment = Establishment.objects.create(planta_fruticola='Planta Bundle', license_key='BUNDLE-1')
+        Inspection.objects.filter(pk=self.inspection_id).update(establishment=establishment)
+    
+    def test_bundle_en_una_consulta(self):
+        """Verifica que el paquete trae inspección, resultado y diagrama juntos"""
+        with self.assertNumQueries(1):
+            response = self.client.get(f'/api/inspections/{self.inspection_id}/bundle/')
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        self.assertEqual(data['establishment_name'], 'Planta Bundle')
+        self.assertEqual(data['sampling_result']['id'], self.sampling_result_id)
+        self.assertNotIn('inspection_data', data['sampling_result'])
+        
+        diagrama = self.client.get(f'/api/muestreo/diagrama-pallets/{self.inspection_id}/').json()
+        self.assertEqual(data['layout'], diagrama['data']['pallets'])
+        self.assertEqual(self.client.get('/api/inspections/999999/bundle/').status_code, 404)
+    
+    def test_bundle_sin_resultado(self):
+        """Verifica que sin resultado no se hace otra consulta para descubrirlo"""
+        SamplingResult.objects.all().delete()
+        with self.assertNumQueries(1):
+            response = self.client.get(f'/api/inspections/{self.inspection_id}/bundle/')
+        self.assertIsNone(response.json()['sampling_result'])
+        self.assertIsNone(response.json()['layout'])
+        
+        with self.assertNumQueries(1):
+            response = self.client.get(f'/api/muestreo/diagrama-pallets/{self.inspection_id}/')
+        self.assertEqual(response.status_code, 404)
+    
+    def test_lecturas_en_una_consulta(self):
+        """Verifica resultado, diagrama y listado de inspecciones sin consultas extra"""
+        with self.assertNumQueries(1):
+            response = self.client.get(f'/api/sampling-results/{self.sampling_result_id}/')
+        self.assertEqual(response.json()['inspection_data']['establishment_name'], 'Planta Bundle')
+        self.assertEqual(response['Cache-Control'], 'public, max-age=60')
+        
+        with self.assertNumQueries(1):
+            response = self.client.get(f'/api/muestreo/diagrama-pallets/{self.inspection_id}/')
+        self.assertEqual(response.json()['data']['total_pallets_mostrados'], 3)
+        
+        Inspection.objects.create(
+            exportador='Otro', establecimiento_nombre='Otra', inspector_sag='I', contraparte_sag='C',
+            especie='Cereza', numero_lote='LOTE-2', tamano_lote=100, tipo_despacho='Aéreo',
+            cantidad_pallets=1, establishment=Establishment.objects.get()
+        )
+        with self.assertNumQueries(1):
+            self.client.get('/api/inspections/')
+        with self.assertNumQueries(1):
+            self.client.get('/api/sampling-results/')
+
+
+def _xlsx(filas):
+    """Libro de Excel mínimo: textos compartidos, números y filas vacías omitidas."""
+    textos = []
+    hoja = []
+    for numero, fila in filas:
+        celdas = []
+        for columna, valor in zip('ABCDEFGH', fila):
+            if isinstance(valor, str):
+                textos.append(valor)
+                celdas.append(f'<c r="{columna}{numero}" t="s"><v>{len(textos) - 1}</v></c>')
+            else:
+                celdas.append(f'<c r="{columna}{numero}"><v>{valor}</v></c>')
+        hoja.append(f'<row r="{numero}">{"".join(celdas)}</row>')
+    ns = 'xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main"'
+    archivo = io.BytesIO()
+    with zipfile.ZipFile(archivo, 'w') as libro:
+        libro.writestr('xl/workbook.xml', (
+            f'<workbook {ns} xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">'
+            '<sheets><sheet name="Lotes" sheetId="1" r:id="rId1"/></sheets></workbook>'
+        ))
+        libro.writestr('xl/_rels/workbook.xml.rels', (
+            '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+            '<Relationship Id="rId1" Type="worksheet" Target="worksheets/sheet1.xml"/></Relationships>'
+        ))
+        libro.writestr('xl/sharedStrings.xml', f'<sst {ns}>' + ''.join(
+            f'<si><t>{t}</t></si>' for t in textos
+        ) + '</sst>')
+        libro.writestr('xl/worksheets/sheet1.xml', f'<worksheet {ns}><sheetData>{"".join(hoja)}</sheetData></worksheet>')
+    return SimpleUploadedFile('lotes.xlsx', archivo.getvalue())
+
+
+class ImportarLotesTest(TestCase):
+    """Tests para la importación masiva de lotes desde CSV y Excel"""
+    
+    COMUNES = {
+        'exportador': 'Exportadora Test',
+        'establecimiento_nombre': 'Planta Test',
+        'inspector_sag': 'Inspector Test',
+        'contraparte_sag': 'Contraparte Test',
+        'tipo_despacho': 'Marítimo',
+    }
+    
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(User.objects.create_user('importador', password='x'))
+    
+    def importar(self, archivo, **extra):
+        return self.client.post('/api/muestreo/importar/', {'archivo': archivo, **self.COMUNES, **extra}, format='multipart')
+    
+    def csv(self, texto, encoding='utf-8'):
+        return SimpleUploadedFile('lotes.csv', texto.encode(encoding))
+    
+    def test_csv_con_filas_validas_e_invalidas(self):
+        """Verifica que las filas válidas se importan y las inválidas se informan con su número"""
+        archivo = self.csv(
+            'N° Lote;Especie;Tamaño del Lote;Pallets;Cajas por Pallet\n'
+            'L-1;Cereza;300;3;\n'
+            'L-2;Cereza;800;8;100 100 100 100 100 100 100 100\n'
+            'L-3;Cereza;0;3;\n'
+            '\n'
+            'L-4;Cereza;500;5;100 100 100 100 100\n'
+        )
+        response = self.importar(archivo)
+        self.assertEqual(response.status_code, 201)
+        data = response.json()['data']
+        self.assertEqual((data['filas'], data['validas'], data['importadas'], data['cantidad_errores']), (4, 2, 2, 2))
+        self.assertEqual([e['fila'] for e in data['errores']], [4, 6])
+        self.assertIn('tamano_lote', data['errores'][0]['errores'])
+        self.assertIn('muestreo_por_etapa', data['errores'][1]['errores'])
+        
+        por_etapa = Inspection.objects.get(numero_lote='L-2')
+        self.assertEqual(por_etapa.tipo_muestreo, 'POR_ETAPA')
+        self.assertEqual(len(por_etapa.selected_pallets), 2)
+        self.assertEqual(por_etapa.sampling_result.tamano_muestra, data['inspecciones'][1]['tamano_muestra'])
+        self.assertEqual(Inspection.objects.get(numero_lote='L-1').tipo_muestreo, 'NORMAL')
+        self.assertEqual(sum(InspectionDailySummary.objects.values_list('cantidad_inspecciones', flat=True)), 2)
+    
+    def test_incremento_en_especie_hipergeometrica(self):
+        """Verifica que el incremento en Damasco es un error de fila al validar y al importar"""
+        texto = 'Lote,Especie,Tamaño,Pallets,Incremento\nL-1,Cereza,300,3,20\nL-2,Damasco,300,3,20\nL-3,Damasco,300,3,0'
+        for solo_validar in ('true', 'false'):
+            with self.subTest(solo_validar=solo_validar):
+                response = self.importar(self.csv(texto), solo_validar=solo_validar)
+                data = response.json()['data']
+                self.assertEqual((data['validas'], data['cantidad_errores']), (2, 1))
+                self.assertEqual(data['errores'][0]['fila'], 3)
+                self.assertIn('incremento_intensidad', data['errores'][0]['errores'])
+        self.assertEqual(set(Inspection.objects.values_list('numero_lote', flat=True)), {'L-1', 'L-3'})
+    
+    def test_xlsx(self):
+        """Verifica la lectura de Excel con textos compartidos, números y filas vacías"""
+        archivo = _xlsx([
+            (1, ['Lote', 'Especie', 'Tamaño', 'Pallets']),
+            (2, ['L-1', 'Cereza', 300, 3]),
+            (4, ['L-2', 'Ciruela', '1200.0', 6]),
+            (5, ['L-3', 'Cereza', 12.5, 3]),
+        ])
+        response = self.importar(archivo)
+        self.assertEqual(response.status_code, 201)
+        data = response.json()['data']
+        self.assertEqual([i['fila'] for i in data['inspecciones']], [2, 4])
+        self.assertEqual([e['fila'] for e in data['errores']], [5])
+        self.assertEqual(Inspection.objects.get(numero_lote='L-2').tamano_lote, 1200)
+    
+    def test_xlsx_danado(self):
+        """Verifica que un Excel con referencias inválidas responde 400 y no un error interno"""
+        def con_hoja(hoja, textos=('Lote', 'Especie', 'Tamaño', 'Pallets')):
+            archivo = _xlsx([(1, list(textos))])
+            buffer = io.BytesIO()
+            with zipfile.ZipFile(io.BytesIO(archivo.read())) as origen, zipfile.ZipFile(buffer, 'w') as libro:
+                for nombre in origen.namelist():
+                    if nombre == 'xl/worksheets/sheet1.xml':
+                        ns = 'xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main"'
+                        libro.writestr(nombre, f'<worksheet {ns}><sheetData>{hoja}</sheetData></worksheet>')
+                    else:
+                        libro.writestr(nombre, origen.read(nombre))
+            return SimpleUploadedFile('lotes.xlsx', buffer.getvalue())
+        
+        encabezado = '<row r="1">' + ''.join(f'<c r="{c}1" t="s"><v>{i}</v></c>' for i, c in enumerate('ABCD')) + '</row>'
+        for hoja in (
+            '<row r="1"><c r="A1" t="s"><v>99</v></c></row>',
+            '<row r="1"><c r="A1" t="s"><v>x</v></c></row>',
+            '<row r="uno"><c r="A1" t="s"><v>0</v></c></row>',
+            '<row r="2000000000"><c r="A1" t="s"><v>0</v></c></row>',
+            '<row r="1"><c r="ZZZZZZ1" t="s"><v>0</v></c></row>',
+            '<row r="1"><c r="XFE1" t="s"><v>0</v></c></row>',
+        ):
+            with self.subTest(hoja=hoja):
+                response = self.importar(con_hoja(hoja))
+                self.assertEqual(response.status_code, 400)
+                self.assertFalse(response.json()['success'])
+        
+        # Tras los encabezados, el error se informa y no se lee el resto de la hoja
+        response = self.importar(con_hoja(
+            encabezado + '<row r="2000000000"><c r="A2000000000"><v>1</v></c></row>'
+        ))
+        self.assertEqual(response.status_code, 400)
+        errores = response.json()['data']['errores']
+        self.assertEqual(errores[0]['fila'], None)
+        self.assertIn('2000000000', errores[0]['errores']['archivo'][0])
+        self.assertFalse(Inspection.objects.exists())
+        
+        # La última columna de Excel sigue siendo válida
+        self.assertEqual(importacion._columna('XFD1'), importacion.MAX_COLUMNAS_XLSX - 1)
+    
+    def test_bloques_y_solo_validar(self):
+        """Verifica el guardado por bloques y que solo_validar no escribe"""
+        lineas = ['lote,especie,tamano_lote,cantidad_pallets'] + [f'L-{i},Cereza,300,3' for i in range(5)]
+        response = self.importar(self.csv('\n'.join(lineas)), solo_validar='true')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['data']['validas'], 5)
+        self.assertFalse(Inspection.objects.exists())
+        
+        with mock.patch.object(importacion, 'TAMANO_BLOQUE', 2), CaptureQueriesContext(connection) as consultas:
+            response = self.importar(self.csv('\n'.join(lineas)))
+        self.assertEqual(response.json()['data']['importadas'], 5)
+        inserts = [q['sql'] for q in consultas.captured_queries if q['sql'].startswith('INSERT INTO "inspections_inspection"')]
+        self.assertEqual(len(inserts), 3)
+        self.assertEqual(InspectionDailySummary.objects.get().cantidad_inspecciones, 5)
+    
+    def test_archivos_invalidos(self):
+        """Verifica columnas faltantes, límite de filas, encoding de Excel y permisos"""
+        response = self.client.post('/api/muestreo/importar/', {
+            'archivo': self.csv('lote,especie,tamano_lote\nL-1,Cereza,300')
+        }, format='multipart')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('cantidad_pallets', response.json()['message'])
+        self.assertIn('exportador', response.json()['message'])
+        self.assertEqual(self.importar(SimpleUploadedFile('lotes.xls', b'\xd0\xcf')).status_code, 400)
+        self.assertEqual(self.client.post('/api/muestreo/importar/', {}, format='multipart').status_code, 400)
+        
+        texto = 'Lote;Especie;Tamaño;Pallets;Exportadora\n' + '\n'.join(f'L-{i};Cereza;300;3;Frutícola Ñuble' for i in range(3))
+        with override_settings(IMPORTACION_MAX_FILAS=2):
+            response = self.importar(self.csv(texto, encoding='cp1252'))
+        self.assertTrue(response.json()['data']['truncado'])
+        self.assertEqual(set(Inspection.objects.values_list('exportador', flat=True)), {'Frutícola Ñuble'})
+        self.assertEqual(Inspection.objects.count(), 2)
+        
+        self.assertIn(APIClient().post('/api/muestreo/importar/', {}, format='multipart').status_code, (401, 403))
@@ -0,0 +1,103 @@
+"""
+Registro de `User.last_login` al emitir tokens JWT.
+
+Con SIMPLE_JWT['UPDATE_LAST_LOGIN'] cada login escribe en auth_user; las
+cuentas compartidas de las estaciones de inspección inician sesión en ráfagas
+(cambio de turno) y compiten por la misma fila. LAST_LOGIN_MODE elige:
+
+- 'always':   escribe en cada login (comportamiento de simplejwt)
+- 'throttle': escribe solo si el valor guardado tiene más de
+              LAST_LOGIN_THROTTLE_MINUTES minutos
+- 'buffered': acumula en memoria y escribe un UPDATE por lote cada
+              LAST_LOGIN_FLUSH_SECONDS (se pierde lo pendiente si el proceso
+              muere sin terminar normalmente)
+- 'off':      no registra
+"""
+import atexit
+import logging
+import threading
+from datetime import timedelta
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.db import DatabaseError, connection
+from django.db.models import Case, Q, When
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+MODOS = ('always', 'throttle', 'buffered', 'off')
+
+
+class BufferUltimoAcceso:
+    """Último login pendiente por usuario, escrito en lote periódicamente."""
+
+    def __init__(self):
+        self._pendientes = {}
+        self._timer = None
+        self._lock = threading.Lock()
+
+    def agregar(self, user_id, momento):
+        """Acumula el login y programa el flush si no hay uno pendiente."""
+        with self._lock:
+            self._pendientes[user_id] = momento
+            if self._timer is None:
+                self._timer = threading.Timer(settings.LAST_LOGIN_FLUSH_SECONDS, self._flush_programado)
+                self._timer.daemon = True
+                self._timer.start()
+
+    def _flush_programado(self):
+        try:
+            self.flush()
+        finally:
+            # La conexión del hilo del timer no la cierra el ciclo de request
+            connection.close()
+
+    def flush(self):
+        """Escribe lo pendiente con un solo UPDATE. Retorna las filas escritas."""
+        with self._lock:
+            pendientes, self._pendientes = self._pendientes, {}
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+        if not pendientes:
+            return 0
+        try:
+            return User.objects.filter(pk__in=pendientes).update(
+                last_login=Case(*(When(pk=pk, then=momento) for pk, momento in pendientes.items()))
+            )
+        except DatabaseError:
+            logger.exception('No se pudo escribir last_login de %d usuarios', len(pendientes))
+            return 0
+
+    def pendientes(self):
+        with self._lock:
+            return len(self._pendientes)
+
+
+buffer = BufferUltimoAcceso()
+atexit.register(buffer.flush)
+
+
+def registrar_login(user):
+    """Registra el login de `user` según LAST_LOGIN_MODE."""
+    modo = settings.LAST_LOGIN_MODE
+    if modo == 'off':
+        return
+    ahora = timezone.now()
+
+    if modo == 'always':
+        User.objects.filter(pk=user.pk).update(last_login=ahora)
+    elif modo == 'throttle':
+        limite = ahora - timedelta(minutes=settings.LAST_LOGIN_THROTTLE_MINUTES)
+        if user.last_login is not None and user.last_login >= limite:
+            return
+        # Condición repetida en el WHERE: entre logins simultáneos escribe solo el primero
+        User.objects.filter(pk=user.pk).filter(
+            Q(last_login__isnull=True) | Q(last_login__lt=limite)
+        ).update(last_login=ahora)
+    elif modo == 'buffered':
+        buffer.agregar(user.pk, ahora)
+    else:
+        raise ValueError(f'LAST_LOGIN_MODE inválido: {modo!r} (opciones: {", ".join(MODOS)})')
+    user.last_login = ahora
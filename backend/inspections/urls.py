@@ -1,7 +1,8 @@
 """
 URLs para la aplicación inspections.
 """
-from django.urls import path, include
+from django.conf import settings
+from django.urls import path, re_path, include
 from rest_framework.routers import DefaultRouter
 from rest_framework_simplejwt.views import TokenRefreshView
 from .views import (
@@ -14,11 +15,15 @@ from .views import (
 from .views_admin import (
     CustomTokenObtainPairView,
     AdminDashboardViewSet,
+    AdminAnalyticsViewSet,
+    AdminProfilingViewSet,
     AdminEstablishmentViewSet,
     AdminThemeViewSet,
     CurrentUserViewSet
 )
 
+from . import views_async
+
 router = DefaultRouter()
 router.register(r'establishments', EstablishmentViewSet, basename='establishment')
 router.register(r'inspections', InspectionViewSet, basename='inspection')
@@ -28,6 +33,8 @@ router.register(r'themes', ThemeViewSet, basename='theme')
 
 # Rutas de administración
 router.register(r'admin/dashboard', AdminDashboardViewSet, basename='admin-dashboard')
+router.register(r'admin/analytics', AdminAnalyticsViewSet, basename='admin-analytics')
+router.register(r'admin/profiling', AdminProfilingViewSet, basename='admin-profiling')
 router.register(r'admin/establishments', AdminEstablishmentViewSet, basename='admin-establishments')
 router.register(r'admin/themes', AdminThemeViewSet, basename='admin-themes')
 router.register(r'users/current', CurrentUserViewSet, basename='current-user')
@@ -40,3 +47,14 @@ urlpatterns = [
     # Rutas del router
     path('', include(router.urls)),
 ]
+
+# Lecturas async (ASGI): mismas URLs, antes que las del router
+urlpatterns_async = [
+    re_path(r'^inspections/(?P<pk>\d+)/$', views_async.inspeccion_detalle),
+    re_path(r'^inspections/(?P<pk>\d+)/bundle/$', views_async.inspeccion_bundle),
+    re_path(r'^themes/(?P<pk>\d+)/$', views_async.tema_detalle),
+    re_path(r'^muestreo/diagrama-pallets/(?P<inspection_id>\d+)/$', views_async.diagrama_pallets),
+]
+
+if settings.ASYNC_READ_VIEWS:
+    urlpatterns = urlpatterns_async + urlpatterns
@@ -528,3 +528,144 @@ def generate_stage_sampling_numbers(boxes_per_pallet, selected_pallet_indices, s
     
     selected_boxes.sort()
     return selected_boxes
+
+
+def generar_muestreo_inspeccion(data):
+    """
+    Calcula el muestreo de una inspección ya validada.
+    
+    Lo usan POST /api/muestreo/generar/ y la importación masiva de lotes. En
+    muestreo por etapa el tamaño de la muestra se calcula sobre las cajas de
+    los pallets seleccionados (25%) y se distribuye proporcionalmente.
+    
+    Args:
+        data (dict): Datos validados por GenerarMuestreoSerializer
+    
+    Returns:
+        dict: selected_pallets, resultado_muestreo (de calcular_muestreo),
+              cajas_seleccionadas y tamano_muestra
+    """
+    incremento_intensidad = data.get('incremento_intensidad', 0)
+    
+    if data['tipo_muestreo'] != 'POR_ETAPA':
+        resultado_muestreo = calcular_muestreo(
+            tamano_lote=data['tamano_lote'],
+            especie=data['especie'],
+            incremento_intensidad=incremento_intensidad
+        )
+        return {
+            'selected_pallets': [],
+            'resultado_muestreo': resultado_muestreo,
+            'cajas_seleccionadas': resultado_muestreo['cajas_seleccionadas'],
+            'tamano_muestra': resultado_muestreo['tamano_muestra'],
+        }
+    
+    boxes_per_pallet = data['boxes_per_pallet']
+    selected_pallets = select_stage_sampling_pallets(data['cantidad_pallets'])
+    
+    # Tamaño de muestra basado SOLO en las cajas de los pallets seleccionados
+    resultado_muestreo = calcular_muestreo(
+        tamano_lote=sum(boxes_per_pallet[i - 1] for i in selected_pallets),
+        especie=data['especie'],
+        incremento_intensidad=incremento_intensidad
+    )
+    sample_distribution = distribute_samples_proportionally(
+        boxes_per_pallet=boxes_per_pallet,
+        selected_pallet_indices=selected_pallets,
+        total_sample_size=resultado_muestreo['tamano_muestra']
+    )
+    cajas_seleccionadas = generate_stage_sampling_numbers(
+        boxes_per_pallet=boxes_per_pallet,
+        selected_pallet_indices=selected_pallets,
+        sample_distribution=sample_distribution
+    )
+    return {
+        'selected_pallets': selected_pallets,
+        'resultado_muestreo': resultado_muestreo,
+        'cajas_seleccionadas': cajas_seleccionadas,
+        'tamano_muestra': len(cajas_seleccionadas),
+    }
+
+
+def construir_diagrama_pallets(tipo_muestreo, pallet_configurations, selected_pallets, cajas_seleccionadas):
+    """
+    Arma los datos del diagrama de pallets (cajas por capa y cajas muestra).
+    
+    No consulta la base de datos: la usan tanto la vista síncrona como la
+    variante async de /api/muestreo/diagrama-pallets/.
+    
+    Args:
+        tipo_muestreo (str): 'NORMAL' o 'POR_ETAPA'
+        pallet_configurations (list): Configuraciones guardadas por configurar-pallets
+        selected_pallets (list): Pallets seleccionados (solo POR_ETAPA)
+        cajas_seleccionadas (list): Números de caja de la muestra
+    
+    Returns:
+        list: Un dict por pallet mostrado, ordenados por número de pallet
+    """
+    cajas_muestra_set = set(cajas_seleccionadas)
+    
+    # Convertir configuraciones a dict para acceso rápido
+    config_dict = {c['numero_pallet']: c for c in pallet_configurations}
+    
+    # Determinar qué pallets mostrar
+    if tipo_muestreo == 'POR_ETAPA':
+        # Solo pallets seleccionados
+        pallets_a_mostrar = selected_pallets
+    else:
+        # Todos los pallets (o los que tengan configuración)
+        pallets_a_mostrar = [c['numero_pallet'] for c in pallet_configurations]
+    
+    pallets_data = []
+    for num_pallet in sorted(pallets_a_mostrar):
+        if num_pallet not in config_dict:
+            continue
+        
+        config = config_dict[num_pallet]
+        base = config['base']
+        cantidad_cajas = config['cantidad_cajas']
+        
+        # Rango de cajas del pallet: para POR_ETAPA solo cuentan los pallets
+        # seleccionados anteriores, para NORMAL todos los anteriores
+        inicio_caja = 1
+        if tipo_muestreo == 'POR_ETAPA':
+            for pallet_anterior in sorted(pallets_a_mostrar):
+                if pallet_anterior >= num_pallet:
+                    break
+                if pallet_anterior in config_dict:
+                    inicio_caja += config_dict[pallet_anterior]['cantidad_cajas']
+        else:
+            for i in range(1, num_pallet):
+                if i in config_dict:
+                    inicio_caja += config_dict[i]['cantidad_cajas']
+        
+        fin_caja = inicio_caja + cantidad_cajas - 1
+        
+        # Cajas muestra de este pallet
+        cajas_muestra_pallet = [c for c in cajas_seleccionadas if inicio_caja <= c <= fin_caja]
+        
+        # Número local (1-based) y capa de cada caja del pallet
+        cajas = []
+        for num_caja_global in range(inicio_caja, fin_caja + 1):
+            num_caja_local = num_caja_global - inicio_caja + 1
+            cajas.append({
+                'numero': num_caja_global,
+                'numero_local': num_caja_local,
+                'capa': math.ceil(num_caja_local / base),
+                'seleccionada': num_caja_global in cajas_muestra_set
+            })
+        
+        pallets_data.append({
+            'numero_pallet': num_pallet,
+            'base': base,
+            'altura': config['altura'],
+            'cantidad_cajas': cantidad_cajas,
+            'distribucion_caras': config.get('distribucion_caras', []),
+            'inicio_caja': inicio_caja,
+            'fin_caja': fin_caja,
+            'cajas': cajas,
+            'cajas_muestra': cajas_muestra_pallet,
+            'total_cajas_muestra': len(cajas_muestra_pallet)
+        })
+    
+    return pallets_data
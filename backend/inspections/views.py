@@ -2,27 +2,54 @@
 Vistas para la API REST.
 """
 import json
+import re
+from bisect import bisect_right
 from rest_framework import viewsets, status, serializers, permissions
 from rest_framework.decorators import action
+from rest_framework.parsers import MultiPartParser
 from rest_framework.response import Response
+from django.conf import settings
+from django.db import IntegrityError, transaction
 from django.shortcuts import get_object_or_404
+from django.utils.cache import patch_cache_control
+from django.views.static import serve
 
-from .models import Establishment, Inspection, SamplingResult, EstablishmentTheme
+from .models import (
+    Establishment,
+    Inspection,
+    SamplingResult,
+    EstablishmentTheme,
+    InspectionDailySummary
+)
 from .serializers import (
     EstablishmentSerializer,
     InspectionSerializer,
+    InspectionBundleSerializer,
     SamplingResultSerializer,
     GenerarMuestreoSerializer
 )
-from .serializers_admin import EstablishmentThemeSerializer
+from .authentication import obtener_principal
+from .serializers_admin import EstablishmentThemeSerializer, tema_cacheado
+from .suscripciones import suscripciones
+from .imagenes import mapear_renditions
+from .importacion import CAMPOS_COMUNES, ArchivoInvalido, importar_lotes
 from .utils import (
-    calcular_muestreo,
     validate_stage_sampling,
-    select_stage_sampling_pallets,
-    distribute_samples_proportionally,
-    generate_stage_sampling_numbers
+    generar_muestreo_inspeccion,
+    construir_diagrama_pallets
 )
 
+# Cache-Control para recursos que no cambian una vez creados (1 año)
+CACHE_INMUTABLE_SEGUNDOS = 60 * 60 * 24 * 365
+CACHE_TEMA_SEGUNDOS = 300
+# Un resultado de muestreo no cambia, pero incluye la inspección (editable y
+# eliminable): caché corta y revalidación por ETag de contenido
+CACHE_MUESTREO_SEGUNDOS = 60
+
+LARGO_IDEMPOTENCY_KEY = Inspection._meta.get_field('idempotency_key').max_length
+# Campos que un reintento con la misma Idempotency-Key debe repetir
+CAMPOS_IDEMPOTENCIA = ('numero_lote', 'especie', 'tamano_lote', 'tipo_muestreo', 'cantidad_pallets')
+
 
 class AllowAnyReadPermission(permissions.BasePermission):
     """
@@ -40,6 +67,20 @@ class AllowAnyReadPermission(permissions.BasePermission):
         return request.user and request.user.is_authenticated
 
 
+class HasActiveSubscription(permissions.BasePermission):
+    """
+    Permiso: si el usuario pertenece a un establecimiento, su suscripción
+    debe estar activa. Se consulta el snapshot en memoria de suscripciones.
+    """
+    message = 'La suscripción del establecimiento no está activa'
+    
+    def has_permission(self, request, view):
+        principal = obtener_principal(request.user)
+        if principal is None or principal.establishment_id is None or principal.is_superadmin():
+            return True
+        return suscripciones.activa(principal.establishment_id)
+
+
 class EstablishmentViewSet(viewsets.ReadOnlyModelViewSet):
     """
     ViewSet para consultar establecimientos.
@@ -55,10 +96,22 @@ class InspectionViewSet(viewsets.ModelViewSet):
     ViewSet para gestionar inspecciones.
     Acceso público.
     """
-    queryset = Inspection.objects.all()
+    queryset = Inspection.objects.select_related('establishment')
     serializer_class = InspectionSerializer
     permission_classes = [AllowAnyReadPermission]
     
+    @action(detail=True, methods=['get'])
+    def bundle(self, request, pk=None):
+        """
+        Endpoint: GET /api/inspections/<id>/bundle/
+        
+        Inspección, resultado de muestreo y diagrama de pallets en una sola
+        consulta (ver InspectionBundleSerializer).
+        """
+        inspection = get_object_or_404(
+            Inspection.objects.select_related(*InspectionBundleSerializer.RELACIONES), pk=pk
+        )
+        return Response(InspectionBundleSerializer(inspection).data)
 
 
 class SamplingResultViewSet(viewsets.ReadOnlyModelViewSet):
@@ -66,9 +119,78 @@ class SamplingResultViewSet(viewsets.ReadOnlyModelViewSet):
     ViewSet para consultar resultados de muestreo.
     Solo lectura. Acceso público.
     """
-    queryset = SamplingResult.objects.all()
+    queryset = SamplingResult.objects.select_related('inspection__establishment')
     serializer_class = SamplingResultSerializer
     permission_classes = [AllowAnyReadPermission]
+    
+    def retrieve(self, request, *args, **kwargs):
+        """
+        La respuesta incluye `inspection_data`, que cambia si se edita la
+        inspección: se cachea poco tiempo y luego se revalida con el ETag que
+        ConditionalGetMiddleware calcula sobre el contenido (304 si no cambió).
+        """
+        response = super().retrieve(request, *args, **kwargs)
+        patch_cache_control(response, public=True, max_age=CACHE_MUESTREO_SEGUNDOS)
+        return response
+
+
+def _datos_generar(inspection, sampling_result):
+    """
+    Respuesta de POST /api/muestreo/generar/ a partir de lo guardado, para que
+    la primera respuesta y la de un reintento sean idénticas.
+    """
+    cajas_seleccionadas = json.loads(sampling_result.cajas_seleccionadas)
+    datos = {
+        'success': True,
+        'message': 'Muestreo generado exitosamente',
+        'data': {
+            'inspection': InspectionSerializer(inspection).data,
+            'sampling_result': {
+                'id': sampling_result.id,
+                'tamano_lote': inspection.tamano_lote,
+                'tipo_tabla': sampling_result.tipo_tabla,
+                'nombre_tabla': sampling_result.nombre_tabla,
+                'tamano_muestra': sampling_result.tamano_muestra,
+                'cajas_seleccionadas': cajas_seleccionadas
+            }
+        }
+    }
+    
+    # Datos extra para muestreo por etapa: la numeración de cajas es continua
+    # entre los pallets seleccionados, así que la distribución se deduce de las cajas
+    if inspection.tipo_muestreo == 'POR_ETAPA':
+        sample_distribution = {}
+        offset = 0
+        for pallet in inspection.selected_pallets:
+            fin = offset + inspection.boxes_per_pallet[pallet - 1]
+            sample_distribution[pallet] = bisect_right(cajas_seleccionadas, fin) - bisect_right(cajas_seleccionadas, offset)
+            offset = fin
+        datos['data']['sampling_result']['tamano_lote_muestreado'] = offset
+        datos['data']['stage_sampling'] = {
+            'selected_pallets': inspection.selected_pallets,
+            'sample_distribution': sample_distribution
+        }
+    return datos
+
+
+def _inspeccion_por_idempotency_key(idempotency_key):
+    return Inspection.objects.select_related(*InspectionBundleSerializer.RELACIONES).filter(
+        idempotency_key=idempotency_key
+    ).first()
+
+
+def _respuesta_repetida(inspection, data):
+    """Respuesta original de un reintento, o 409 si la clave se usó con otros datos."""
+    if any(getattr(inspection, campo) != data[campo] for campo in CAMPOS_IDEMPOTENCIA):
+        return Response({
+            'success': False,
+            'message': 'La Idempotency-Key ya se usó con otros datos de inspección'
+        }, status=status.HTTP_409_CONFLICT)
+    return Response(
+        _datos_generar(inspection, inspection.sampling_result),
+        status=status.HTTP_201_CREATED,
+        headers={'Idempotent-Replayed': 'true'}
+    )
 
 
 class MuestreoViewSet(viewsets.ViewSet):
@@ -78,13 +200,19 @@ class MuestreoViewSet(viewsets.ViewSet):
     """
     permission_classes = [AllowAnyReadPermission]
     
-    @action(detail=False, methods=['post'], url_path='generar')
+    @action(detail=False, methods=['post'], url_path='generar',
+            permission_classes=[AllowAnyReadPermission, HasActiveSubscription])
     def generar_muestreo(self, request):
         """
         Endpoint: POST /api/muestreo/generar/
         
         Crea una inspección y genera el muestreo automáticamente.
         
+        Con la cabecera `Idempotency-Key` (p. ej. un UUID por envío del
+        formulario) el request se puede reintentar sin duplicar la inspección:
+        un reintento con la misma clave responde el resultado original, sin
+        volver a sortear cajas, con la cabecera `Idempotent-Replayed: true`.
+        
         Request Body:
         {
             "exportador": "string",
@@ -126,6 +254,20 @@ class MuestreoViewSet(viewsets.ViewSet):
         
         data = serializer.validated_data
         
+        idempotency_key = request.headers.get('Idempotency-Key')
+        if idempotency_key is not None:
+            idempotency_key = idempotency_key.strip()
+            if not idempotency_key or len(idempotency_key) > LARGO_IDEMPOTENCY_KEY:
+                return Response({
+                    'success': False,
+                    'message': f'Idempotency-Key debe tener entre 1 y {LARGO_IDEMPOTENCY_KEY} caracteres'
+                }, status=status.HTTP_400_BAD_REQUEST)
+            
+            # Reintento de un request ya procesado: mismo resultado, sin recalcular
+            repetida = _inspeccion_por_idempotency_key(idempotency_key)
+            if repetida is not None:
+                return _respuesta_repetida(repetida, data)
+        
         try:
             # Validaciones específicas para muestreo por etapa
             if data['tipo_muestreo'] == 'POR_ETAPA':
@@ -152,118 +294,52 @@ class MuestreoViewSet(viewsets.ViewSet):
                         'warnings': warnings
                     }, status=status.HTTP_400_BAD_REQUEST)
             
-            # Crear la inspección
-            inspection = Inspection.objects.create(
-                exportador=data['exportador'],
-                establecimiento_nombre=data['establecimiento_nombre'],
-                establishment=None,  # Ya no se asocia obligatoriamente a un Establishment oficial
-                inspector_sag=data['inspector_sag'],
-                contraparte_sag=data['contraparte_sag'],
-                especie=data['especie'],
-                numero_lote=data['numero_lote'],
-                tamano_lote=data['tamano_lote'],
-                tipo_muestreo=data['tipo_muestreo'],
-                tipo_despacho=data['tipo_despacho'],
-                cantidad_pallets=data['cantidad_pallets'],
-                boxes_per_pallet=data.get('boxes_per_pallet', [])
-            )
-            
-            # Obtener incremento de intensidad (opcional)
-            incremento_intensidad = data.get('incremento_intensidad', 0)
+            # Calcular el muestreo antes de escribir: la inspección se inserta
+            # una sola vez, ya con sus pallets seleccionados
+            muestreo = generar_muestreo_inspeccion(data)
+            resultado_muestreo = muestreo['resultado_muestreo']
             
-            # Calcular muestreo según el tipo
-            if data['tipo_muestreo'] == 'POR_ETAPA':
-                # Seleccionar pallets (25%)
-                selected_pallets = select_stage_sampling_pallets(data['cantidad_pallets'])
-                inspection.selected_pallets = selected_pallets
-                inspection.save()
+            try:
+                with transaction.atomic():
+                    inspection = Inspection.objects.create(
+                        exportador=data['exportador'],
+                        establecimiento_nombre=data['establecimiento_nombre'],
+                        establishment=None,  # Ya no se asocia obligatoriamente a un Establishment oficial
+                        inspector_sag=data['inspector_sag'],
+                        contraparte_sag=data['contraparte_sag'],
+                        especie=data['especie'],
+                        numero_lote=data['numero_lote'],
+                        tamano_lote=data['tamano_lote'],
+                        tipo_muestreo=data['tipo_muestreo'],
+                        tipo_despacho=data['tipo_despacho'],
+                        cantidad_pallets=data['cantidad_pallets'],
+                        boxes_per_pallet=data.get('boxes_per_pallet', []),
+                        selected_pallets=muestreo['selected_pallets'],
+                        idempotency_key=idempotency_key
+                    )
                 
-                # Calcular cajas totales SOLO de pallets seleccionados
-                cajas_en_pallets_seleccionados = sum(
-                    data['boxes_per_pallet'][i - 1] 
-                    for i in selected_pallets
-                )
-                
-                # Calcular tamaño de muestra basado SOLO en pallets seleccionados
-                resultado_muestreo_base = calcular_muestreo(
-                    tamano_lote=cajas_en_pallets_seleccionados,
-                    especie=data['especie'],
-                    incremento_intensidad=incremento_intensidad
-                )
-                
-                # Distribuir muestras proporcionalmente entre pallets seleccionados
-                sample_distribution = distribute_samples_proportionally(
-                    boxes_per_pallet=data['boxes_per_pallet'],
-                    selected_pallet_indices=selected_pallets,
-                    total_sample_size=resultado_muestreo_base['tamano_muestra']
-                )
-                
-                # Generar números aleatorios de cajas
-                cajas_seleccionadas = generate_stage_sampling_numbers(
-                    boxes_per_pallet=data['boxes_per_pallet'],
-                    selected_pallet_indices=selected_pallets,
-                    sample_distribution=sample_distribution
-                )
+                    # Guardar resultado del muestreo
+                    sampling_result = SamplingResult.objects.create(
+                        inspection=inspection,
+                        tipo_tabla=resultado_muestreo['tipo_tabla'],
+                        nombre_tabla=resultado_muestreo['nombre_tabla'],
+                        muestra_base=resultado_muestreo.get('muestra_base'),
+                        incremento_aplicado=resultado_muestreo.get('incremento_aplicado', 0),
+                        muestra_final=resultado_muestreo.get('muestra_final'),
+                        tamano_muestra=muestreo['tamano_muestra'],
+                        cajas_seleccionadas=json.dumps(muestreo['cajas_seleccionadas'])
+                    )
                 
-                resultado_muestreo = {
-                    'tamano_lote': data['tamano_lote'],  # Mantener el lote original para referencia
-                    'tamano_lote_muestreado': cajas_en_pallets_seleccionados,  # Cajas realmente muestreadas
-                    'tipo_tabla': resultado_muestreo_base['tipo_tabla'],
-                    'nombre_tabla': resultado_muestreo_base['nombre_tabla'],
-                    'muestra_base': resultado_muestreo_base['muestra_base'],
-                    'incremento_aplicado': resultado_muestreo_base['incremento_aplicado'],
-                    'muestra_final': resultado_muestreo_base['muestra_final'],
-                    'tamano_muestra': len(cajas_seleccionadas),
-                    'cajas_seleccionadas': cajas_seleccionadas,
-                    'selected_pallets': selected_pallets,
-                    'sample_distribution': sample_distribution
-                }
-            else:
-                # Muestreo normal
-                resultado_muestreo = calcular_muestreo(
-                    tamano_lote=data['tamano_lote'],
-                    especie=data['especie'],
-                    incremento_intensidad=incremento_intensidad
-                )
-            
-            # Guardar resultado del muestreo
-            sampling_result = SamplingResult.objects.create(
-                inspection=inspection,
-                tipo_tabla=resultado_muestreo['tipo_tabla'],
-                nombre_tabla=resultado_muestreo['nombre_tabla'],
-                muestra_base=resultado_muestreo.get('muestra_base'),
-                incremento_aplicado=resultado_muestreo.get('incremento_aplicado', 0),
-                muestra_final=resultado_muestreo.get('muestra_final'),
-                tamano_muestra=resultado_muestreo['tamano_muestra'],
-                cajas_seleccionadas=json.dumps(resultado_muestreo['cajas_seleccionadas'])
-            )
-            
-            # Preparar respuesta
-            response_data = {
-                'success': True,
-                'message': 'Muestreo generado exitosamente',
-                'data': {
-                    'inspection': InspectionSerializer(inspection).data,
-                    'sampling_result': {
-                        'id': sampling_result.id,
-                        'tamano_lote': resultado_muestreo['tamano_lote'],
-                        'tipo_tabla': resultado_muestreo['tipo_tabla'],
-                        'nombre_tabla': resultado_muestreo['nombre_tabla'],
-                        'tamano_muestra': resultado_muestreo['tamano_muestra'],
-                        'cajas_seleccionadas': resultado_muestreo['cajas_seleccionadas']
-                    }
-                }
-            }
-            
-            # Agregar datos extra para muestreo por etapa
-            if data['tipo_muestreo'] == 'POR_ETAPA':
-                response_data['data']['sampling_result']['tamano_lote_muestreado'] = resultado_muestreo.get('tamano_lote_muestreado', resultado_muestreo['tamano_lote'])
-                response_data['data']['stage_sampling'] = {
-                    'selected_pallets': resultado_muestreo.get('selected_pallets', []),
-                    'sample_distribution': resultado_muestreo.get('sample_distribution', {})
-                }
+                    # Actualizar el resumen diario en la misma transacción
+                    InspectionDailySummary.registrar(inspection, sampling_result)
+            except IntegrityError:
+                # Otro request con la misma clave terminó primero (esta transacción se revirtió)
+                repetida = _inspeccion_por_idempotency_key(idempotency_key) if idempotency_key else None
+                if repetida is None:
+                    raise
+                return _respuesta_repetida(repetida, data)
             
-            return Response(response_data, status=status.HTTP_201_CREATED)
+            return Response(_datos_generar(inspection, sampling_result), status=status.HTTP_201_CREATED)
             
         except Exception as e:
             return Response({
@@ -272,6 +348,76 @@ class MuestreoViewSet(viewsets.ViewSet):
                 'error': str(e)
             }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
     
+    @action(detail=False, methods=['post'], url_path='importar', parser_classes=[MultiPartParser],
+            permission_classes=[permissions.IsAuthenticated, HasActiveSubscription])
+    def importar(self, request):
+        """
+        Endpoint: POST /api/muestreo/importar/ (multipart/form-data)
+        
+        Crea una inspección con su muestreo por cada fila de una planilla CSV
+        o XLSX (ver inspections/importacion.py). Requiere sesión: un archivo
+        puede crear miles de inspecciones.
+        
+        Form Data:
+            archivo: .csv (coma o punto y coma) o .xlsx, con fila de encabezados:
+                     lote, especie, tamaño, pallets, cajas por pallet, ...
+            exportador, establecimiento_nombre, inspector_sag, contraparte_sag,
+            tipo_despacho, especie, tipo_muestreo, incremento_intensidad:
+                     opcionales, para las columnas que no trae la planilla
+            solo_validar: "true" para revisar el archivo sin guardar
+        
+        Response (201 si se importó alguna fila, 200 con solo_validar, 400 si ninguna es válida):
+        {
+            "success": true,
+            "message": "string",
+            "data": {
+                "filas": int, "validas": int, "importadas": int,
+                "inspecciones": [{"fila": int, "id": int, "numero_lote": "string", "tamano_muestra": int}, ...],
+                "cantidad_errores": int,
+                "errores": [{"fila": int, "numero_lote": "string", "errores": {...}}, ...],
+                "columnas_ignoradas": ["string", ...],
+                "truncado": bool
+            }
+        }
+        """
+        archivo = request.FILES.get('archivo')
+        if archivo is None:
+            return Response({
+                'success': False,
+                'message': 'Debe adjuntar el archivo en el campo "archivo"'
+            }, status=status.HTTP_400_BAD_REQUEST)
+        
+        solo_validar = request.data.get('solo_validar', '').lower() in ('true', '1')
+        comunes = {campo: request.data.get(campo) for campo in CAMPOS_COMUNES}
+        try:
+            resultado = importar_lotes(
+                archivo, comunes, solo_validar=solo_validar, max_filas=settings.IMPORTACION_MAX_FILAS
+            )
+        except ArchivoInvalido as e:
+            return Response({
+                'success': False,
+                'message': str(e)
+            }, status=status.HTTP_400_BAD_REQUEST)
+        
+        if resultado['truncado']:
+            mensaje = f'Se procesaron solo las primeras {settings.IMPORTACION_MAX_FILAS} filas'
+        elif solo_validar:
+            mensaje = f'{resultado["validas"]} de {resultado["filas"]} filas válidas'
+        else:
+            mensaje = f'{resultado["importadas"]} de {resultado["filas"]} filas importadas'
+        
+        if solo_validar:
+            codigo = status.HTTP_200_OK
+        elif resultado['importadas']:
+            codigo = status.HTTP_201_CREATED
+        else:
+            codigo = status.HTTP_400_BAD_REQUEST
+        return Response({
+            'success': codigo != status.HTTP_400_BAD_REQUEST,
+            'message': mensaje,
+            'data': resultado
+        }, status=codigo)
+    
     @action(detail=False, methods=['post'], url_path='configurar-pallets/(?P<inspection_id>[^/.]+)')
     def configurar_pallets(self, request, inspection_id=None):
         """
@@ -364,7 +510,7 @@ class MuestreoViewSet(viewsets.ViewSet):
             
             # Guardar configuraciones procesadas
             inspection.pallet_configurations = processed_configs
-            inspection.save()
+            inspection.save(update_fields=['pallet_configurations', 'updated_at'])
             
             return Response({
                 'success': True,
@@ -412,19 +558,21 @@ class MuestreoViewSet(viewsets.ViewSet):
             }
         }
         """
+        # Fuera del try: una inspección inexistente es 404, no error interno
+        # Inspección, establecimiento y resultado en una sola consulta
+        inspection = get_object_or_404(
+            Inspection.objects.select_related(*InspectionBundleSerializer.RELACIONES), id=inspection_id
+        )
+        
         try:
-            # Obtener inspección
-            inspection = get_object_or_404(Inspection, id=inspection_id)
-            
             # Verificar que tenga sampling_result
-            if not hasattr(inspection, 'sampling_result'):
+            sampling_result = getattr(inspection, 'sampling_result', None)
+            if sampling_result is None:
                 return Response({
                     'success': False,
                     'message': 'La inspección no tiene resultados de muestreo'
                 }, status=status.HTTP_404_NOT_FOUND)
             
-            sampling_result = inspection.sampling_result
-            
             # Verificar que tenga configuraciones de pallets
             if not inspection.pallet_configurations:
                 return Response({
@@ -433,86 +581,12 @@ class MuestreoViewSet(viewsets.ViewSet):
                     'requires_configuration': True
                 }, status=status.HTTP_200_OK)
             
-            # Obtener lista de cajas muestra
-            cajas_seleccionadas = json.loads(sampling_result.cajas_seleccionadas)
-            cajas_muestra_set = set(cajas_seleccionadas)
-            
-            # Convertir configuraciones a dict para acceso rápido
-            config_dict = {c['numero_pallet']: c for c in inspection.pallet_configurations}
-            
-            # Determinar qué pallets mostrar
-            if inspection.tipo_muestreo == 'POR_ETAPA':
-                # Solo pallets seleccionados
-                pallets_a_mostrar = inspection.selected_pallets
-            else:
-                # Todos los pallets (o los que tengan configuración)
-                pallets_a_mostrar = [c['numero_pallet'] for c in inspection.pallet_configurations]
-            
-            # Generar datos para cada pallet
-            pallets_data = []
-            for num_pallet in sorted(pallets_a_mostrar):
-                # Obtener configuración de este pallet
-                if num_pallet not in config_dict:
-                    continue
-                
-                config = config_dict[num_pallet]
-                base = config['base']
-                altura = config['altura']
-                cantidad_cajas = config['cantidad_cajas']
-                distribucion_caras = config.get('distribucion_caras', [])
-                
-                # Calcular rango de cajas de este pallet usando cantidad_cajas
-                # Para POR_ETAPA: solo considerar pallets seleccionados anteriores
-                # Para NORMAL: considerar todos los pallets anteriores
-                inicio_caja = 1
-                
-                if inspection.tipo_muestreo == 'POR_ETAPA':
-                    # Solo sumar cajas de pallets seleccionados anteriores
-                    for pallet_anterior in sorted(pallets_a_mostrar):
-                        if pallet_anterior >= num_pallet:
-                            break
-                        if pallet_anterior in config_dict:
-                            inicio_caja += config_dict[pallet_anterior]['cantidad_cajas']
-                else:
-                    # Sumar cajas de todos los pallets anteriores
-                    for i in range(1, num_pallet):
-                        if i in config_dict:
-                            inicio_caja += config_dict[i]['cantidad_cajas']
-                
-                fin_caja = inicio_caja + cantidad_cajas - 1
-                
-                # Filtrar cajas muestra de este pallet
-                cajas_muestra_pallet = [c for c in cajas_seleccionadas if inicio_caja <= c <= fin_caja]
-                
-                # Generar estructura de cajas con su información
-                cajas = []
-                for num_caja_global in range(inicio_caja, fin_caja + 1):
-                    # Número de caja dentro del pallet (1-based)
-                    num_caja_local = num_caja_global - inicio_caja + 1
-                    
-                    # Calcular capa (1-based)
-                    import math
-                    capa = math.ceil(num_caja_local / base)
-                    
-                    cajas.append({
-                        'numero': num_caja_global,
-                        'numero_local': num_caja_local,
-                        'capa': capa,
-                        'seleccionada': num_caja_global in cajas_muestra_set
-                    })
-                
-                pallets_data.append({
-                    'numero_pallet': num_pallet,
-                    'base': base,
-                    'altura': altura,
-                    'cantidad_cajas': cantidad_cajas,
-                    'distribucion_caras': distribucion_caras,
-                    'inicio_caja': inicio_caja,
-                    'fin_caja': fin_caja,
-                    'cajas': cajas,
-                    'cajas_muestra': cajas_muestra_pallet,
-                    'total_cajas_muestra': len(cajas_muestra_pallet)
-                })
+            pallets_data = construir_diagrama_pallets(
+                inspection.tipo_muestreo,
+                inspection.pallet_configurations,
+                inspection.selected_pallets,
+                json.loads(sampling_result.cajas_seleccionadas)
+            )
             
             return Response({
                 'success': True,
@@ -540,32 +614,65 @@ class ThemeViewSet(viewsets.ReadOnlyModelViewSet):
     serializer_class = EstablishmentThemeSerializer
     permission_classes = [AllowAnyReadPermission]
     
+    def retrieve(self, request, *args, **kwargs):
+        """El tema cambia pocas veces: caché corta y revalidación por ETag."""
+        response = super().retrieve(request, *args, **kwargs)
+        patch_cache_control(response, public=True, max_age=CACHE_TEMA_SEGUNDOS)
+        return response
+    
     @action(detail=False, methods=['get'], url_path='my-theme')
     def my_theme(self, request):
         """
         Endpoint: GET /api/themes/my-theme/
         
-        Retorna el tema del establecimiento del usuario autenticado.
+        Retorna el tema del establecimiento del usuario autenticado. El tema se
+        crea junto con el establecimiento; este endpoint no escribe.
         """
         if not request.user.is_authenticated:
             return Response({
                 'error': 'Usuario no autenticado'
             }, status=status.HTTP_401_UNAUTHORIZED)
         
-        # Obtener establecimiento del usuario
-        establishment = None
-        if hasattr(request.user, 'establishment_admin'):
-            establishment = request.user.establishment_admin
+        # Obtener establecimiento administrado por el usuario
+        establishment = obtener_principal(request.user).establishment_admin
         
         if not establishment:
             return Response({
                 'error': 'Usuario no tiene un establecimiento asociado'
             }, status=status.HTTP_404_NOT_FOUND)
         
-        # Obtener o crear tema
-        theme, created = EstablishmentTheme.objects.get_or_create(
-            establishment=establishment
-        )
+        tema = tema_cacheado(establishment.id)
+        if tema is None:
+            return Response({
+                'error': 'Tema no encontrado'
+            }, status=status.HTTP_404_NOT_FOUND)
         
-        serializer = self.get_serializer(theme)
-        return Response(serializer.data)
+        # Mismas URLs absolutas que produce el serializer con request
+        data = dict(tema['data'])
+        for campo in EstablishmentTheme.IMAGENES:
+            if data[campo]:
+                data[campo] = request.build_absolute_uri(data[campo])
+        data['renditions'] = mapear_renditions(data['renditions'], request.build_absolute_uri)
+        
+        response = Response(data)
+        # ETag fuerte por versión: ConditionalGetMiddleware responde 304
+        response['ETag'] = tema['etag']
+        # Depende del usuario: solo caché del navegador, revalidando por ETag
+        patch_cache_control(response, private=True, no_cache=True)
+        return response
+
+
+# Archivos nombrados por hash de contenido (EstablishmentTheme.save, con sufijo si
+# el storage lo agrega) y directorios de versiones (inspections.imagenes)
+_MEDIA_CON_HASH = re.compile(r'(^|/)[0-9a-f]{20}((_[A-Za-z0-9]{7})?\.\w+$|/)')
+
+
+def servir_media(request, path):
+    """
+    Sirve archivos de MEDIA_ROOT. Los nombrados por hash de contenido no
+    cambian nunca, así que se marcan como inmutables.
+    """
+    response = serve(request, path, document_root=settings.MEDIA_ROOT)
+    if response.status_code == 200 and _MEDIA_CON_HASH.search(path):
+        patch_cache_control(response, public=True, max_age=CACHE_INMUTABLE_SEGUNDOS, immutable=True)
+    return response
@@ -6,51 +6,64 @@ from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework_simplejwt.views import TokenObtainPairView
 from rest_framework_simplejwt.serializers import TokenObtainPairSerializer
+from django.conf import settings
 from django.contrib.auth.models import User
-from django.db.models import Q, Count
+from django.core.cache import cache
+from django.db.models import Q, F, Count, Sum, FloatField
+from django.db.models.functions import Cast, NullIf, TruncWeek
 from django.utils import timezone
 from datetime import timedelta
 
-from .models import Establishment, EstablishmentTheme, UserProfile, Inspection
+from .authentication import obtener_principal
+from .conexiones import contador as contador_conexiones
+from .middleware import histograma
+from .models import Establishment, EstablishmentTheme, UserProfile, Inspection, InspectionDailySummary
 from .serializers_admin import (
     EstablishmentDetailSerializer,
     EstablishmentCreateSerializer,
     EstablishmentThemeSerializer,
     UserSerializer,
     UserProfileSerializer,
-    DashboardStatsSerializer
+    DashboardStatsSerializer,
+    AnalyticsQuerySerializer,
+    tema_cacheado
 )
+from .suscripciones import suscripciones
+from .ultimo_acceso import registrar_login
 
 
 class IsSuperAdmin(permissions.BasePermission):
     """Permiso: solo superadministradores."""
     
     def has_permission(self, request, view):
-        return (
-            request.user and
-            request.user.is_authenticated and
-            hasattr(request.user, 'profile') and
-            request.user.profile.is_superadmin()
-        )
+        principal = obtener_principal(request.user)
+        return principal is not None and principal.is_superadmin()
 
 
 class IsEstablishmentAdmin(permissions.BasePermission):
     """Permiso: administrador de establecimiento."""
     
     def has_permission(self, request, view):
-        return (
-            request.user and
-            request.user.is_authenticated and
-            hasattr(request.user, 'profile') and
-            request.user.profile.is_establishment_admin()
-        )
+        principal = obtener_principal(request.user)
+        return principal is not None and principal.is_establishment_admin()
 
 
 class CustomTokenObtainPairSerializer(TokenObtainPairSerializer):
     """Serializer personalizado para JWT con información del usuario."""
     
+    @classmethod
+    def get_token(cls, user):
+        """Agrega rol y establecimiento como claims (informativos para el cliente)."""
+        token = super().get_token(user)
+        principal = obtener_principal(user)
+        token['role'] = principal.role
+        token['establishment_id'] = principal.establishment_id
+        return token
+    
     def validate(self, attrs):
         data = super().validate(attrs)
+        registrar_login(self.user)
+        principal = obtener_principal(self.user)
         
         # Agregar información del usuario
         data['user'] = {
@@ -62,20 +75,13 @@ class CustomTokenObtainPairSerializer(TokenObtainPairSerializer):
         }
         
         # Agregar rol si tiene perfil
-        if hasattr(self.user, 'profile'):
-            data['user']['role'] = self.user.profile.role
-            data['user']['is_superadmin'] = self.user.profile.is_superadmin()
-            data['user']['is_establishment_admin'] = self.user.profile.is_establishment_admin()
+        if principal.profile:
+            data['user']['role'] = principal.role
+            data['user']['is_superadmin'] = principal.is_superadmin()
+            data['user']['is_establishment_admin'] = principal.is_establishment_admin()
         
-        establishment = None
-        
-        # Buscar establecimiento: primero como admin, luego en el perfil
-        if hasattr(self.user, 'establishment_admin'):
-            establishment = self.user.establishment_admin
-        elif hasattr(self.user, 'profile') and self.user.profile.establishment:
-            establishment = self.user.profile.establishment
-        
-        # Agregar establecimiento si existe
+        # Agregar establecimiento si existe (primero como admin, luego en el perfil)
+        establishment = principal.establishment
         if establishment:
             data['user']['establishment'] = {
                 'id': establishment.id,
@@ -158,6 +164,144 @@ class AdminDashboardViewSet(viewsets.ViewSet):
         })
 
 
+class AdminAnalyticsViewSet(viewsets.ViewSet):
+    """
+    ViewSet de analytics de temporada para el superadmin.
+    
+    Todas las agregaciones se resuelven en la base de datos. Las series y
+    desgloses por especie/tabla leen InspectionDailySummary (O(días)); el
+    ranking de exportadores agrupa Inspection por rango de fecha.
+    
+    Parámetros comunes: ?desde=AAAA-MM-DD&hasta=AAAA-MM-DD (default: últimos
+    30 días), ?granularidad=dia|semana, ?limite=N.
+    """
+    permission_classes = [IsSuperAdmin]
+    
+    def _consultar(self, request, nombre, calcular):
+        """Valida parámetros y cachea el resultado por (rango, granularidad, límite)."""
+        serializer = AnalyticsQuerySerializer(data=request.query_params)
+        serializer.is_valid(raise_exception=True)
+        params = serializer.validated_data
+        
+        clave = 'analytics:{}:{}:{}:{}:{}'.format(
+            nombre, params['desde'], params['hasta'], params['granularidad'], params['limite']
+        )
+        data = cache.get(clave)
+        if data is None:
+            data = {
+                'desde': params['desde'],
+                'hasta': params['hasta'],
+                'resultados': calcular(params),
+            }
+            if nombre == 'series':
+                data['granularidad'] = params['granularidad']
+            cache.set(clave, data, settings.ANALYTICS_CACHE_TTL)
+        return Response(data)
+    
+    @staticmethod
+    def _resumenes(params):
+        return InspectionDailySummary.objects.filter(
+            fecha__gte=params['desde'],
+            fecha__lte=params['hasta']
+        )
+    
+    @staticmethod
+    def _totales():
+        return {
+            'inspecciones': Sum('cantidad_inspecciones'),
+            'cajas': Sum('total_cajas'),
+            'cajas_muestreadas': Sum('total_cajas_muestreadas'),
+        }
+    
+    @action(detail=False, methods=['get'])
+    def series(self, request):
+        """Inspecciones, cajas y cajas muestreadas por día o semana."""
+        def calcular(params):
+            qs = self._resumenes(params)
+            if params['granularidad'] == 'semana':
+                qs = qs.annotate(periodo=TruncWeek('fecha'))
+            else:
+                qs = qs.annotate(periodo=F('fecha'))
+            return list(
+                qs.values('periodo')
+                .annotate(**self._totales())
+                .order_by('periodo')
+            )
+        return self._consultar(request, 'series', calcular)
+    
+    @action(detail=False, methods=['get'])
+    def tablas(self, request):
+        """Proporción de cajas muestreadas sobre cajas inspeccionadas por tipo de tabla."""
+        def calcular(params):
+            return list(
+                self._resumenes(params)
+                .values('tipo_tabla')
+                .annotate(
+                    **self._totales(),
+                    proporcion_muestreo=(
+                        Cast(Sum('total_cajas_muestreadas'), FloatField()) /
+                        NullIf(Cast(Sum('total_cajas'), FloatField()), 0.0)
+                    )
+                )
+                .order_by('-inspecciones')
+            )
+        return self._consultar(request, 'tablas', calcular)
+    
+    @action(detail=False, methods=['get'])
+    def especies(self, request):
+        """Especies con más inspecciones en el rango."""
+        def calcular(params):
+            return list(
+                self._resumenes(params)
+                .values('especie')
+                .annotate(**self._totales())
+                .order_by('-inspecciones', 'especie')[:params['limite']]
+            )
+        return self._consultar(request, 'especies', calcular)
+    
+    @action(detail=False, methods=['get'])
+    def exportadores(self, request):
+        """Exportadores con más inspecciones en el rango."""
+        def calcular(params):
+            return list(
+                Inspection.objects.filter(
+                    fecha__gte=params['desde'],
+                    fecha__lte=params['hasta']
+                )
+                .values('exportador')
+                .annotate(
+                    inspecciones=Count('id'),
+                    cajas=Sum('tamano_lote'),
+                    cajas_muestreadas=Sum('sampling_result__tamano_muestra')
+                )
+                .order_by('-inspecciones', 'exportador')[:params['limite']]
+            )
+        return self._consultar(request, 'exportadores', calcular)
+
+
+class AdminProfilingViewSet(viewsets.ViewSet):
+    """
+    Histograma de latencias por endpoint (últimos requests de este proceso).
+    Requiere PROFILING_ENABLED=True; cada worker mantiene su propio histograma.
+    """
+    permission_classes = [IsSuperAdmin]
+    
+    def list(self, request):
+        return Response({
+            'enabled': settings.PROFILING_ENABLED,
+            'ventana': histograma.ventana,
+            'endpoints': histograma.snapshot(),
+            'conexiones_abiertas': contador_conexiones.snapshot(),
+        })
+    
+    @action(detail=False, methods=['post'])
+    def reset(self, request):
+        """Reinicia el histograma y el contador de conexiones."""
+        histograma.reiniciar()
+        contador_conexiones.reiniciar()
+        return Response({'success': True, 'message': 'Histograma reiniciado'})
+
+
 class AdminEstablishmentViewSet(viewsets.ModelViewSet):
     """ViewSet para gestión de establecimientos (Superadmin)."""
     permission_classes = [IsSuperAdmin]
@@ -167,6 +311,15 @@ class AdminEstablishmentViewSet(viewsets.ModelViewSet):
         if self.action == 'create':
             return EstablishmentCreateSerializer
         return EstablishmentDetailSerializer
+
+    def perform_update(self, serializer):
+        # El PUT/PATCH puede cambiar estado, vencimiento o is_active
+        super().perform_update(serializer)
+        suscripciones.invalidar()
+
+    def perform_destroy(self, instance):
+        super().perform_destroy(instance)
+        suscripciones.invalidar()
     
     @action(detail=False, methods=['get'])
     def active(self, request):
@@ -221,6 +374,7 @@ class AdminEstablishmentViewSet(viewsets.ModelViewSet):
         establishment.subscription_expiry = new_expiry
         establishment.subscription_status = 'ACTIVE'
         establishment.save()
+        suscripciones.invalidar()
         
         serializer = self.get_serializer(establishment)
         return Response({
@@ -235,6 +389,7 @@ class AdminEstablishmentViewSet(viewsets.ModelViewSet):
         establishment = self.get_object()
         establishment.subscription_status = 'SUSPENDED'
         establishment.save()
+        suscripciones.invalidar()
         
         serializer = self.get_serializer(establishment)
         return Response({
@@ -250,6 +405,7 @@ class AdminEstablishmentViewSet(viewsets.ModelViewSet):
         establishment.subscription_status = 'ACTIVE'
         establishment.is_active = True
         establishment.save()
+        suscripciones.invalidar()
         
         serializer = self.get_serializer(establishment)
         return Response({
@@ -296,13 +452,8 @@ class CurrentUserViewSet(viewsets.ViewSet):
         serializer = UserSerializer(request.user)
         data = serializer.data
         
-        establishment = None
-        
-        # Buscar establecimiento: primero como admin, luego en el perfil
-        if hasattr(request.user, 'establishment_admin'):
-            establishment = request.user.establishment_admin
-        elif hasattr(request.user, 'profile') and request.user.profile.establishment:
-            establishment = request.user.profile.establishment
+        # Primero como admin, luego en el perfil
+        establishment = obtener_principal(request.user).establishment
         
         # Agregar información del establecimiento si existe
         if establishment:
@@ -315,10 +466,9 @@ class CurrentUserViewSet(viewsets.ViewSet):
                 'days_until_expiry': establishment.days_until_expiry()
             }
             
-            # Agregar tema si existe
-            if hasattr(establishment, 'theme'):
-                data['establishment']['theme'] = EstablishmentThemeSerializer(
-                    establishment.theme
-                ).data
+            # Agregar tema si existe (cacheado hasta que se modifique)
+            tema = tema_cacheado(establishment.id)
+            if tema is not None:
+                data['establishment']['theme'] = tema['data']
         
         return Response(data)
@@ -0,0 +1,164 @@
+"""
+Variantes async de los endpoints de lectura más usados.
+
+Bajo ASGI (config/asgi.py, uvicorn) una vista síncrona ocupa un hilo durante
+todo el request, incluido el tiempo que un cliente lento tarda en enviar y
+recibir; estas vistas usan el ORM async y solo ocupan el hilo de base de
+datos mientras corre cada consulta. Responden exactamente lo mismo que las
+acciones de los ViewSets (mismo JSON, mismos códigos y cabeceras de caché):
+
+- GET /api/inspections/<id>/                  → InspectionViewSet.retrieve
+- GET /api/inspections/<id>/bundle/           → InspectionViewSet.bundle
+- GET /api/themes/<id>/                       → ThemeViewSet.retrieve
+- GET /api/muestreo/diagrama-pallets/<id>/    → MuestreoViewSet.get_diagrama_pallets
+
+Son lecturas públicas (AllowAnyReadPermission), pero una cabecera
+Authorization se autentica igual que en DRF: un token inválido o vencido
+recibe el mismo 401. Los demás métodos de esas URLs se delegan a la vista
+síncrona. Se activan con ASYNC_READ_VIEWS (por defecto, solo bajo ASGI).
+"""
+import json
+from functools import wraps
+
+from asgiref.sync import sync_to_async
+from django.http import HttpResponse
+from django.utils.cache import patch_cache_control
+from rest_framework.exceptions import APIException, NotFound
+from rest_framework.request import Request
+from rest_framework.settings import api_settings
+from rest_framework.views import exception_handler
+
+from .models import EstablishmentTheme, Inspection
+from .renderers import ORJSONRenderer
+from .serializers import InspectionBundleSerializer, InspectionSerializer
+from .serializers_admin import EstablishmentThemeSerializer
+from .utils import construir_diagrama_pallets
+from .views import CACHE_TEMA_SEGUNDOS, InspectionViewSet, MuestreoViewSet, ThemeViewSet
+
+_renderer = ORJSONRenderer()
+
+
+def _json(data, status=200):
+    return HttpResponse(_renderer.render(data), status=status, content_type='application/json')
+
+
+def _no_encontrado():
+    return _json({'detail': str(NotFound.default_detail)}, status=404)
+
+
+@sync_to_async
+def _credenciales_invalidas(request):
+    """
+    Autentica con las clases de DEFAULT_AUTHENTICATION_CLASSES, como el ViewSet.
+
+    Returns:
+        HttpResponse con el error de DRF (401 + WWW-Authenticate) o None si
+        las credenciales son válidas
+    """
+    autenticadores = [clase() for clase in api_settings.DEFAULT_AUTHENTICATION_CLASSES]
+    drf_request = Request(request, authenticators=autenticadores)
+    try:
+        drf_request.user
+    except APIException as exc:
+        # Mismo criterio que APIView.handle_exception
+        cabecera = autenticadores[0].authenticate_header(drf_request)
+        response = _json(exception_handler(exc, {}).data, status=401 if cabecera else 403)
+        if cabecera:
+            response['WWW-Authenticate'] = cabecera
+        return response
+    return None
+
+
+def solo_lectura(vista_sync):
+    """Atiende GET con la vista async decorada y el resto con `vista_sync`."""
+    vista_sync = sync_to_async(vista_sync)
+
+    def decorador(vista_async):
+        @wraps(vista_async)
+        async def vista(request, *args, **kwargs):
+            if request.method == 'GET':
+                # Sin cabecera no hay credenciales que rechazar
+                if 'HTTP_AUTHORIZATION' in request.META:
+                    error = await _credenciales_invalidas(request)
+                    if error is not None:
+                        return error
+                return await vista_async(request, *args, **kwargs)
+            return await vista_sync(request, *args, **kwargs)
+        # Como las vistas de DRF (csrf_exempt de Django 4.2 no acepta vistas async)
+        vista.csrf_exempt = True
+        return vista
+    return decorador
+
+
+@solo_lectura(InspectionViewSet.as_view({
+    'get': 'retrieve', 'put': 'update', 'patch': 'partial_update', 'delete': 'destroy'
+}))
+async def inspeccion_detalle(request, pk):
+    """GET /api/inspections/<id>/"""
+    try:
+        inspection = await Inspection.objects.select_related('establishment').aget(pk=pk)
+    except Inspection.DoesNotExist:
+        return _no_encontrado()
+    return _json(InspectionSerializer(inspection).data)
+
+
+@solo_lectura(InspectionViewSet.as_view({'get': 'bundle'}))
+async def inspeccion_bundle(request, pk):
+    """GET /api/inspections/<id>/bundle/"""
+    inspection = await Inspection.objects.select_related(
+        *InspectionBundleSerializer.RELACIONES
+    ).filter(pk=pk).afirst()
+    if inspection is None:
+        return _no_encontrado()
+    return _json(InspectionBundleSerializer(inspection).data)
+
+
+@solo_lectura(ThemeViewSet.as_view({'get': 'retrieve'}))
+async def tema_detalle(request, pk):
+    """GET /api/themes/<id>/"""
+    theme = await EstablishmentTheme.objects.filter(pk=pk).afirst()
+    if theme is None:
+        return _no_encontrado()
+    response = _json(EstablishmentThemeSerializer(theme, context={'request': request}).data)
+    patch_cache_control(response, public=True, max_age=CACHE_TEMA_SEGUNDOS)
+    return response
+
+
+@solo_lectura(MuestreoViewSet.as_view({'get': 'get_diagrama_pallets'}))
+async def diagrama_pallets(request, inspection_id):
+    """GET /api/muestreo/diagrama-pallets/<id>/"""
+    # Inspección, establecimiento y resultado en una sola consulta
+    inspection = await Inspection.objects.select_related(
+        *InspectionBundleSerializer.RELACIONES
+    ).filter(pk=inspection_id).afirst()
+    if inspection is None:
+        return _no_encontrado()
+
+    sampling_result = getattr(inspection, 'sampling_result', None)
+    if sampling_result is None:
+        return _json({
+            'success': False,
+            'message': 'La inspección no tiene resultados de muestreo'
+        }, status=404)
+
+    if not inspection.pallet_configurations:
+        return _json({
+            'success': False,
+            'message': 'Configuración de pallets requerida',
+            'requires_configuration': True
+        })
+
+    pallets_data = construir_diagrama_pallets(
+        inspection.tipo_muestreo,
+        inspection.pallet_configurations,
+        inspection.selected_pallets,
+        json.loads(sampling_result.cajas_seleccionadas)
+    )
+    return _json({
+        'success': True,
+        'data': {
+            'inspection': InspectionSerializer(inspection).data,
+            'total_pallets_mostrados': len(pallets_data),
+            'pallets': pallets_data
+        }
+    })
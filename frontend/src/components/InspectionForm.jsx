@@ -2,17 +2,27 @@
  * InspectionForm - Formulario de captura de datos de inspección
  */
 
-import { useState, useEffect } from 'react';
+import { useState, useEffect, useRef } from 'react';
 import { useAuth } from '../contexts/AuthContext';
 import { apiService } from '../services/api';
 import StageSamplingPanel from './StageSamplingPanel';
 import './InspectionForm.css';
 
+// Clave de idempotencia para POST /muestreo/generar/
+const nuevaClave = () => (
+  window.crypto?.randomUUID
+    ? window.crypto.randomUUID()
+    : `${Date.now().toString(36)}-${Math.random().toString(36).slice(2)}`
+);
+
 function InspectionForm({ onSamplingGenerated, onSubscriptionError }) {
   const { user } = useAuth();
   const [establishments, setEstablishments] = useState([]);
   const [loading, setLoading] = useState(false);
   const [error, setError] =useState(null);
+  // Se reutiliza mientras no cambie el payload: un reintento tras un error de red
+  // retorna la inspección ya creada en vez de crear otra
+  const idempotencia = useRef({ clave: null, payload: null });
   
   const [formData, setFormData] = useState({
     exportador: '',
@@ -196,9 +206,15 @@ function InspectionForm({ onSamplingGenerated, onSubscriptionError }) {
         delete payload.boxes_per_pallet;
       }
 
-      const response = await apiService.generateSampling(payload);
+      const payloadJson = JSON.stringify(payload);
+      if (idempotencia.current.payload !== payloadJson) {
+        idempotencia.current = { clave: nuevaClave(), payload: payloadJson };
+      }
+
+      const response = await apiService.generateSampling(payload, idempotencia.current.clave);
 
       if (response.success) {
+        idempotencia.current = { clave: null, payload: null };
         onSamplingGenerated(response.data);
       } else {
         setError(response.message || 'Error al generar el muestreo');
@@ -12,10 +12,37 @@ import chileLogoImg from '../images/logo_chile.png';
 // Importar con alias para manejar espacio en el nombre
 import minsalLogoImg from '../images/Logo MINSAL.jpg';
 
+/**
+ * Lee una respuesta text/event-stream y llama a onEvent(evento, data) por
+ * cada evento recibido, a medida que llegan.
+ */
+async function leerEventosSSE(response, onEvent) {
+  const reader = response.body.getReader();
+  const decoder = new TextDecoder();
+  let pendiente = '';
+  for (;;) {
+    const { value, done } = await reader.read();
+    if (done) break;
+    pendiente += decoder.decode(value, { stream: true });
+    const bloques = pendiente.split('\n\n');
+    pendiente = bloques.pop();
+    for (const bloque of bloques) {
+      let evento = 'message';
+      let datos = '';
+      for (const linea of bloque.split('\n')) {
+        if (linea.startsWith('event:')) evento = linea.slice(6).trim();
+        else if (linea.startsWith('data:')) datos += linea.slice(5).trim();
+      }
+      if (datos) onEvent(evento, JSON.parse(datos));
+    }
+  }
+}
+
 function SamplingResultView({ result, onNewInspection }) {
   const { inspection, sampling_result } = result;
   const [printingZebra, setPrintingZebra] = useState(false);
   const [zebraError, setZebraError] = useState(null);
+  const [zebraProgress, setZebraProgress] = useState(null);
   const [showDiagrams, setShowDiagrams] = useState(false);
 
   const generatePDF = async () => {
@@ -290,25 +317,55 @@ function SamplingResultView({ result, onNewInspection }) {
       
       const selectedPrinter = printers[printerIndex];
 
-      // Enviar datos de impresión
-      const response = await fetch(`${PRINT_SERVICE_URL}/print`, {
+      // Enviar el trabajo por /print/stream (NDJSON): la primera línea es la
+      // cabecera y la segunda los números; la respuesta informa el avance
+      // tira por tira como Server-Sent Events.
+      const cuerpo = [
+        { lote: inspection.numero_lote, printer: selectedPrinter },
+        sampling_result.cajas_seleccionadas,
+      ].map((linea) => JSON.stringify(linea)).join('\n') + '\n';
+
+      const response = await fetch(`${PRINT_SERVICE_URL}/print/stream`, {
         method: 'POST',
         headers: {
-          'Content-Type': 'application/json',
+          'Content-Type': 'application/x-ndjson',
         },
-        body: JSON.stringify({
-          lote: inspection.numero_lote,
-          numeros: sampling_result.cajas_seleccionadas,
-          printer: selectedPrinter
-        }),
+        body: cuerpo,
       });
 
-      const result = await response.json();
+      let result = null;
+      if (response.status === 404) {
+        // Servicio instalado antes de /print/stream: imprimir por /print
+        const respuestaPrint = await fetch(`${PRINT_SERVICE_URL}/print`, {
+          method: 'POST',
+          headers: {
+            'Content-Type': 'application/json',
+          },
+          body: JSON.stringify({
+            lote: inspection.numero_lote,
+            numeros: sampling_result.cajas_seleccionadas,
+            printer: selectedPrinter
+          }),
+        });
+        result = await respuestaPrint.json().catch(() => null);
+      } else if (!response.ok) {
+        const error = await response.json().catch(() => ({}));
+        throw new Error(error.error || 'Error desconocido al imprimir');
+      } else {
+        const totalEtiquetas = sampling_result.cajas_seleccionadas.length;
+        await leerEventosSSE(response, (evento, data) => {
+          if (evento === 'strip') {
+            setZebraProgress(`${data.etiquetas}/${totalEtiquetas}`);
+          } else if (evento === 'done' || evento === 'error') {
+            result = data;
+          }
+        });
+      }
 
-      if (result.success) {
+      if (result?.success) {
         alert(result.message);
       } else {
-        throw new Error(result.error || 'Error desconocido al imprimir');
+        throw new Error(result?.error || 'El servicio de impresión cerró la conexión');
       }
     } catch (error) {
       const errorMsg = error.message.includes('Failed to fetch') 
@@ -319,6 +376,7 @@ function SamplingResultView({ result, onNewInspection }) {
       alert('❌ Error de impresión:\n\n' + errorMsg);
     } finally {
       setPrintingZebra(false);
+      setZebraProgress(null);
     }
   };
 
@@ -480,7 +538,9 @@ function SamplingResultView({ result, onNewInspection }) {
               <svg width="20" height="20" viewBox="0 0 20 20" fill="currentColor">
                 <path fillRule="evenodd" d="M5 4v3H4a2 2 0 00-2 2v3a2 2 0 002 2h1v2a2 2 0 002 2h6a2 2 0 002-2v-2h1a2 2 0 002-2V9a2 2 0 00-2-2h-1V4a2 2 0 00-2-2H7a2 2 0 00-2 2zm8 0H7v3h6V4zm0 8H7v4h6v-4z" clipRule="evenodd" />
               </svg>
-              {printingZebra ? 'Imprimiendo...' : 'Etiquetas Zebra'}
+              {printingZebra
+                ? `Imprimiendo...${zebraProgress ? ` ${zebraProgress}` : ''}`
+                : 'Etiquetas Zebra'}
             </button>
 
             <button 
@@ -83,8 +83,25 @@ export const apiService = {
   },
 
   // ========== Muestreo ==========
-  async generateSampling(data) {
-    const response = await api.post('/muestreo/generar/', data);
+  // idempotencyKey: misma clave en los reintentos para no duplicar la inspección
+  async generateSampling(data, idempotencyKey) {
+    const headers = idempotencyKey ? { 'Idempotency-Key': idempotencyKey } : {};
+    const response = await api.post('/muestreo/generar/', data, { headers });
+    return response.data;
+  },
+
+  // Importación masiva: archivo .csv o .xlsx con un lote por fila; comunes
+  // completa las columnas que no trae la planilla (exportador, inspector_sag, ...)
+  async importLots(archivo, comunes = {}, soloValidar = false) {
+    const form = new FormData();
+    form.append('archivo', archivo);
+    Object.entries(comunes).forEach(([campo, valor]) => form.append(campo, valor));
+    if (soloValidar) {
+      form.append('solo_validar', 'true');
+    }
+    const response = await api.post('/muestreo/importar/', form, {
+      headers: { 'Content-Type': 'multipart/form-data' },
+    });
     return response.data;
   },
 
@@ -94,8 +111,9 @@ export const apiService = {
     return response.data;
   },
 
-  async getSamplingResult(id) {
-    const response = await api.get(`/sampling-results/${id}/`);
+  // Inspección, resultado de muestreo y diagrama (layout) en un solo request
+  async getInspectionBundle(inspectionId) {
+    const response = await api.get(`/inspections/${inspectionId}/bundle/`);
     return response.data;
   },
 
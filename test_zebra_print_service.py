@@ -0,0 +1,386 @@
+"""
+Pruebas unitarias del servicio de impresión Zebra.
+
+win32print solo existe en Windows: se reemplaza por un módulo falso que
+registra lo enviado al spooler, así las pruebas corren en cualquier sistema.
+
+    python -m unittest test_zebra_print_service
+"""
+import io
+import json
+import logging
+import os
+import queue
+import sys
+import tempfile
+import threading
+import time
+import types
+import unittest
+from http.client import HTTPConnection
+from http.server import ThreadingHTTPServer
+from unittest import mock
+
+
+class Win32PrintFalso(types.ModuleType):
+    """Sustituto mínimo de win32print que guarda los documentos enviados."""
+
+    PRINTER_ENUM_LOCAL = 2
+    PRINTER_ENUM_CONNECTIONS = 4
+
+    def __init__(self):
+        super().__init__('win32print')
+        self.impresoras = ['ZDesigner ZD230-203dpi ZPL']
+        self.documentos = []
+
+    def EnumPrinters(self, flags):
+        return [(0, '', nombre, '') for nombre in self.impresoras]
+
+    def OpenPrinter(self, nombre):
+        if nombre not in self.impresoras:
+            raise OSError(f"Impresora '{nombre}' no encontrada")
+        return nombre
+
+    def ClosePrinter(self, handle):
+        pass
+
+    def StartDocPrinter(self, handle, nivel, info):
+        return 1
+
+    def StartPagePrinter(self, handle):
+        pass
+
+    def WritePrinter(self, handle, datos):
+        self.documentos.append(datos)
+        return len(datos)
+
+    def EndPagePrinter(self, handle):
+        pass
+
+    def EndDocPrinter(self, handle):
+        pass
+
+
+win32print = Win32PrintFalso()
+sys.modules['win32print'] = win32print
+_journal = tempfile.TemporaryDirectory()
+os.environ['ZEBRA_JOURNAL_DIR'] = _journal.name
+
+import zebra_print_service as zs  # noqa: E402
+
+zs.logger.addHandler(logging.NullHandler())
+
+
+def tearDownModule():
+    _journal.cleanup()
+
+
+def en_windows():
+    """resolver_impresora solo acepta trabajos en Windows."""
+    return mock.patch.object(zs.platform, 'system', return_value='Windows')
+
+
+class LeerNumerosStreamTest(unittest.TestCase):
+    def test_acepta_numeros_listas_y_objetos(self):
+        lineas = [b'1\n', b'\n', b'[2, 3]\n', b'{"numeros": [4, 5]}\n', b'  6  ']
+        self.assertEqual(list(zs.leer_numeros_stream(lineas)), [1, 2, 3, 4, 5, 6])
+
+    def test_objeto_sin_numeros_no_entrega_nada(self):
+        self.assertEqual(list(zs.leer_numeros_stream([b'{"lote": "L-1"}'])), [])
+
+    def test_linea_invalida_lanza_error(self):
+        with self.assertRaises(ValueError):
+            list(zs.leer_numeros_stream([b'[1, 2']))
+
+
+class IterBodyLinesTest(unittest.TestCase):
+    def _handler(self, cuerpo, headers):
+        handler = zs.ZebraServiceHandler.__new__(zs.ZebraServiceHandler)
+        handler.rfile = io.BytesIO(cuerpo)
+        handler.headers = headers
+        return handler
+
+    def test_content_length(self):
+        cuerpo = b'{"lote": "L-1"}\n[1, 2]\n3'
+        handler = self._handler(cuerpo + b'basura', {'Content-Length': str(len(cuerpo))})
+        self.assertEqual(list(handler._iter_body_lines()),
+                         [b'{"lote": "L-1"}\n', b'[1, 2]\n', b'3'])
+
+    def test_chunked_con_lineas_partidas(self):
+        cuerpo = b'6\r\n[1, 2]\r\n5\r\n\n[3, \r\n3\r\n4]\n\r\n0\r\nX-Trailer: 1\r\n\r\n'
+        handler = self._handler(cuerpo, {'Transfer-Encoding': 'chunked'})
+        self.assertEqual(list(handler._iter_body_lines()), [b'[1, 2]', b'[3, 4]'])
+
+    def test_cuerpo_truncado(self):
+        handler = self._handler(b'[1]\n[2', {'Content-Length': '100'})
+        self.assertEqual(list(handler._iter_body_lines()), [b'[1]\n', b'[2'])
+
+
+class MetricasTest(unittest.TestCase):
+    def test_percentil(self):
+        self.assertEqual(zs._percentil([], 0.5), 0.0)
+        valores = [float(n) for n in range(1, 101)]
+        self.assertEqual(zs._percentil(valores, 0.5), 50.0)
+        self.assertEqual(zs._percentil(valores, 0.99), 99.0)
+        self.assertEqual(zs._percentil(valores, 1.0), 100.0)
+        self.assertEqual(zs._percentil([0.25], 0.95), 0.25)
+
+    def test_ciclo_de_trabajos(self):
+        m = zs.MetricasImpresion()
+        m.trabajo_encolado()
+        m.trabajo_encolado()
+        m.trabajo_iniciado()
+        m.tira_enviada('Zebra', 100, 2, 0.01)
+        m.tira_enviada('Zebra', 50, 1, 0.03)
+        m.trabajo_finalizado(True, True)
+        m.trabajo_finalizado(False, False)
+        datos = m.snapshot()
+        self.assertEqual(datos['jobs_queued'], 0)
+        self.assertEqual(datos['jobs_in_flight'], 0)
+        self.assertEqual(datos['jobs_completed'], 1)
+        self.assertEqual(datos['jobs_failed'], 1)
+        self.assertEqual(datos['strips_printed'], 2)
+        self.assertEqual(datos['labels_printed'], 3)
+        self.assertEqual(datos['bytes_sent'], {'Zebra': 150})
+        self.assertEqual(datos['spool_latency_seconds']['p50'], 0.01)
+        self.assertEqual(datos['spool_latency_seconds']['p99'], 0.03)
+
+    def test_prometheus_escapa_nombres_de_impresora(self):
+        m = zs.MetricasImpresion()
+        m.error_apertura('\\\\servidor\\"Zebra"')
+        texto = m.prometheus()
+        self.assertIn('zebra_printer_open_failures_total{printer="\\\\\\\\servidor\\\\\\"Zebra\\""} 1', texto)
+        self.assertIn('# TYPE zebra_spool_latency_seconds summary', texto)
+        self.assertTrue(texto.endswith('\n'))
+
+
+class JournalTest(unittest.TestCase):
+    def test_cargar_y_resumir_trabajo(self):
+        diario = zs.DiarioTrabajo.nuevo('L-1', 'Zebra', [1, 2, 3])
+        diario.registrar('numeros', numeros=[4, 5])
+        diario.registrar('tira', tira=1)
+        diario.finalizar(error='Sin etiquetas')
+        with open(diario.path, 'a', encoding='utf-8') as f:
+            f.write('{"evento": "tira", "ti')  # corte durante la escritura
+
+        trabajo = zs.cargar_trabajo(diario.job_id)
+        self.assertEqual(trabajo['numeros'], [1, 2, 3, 4, 5])
+        self.assertEqual(trabajo['impresas'], {1})
+        self.assertEqual(trabajo['estado'], 'error')
+        self.assertEqual(zs.resumen_trabajo(trabajo), {
+            "job_id": diario.job_id,
+            "lote": 'L-1',
+            "printer": 'Zebra',
+            "estado": 'error',
+            "error": 'Sin etiquetas',
+            "tiras_total": 3,
+            "tiras_impresas": 1,
+            "primera_pendiente": 2,
+            "etiquetas_total": 5,
+        })
+
+    def test_trabajo_activo_figura_en_curso(self):
+        diario = zs.DiarioTrabajo.nuevo('L-2', 'Zebra', [1])
+        diario.finalizar()
+        self.assertTrue(zs._marcar_activo(diario.job_id))
+        try:
+            self.assertFalse(zs._marcar_activo(diario.job_id))
+            self.assertEqual(zs.cargar_trabajo(diario.job_id)['estado'], 'en_curso')
+        finally:
+            zs._desmarcar_activo(diario.job_id)
+
+    def test_id_invalido_o_inexistente(self):
+        self.assertIsNone(zs.cargar_trabajo('../../etc/passwd'))
+        self.assertIsNone(zs.cargar_trabajo('0123456789ab'))
+
+
+class IdempotenciaTest(unittest.TestCase):
+    def setUp(self):
+        zs._idempotencia.clear()
+        win32print.documentos.clear()
+
+    def test_clave_idempotencia(self):
+        self.assertEqual(zs.clave_idempotencia('L-1', [2, 1], 'Zebra'),
+                         zs.clave_idempotencia('L-1', ['1', '2'], 'Zebra'))
+        self.assertNotEqual(zs.clave_idempotencia('L-1', [1, 2], 'Zebra'),
+                            zs.clave_idempotencia('L-1', [1, 3], 'Zebra'))
+        self.assertEqual(zs.clave_idempotencia('L-1', [1], 'Zebra', 'abc'), 'cliente:abc')
+
+    def test_reservar_y_completar(self):
+        entrada, original = zs._reservar_idempotencia('k')
+        self.assertTrue(original)
+        duplicada, original = zs._reservar_idempotencia('k')
+        self.assertIs(duplicada, entrada)
+        self.assertFalse(original)
+
+        zs._completar_idempotencia('k', entrada, {"success": True, "job_id": 'x'})
+        self.assertEqual(zs._resultado_coalescido(entrada, 'k'),
+                         {"success": True, "job_id": 'x', "coalesced": True})
+
+    def test_fallo_no_bloquea_reintentos(self):
+        entrada, _ = zs._reservar_idempotencia('k')
+        zs._completar_idempotencia('k', entrada, {"success": False, "error": 'x'})
+        self.assertTrue(zs._reservar_idempotencia('k')[1])
+
+    def test_entrada_vencida_se_descarta(self):
+        entrada, _ = zs._reservar_idempotencia('k')
+        zs._completar_idempotencia('k', entrada, {"success": True})
+        entrada.expira = time.monotonic() - 1
+        self.assertTrue(zs._reservar_idempotencia('k')[1])
+
+    def test_espera_del_duplicado_tiene_timeout(self):
+        entrada, _ = zs._reservar_idempotencia('k')
+        inicio = time.monotonic()
+        resultado = zs._resultado_coalescido(entrada, 'k', timeout=0.05)
+        self.assertLess(time.monotonic() - inicio, 1)
+        self.assertEqual(resultado, {"success": False, "error": zs.ERROR_EN_CURSO, "coalesced": True})
+
+    def test_duplicado_concurrente_no_reimprime(self):
+        entrada, _ = zs._reservar_idempotencia(zs.clave_idempotencia('L-1', [1, 2], 'ZDesigner ZD230-203dpi ZPL'))
+        resultados = []
+        hilo = threading.Thread(target=lambda: resultados.append(
+            zs.imprimir_etiquetas_idempotente('L-1', [2, 1], 'ZDesigner ZD230-203dpi ZPL')
+        ))
+        hilo.start()
+        zs._completar_idempotencia(
+            zs.clave_idempotencia('L-1', [1, 2], 'ZDesigner ZD230-203dpi ZPL'),
+            entrada, {"success": True, "job_id": 'original'}
+        )
+        hilo.join(2)
+        self.assertEqual(resultados, [{"success": True, "job_id": 'original', "coalesced": True}])
+        self.assertEqual(win32print.documentos, [])
+
+    def test_clave_reutilizada_con_otros_datos(self):
+        with en_windows():
+            primero = zs.imprimir_etiquetas_idempotente('L-1', [1, 2], 'ZDesigner ZD230-203dpi ZPL', 'abc')
+            reenvio = zs.imprimir_etiquetas_idempotente('L-1', [2, 1], 'ZDesigner ZD230-203dpi ZPL', 'abc')
+            otro = zs.imprimir_etiquetas_idempotente('L-2', [3, 4], 'ZDesigner ZD230-203dpi ZPL', 'abc')
+        self.assertEqual(reenvio, {**primero, "coalesced": True})
+        self.assertEqual(otro, {"success": False, "error": zs.ERROR_CLAVE_REUTILIZADA})
+        self.assertEqual(len(win32print.documentos), 1)
+
+    def test_reenvio_reutiliza_el_resultado(self):
+        with en_windows():
+            primero = zs.imprimir_etiquetas_idempotente('L-1', [1, 2, 3], 'ZDesigner ZD230-203dpi ZPL')
+            segundo = zs.imprimir_etiquetas_idempotente('L-1', [3, 2, 1], 'ZDesigner ZD230-203dpi ZPL')
+        self.assertTrue(primero['success'])
+        self.assertEqual(primero['printed_count'], 2)
+        self.assertEqual(segundo, {**primero, "coalesced": True})
+        self.assertEqual(len(win32print.documentos), 2)
+
+
+class TirasDesdeColaTest(unittest.TestCase):
+    def test_entrega_hasta_el_fin(self):
+        cola = queue.Queue()
+        for item in ((1, '1', '2'), (2, '3', None), zs._FIN_STREAM):
+            cola.put(item)
+        self.assertEqual(list(zs._tiras_desde_cola(cola)), [(1, '1', '2'), (2, '3', None)])
+
+    def test_propaga_el_error_del_productor(self):
+        cola = queue.Queue()
+        cola.put(ValueError('json inválido'))
+        with self.assertRaises(ValueError):
+            list(zs._tiras_desde_cola(cola))
+
+    def test_stream_detenido_libera_la_impresora(self):
+        cola = queue.Queue()
+        cola.put((1, '1', '2'))
+        trabajo = zs.TrabajoImpresion('L-1', 'ZDesigner ZD230-203dpi ZPL')
+        with self.assertRaises(TimeoutError):
+            zs._imprimir_tiras(trabajo, zs._tiras_desde_cola(cola, timeout=0.05))
+        self.assertEqual(trabajo.strips_printed, 1)
+        self.assertTrue(zs._print_lock.acquire(blocking=False))
+        zs._print_lock.release()
+
+
+class PrintStreamTest(unittest.TestCase):
+    """Prueba /print/stream contra un servidor real en un puerto libre."""
+
+    def setUp(self):
+        zs._idempotencia.clear()
+        win32print.documentos.clear()
+        parches = [
+            en_windows(),
+            mock.patch.object(zs, 'STREAM_READ_TIMEOUT_S', 0.3),
+            mock.patch.object(zs.ZebraServiceHandler, 'timeout', 0.3),
+            mock.patch.object(zs.ZebraServiceHandler, 'log_message', lambda *args: None),
+        ]
+        for parche in parches:
+            parche.start()
+            self.addCleanup(parche.stop)
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), zs.ZebraServiceHandler)
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.addCleanup(self.server.server_close)
+        self.addCleanup(self.server.shutdown)
+
+    def _eventos(self, respuesta):
+        eventos = []
+        for bloque in respuesta.read().decode('utf-8').split('\n\n'):
+            if bloque.strip():
+                evento, data = bloque.split('\n')
+                eventos.append((evento[len('event: '):], json.loads(data[len('data: '):])))
+        return eventos
+
+    def _conexion(self):
+        conexion = HTTPConnection('127.0.0.1', self.server.server_address[1], timeout=5)
+        self.addCleanup(conexion.close)
+        return conexion
+
+    def test_imprime_tira_por_tira(self):
+        cuerpo = b'{"lote": "L-1"}\n[1, 2]\n3\n'
+        conexion = self._conexion()
+        conexion.request('POST', '/print/stream', body=cuerpo)
+        eventos = self._eventos(conexion.getresponse())
+        self.assertEqual([e for e, _ in eventos], ['job', 'strip', 'strip', 'done'])
+        self.assertEqual(eventos[-1][1]['labels_count'], 3)
+        self.assertEqual(len(win32print.documentos), 2)
+
+    def test_cliente_detenido_aborta_el_trabajo(self):
+        conexion = self._conexion()
+        conexion.putrequest('POST', '/print/stream')
+        conexion.putheader('Content-Length', '1000')
+        conexion.endheaders()
+        conexion.send(b'{"lote": "L-1"}\n[1, 2]\n')  # y no envía el resto
+
+        inicio = time.monotonic()
+        eventos = self._eventos(conexion.getresponse())
+        self.assertLess(time.monotonic() - inicio, 3)
+        self.assertEqual([e for e, _ in eventos], ['job', 'strip', 'error'])
+        self.assertEqual(zs.cargar_trabajo(eventos[0][1]['job_id'])['estado'], 'error')
+        self.assertTrue(zs._print_lock.acquire(timeout=1))
+        zs._print_lock.release()
+
+    def test_duplicado_en_espera_recibe_409(self):
+        entrada, _ = zs._reservar_idempotencia('cliente:abc')
+        self.addCleanup(entrada.listo.set)
+        conexion = self._conexion()
+        with mock.patch.object(zs, 'IDEMPOTENCY_WAIT_S', 0.05):
+            conexion.request('POST', '/print', body=json.dumps({"lote": "L-1", "numeros": [1]}),
+                             headers={'Idempotency-Key': 'abc'})
+            respuesta = conexion.getresponse()
+        self.assertEqual(respuesta.status, 409)
+        self.assertEqual(json.loads(respuesta.read())['error'], zs.ERROR_EN_CURSO)
+        self.assertEqual(win32print.documentos, [])
+
+    def test_clave_reutilizada_recibe_409(self):
+        conexion = self._conexion()
+        conexion.request('POST', '/print', body=json.dumps({"lote": "L-1", "numeros": [1, 2]}),
+                         headers={'Idempotency-Key': 'abc'})
+        self.assertEqual(conexion.getresponse().status, 200)
+        self.assertEqual(len(win32print.documentos), 1)
+
+        for ruta, cuerpo in (
+            ('/print', json.dumps({"lote": "L-1", "numeros": [1, 3]})),
+            ('/print/stream', b'{"lote": "L-2"}\n[1, 2]\n'),
+        ):
+            with self.subTest(ruta=ruta):
+                conexion = self._conexion()
+                conexion.request('POST', ruta, body=cuerpo, headers={'Idempotency-Key': 'abc'})
+                respuesta = conexion.getresponse()
+                self.assertEqual(respuesta.status, 409)
+                self.assertEqual(json.loads(respuesta.read())['error'], zs.ERROR_CLAVE_REUTILIZADA)
+        self.assertEqual(len(win32print.documentos), 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
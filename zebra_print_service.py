@@ -2,10 +2,23 @@
 Servicio de impresión de etiquetas Zebra para Sistema USDA
 Escucha en http://localhost:5000 y recibe peticiones del navegador
 """
+import os
 import sys
+import math
+import re
+import uuid
+import hashlib
+import time
+import atexit
+import logging
+import logging.handlers
 import platform
 import json
-from http.server import HTTPServer, BaseHTTPRequestHandler
+import queue
+import threading
+from collections import deque
+from urllib.parse import urlsplit, parse_qs
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
 import win32print
 
 # Conversión y medidas (asumiendo 203 dpi)
@@ -21,6 +34,266 @@ SMALL_W = mm_to_dots(SMALL_BOX_MM)
 SMALL_H = SMALL_W
 MARGIN = mm_to_dots(2)     # margen pequeño
 
+# Streaming: máximo de tiras leídas del cliente que esperan impresora
+STREAM_QUEUE_MAX = 32
+_FIN_STREAM = object()
+# Segundos sin recibir datos del cliente antes de abortar el trabajo: evita que
+# una subida detenida retenga la impresora (y el lock) indefinidamente.
+STREAM_READ_TIMEOUT_S = float(os.environ.get('ZEBRA_STREAM_TIMEOUT', '30'))
+
+# Journal de trabajos: un archivo JSON-lines por trabajo para reanudar/reimprimir
+JOURNAL_DIR = os.environ.get('ZEBRA_JOURNAL_DIR', 'print_jobs')
+JOURNAL_RETENTION_DAYS = 7
+
+# Coalescencia de envíos duplicados: segundos durante los que un trabajo
+# completado se reutiliza para solicitudes idénticas (0 = solo en curso)
+IDEMPOTENCY_WINDOW_S = float(os.environ.get('ZEBRA_IDEMPOTENCY_WINDOW', '120'))
+# Espera máxima de un duplicado por el resultado del trabajo original
+IDEMPOTENCY_WAIT_S = float(os.environ.get('ZEBRA_IDEMPOTENCY_WAIT', '300'))
+
+# Serializa los trabajos: el servidor atiende peticiones en paralelo, pero las
+# tiras de dos lotes distintos no deben intercalarse en la misma impresora.
+_print_lock = threading.Lock()
+
+# ============================================
+# LOGGING
+# ============================================
+# Los registros pasan por un QueueHandler: el hilo que imprime solo encola el
+# registro y un QueueListener en segundo plano los escribe en disco (con
+# rotación) y en consola. Así la E/S bloqueante de la consola de Windows no
+# frena la impresión. El ZPL completo solo se registra en nivel DEBUG.
+LOG_FILE = os.environ.get('ZEBRA_LOG_FILE', 'zebra_print_service.log')
+LOG_LEVEL = os.environ.get('ZEBRA_LOG_LEVEL', 'INFO').upper()
+LOG_MAX_BYTES = 1024 * 1024   # 1 MB por archivo
+LOG_BACKUP_COUNT = 5
+LOG_BUFFER_SIZE = 500         # líneas que conserva el visor de la GUI
+
+logger = logging.getLogger('zebra_service')
+
+
+class FormatoEstructurado(logging.Formatter):
+    """Agrega los campos estructurados del registro (extra={'campos': {...}}) como clave=valor."""
+
+    def format(self, record):
+        mensaje = super().format(record)
+        campos = getattr(record, 'campos', None)
+        if campos:
+            mensaje += ' ' + ' '.join(f"{k}={v}" for k, v in campos.items())
+        return mensaje
+
+
+class RingBufferHandler(logging.Handler):
+    """
+    Conserva en memoria solo los últimos `capacity` registros formateados.
+    Cada línea lleva un número de secuencia para que el visor pida solo las nuevas.
+    """
+
+    def __init__(self, capacity=LOG_BUFFER_SIZE):
+        super().__init__()
+        self.records = deque(maxlen=capacity)
+        self._seq = 0
+
+    def emit(self, record):
+        try:
+            mensaje = self.format(record)
+        except Exception:
+            self.handleError(record)
+            return
+        with self.lock:
+            self._seq += 1
+            self.records.append((self._seq, mensaje))
+
+    def since(self, seq=0):
+        """Retorna (ultima_secuencia, [líneas con secuencia > seq])."""
+        with self.lock:
+            lineas = [m for s, m in self.records if s > seq]
+            return self._seq, lineas
+
+
+def configurar_logging(level=LOG_LEVEL, log_file=LOG_FILE, console=True, ring_buffer=None):
+    """
+    Configura el logger del servicio. Retorna el QueueListener ya iniciado
+    (se detiene automáticamente al salir del proceso).
+    """
+    formatter = FormatoEstructurado('%(asctime)s %(levelname)s %(message)s', '%Y-%m-%d %H:%M:%S')
+    handlers = []
+    if log_file:
+        file_handler = logging.handlers.RotatingFileHandler(
+            log_file, maxBytes=LOG_MAX_BYTES, backupCount=LOG_BACKUP_COUNT, encoding='utf-8'
+        )
+        handlers.append(file_handler)
+    if console:
+        handlers.append(logging.StreamHandler(sys.stdout))
+    if ring_buffer is not None:
+        handlers.append(ring_buffer)
+    for handler in handlers:
+        handler.setFormatter(formatter)
+
+    log_queue = queue.SimpleQueue()
+    listener = logging.handlers.QueueListener(log_queue, *handlers, respect_handler_level=True)
+    listener.start()
+    atexit.register(listener.stop)
+
+    logger.handlers = [logging.handlers.QueueHandler(log_queue)]
+    logger.setLevel(level)
+    logger.propagate = False
+    return listener
+
+
+# ============================================
+# MÉTRICAS
+# ============================================
+
+class MetricasImpresion:
+    """
+    Contadores del servicio expuestos en GET /metrics.
+
+    Se actualizan por cada tira, así que cada operación toma un único lock
+    durante unas pocas sumas; los percentiles se calculan solo al leerlas,
+    sobre una ventana acotada de las últimas latencias de spool.
+    """
+    LATENCY_SAMPLES = 2048      # latencias de spool conservadas para percentiles
+    RATE_WINDOW_S = 60          # ventana para etiquetas por segundo
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.inicio = time.time()
+        self.jobs_queued = 0
+        self.jobs_in_flight = 0
+        self.jobs_completed = 0
+        self.jobs_failed = 0
+        self.strips_printed = 0
+        self.labels_printed = 0
+        self.spool_seconds_sum = 0.0
+        self.printer_open_failures = {}
+        self.bytes_sent = {}
+        self._latencias = deque(maxlen=self.LATENCY_SAMPLES)
+        self._etiquetas_recientes = deque()
+
+    def trabajo_encolado(self):
+        with self._lock:
+            self.jobs_queued += 1
+
+    def trabajo_iniciado(self):
+        with self._lock:
+            self.jobs_queued -= 1
+            self.jobs_in_flight += 1
+
+    def trabajo_finalizado(self, iniciado, exito):
+        with self._lock:
+            if iniciado:
+                self.jobs_in_flight -= 1
+            else:
+                self.jobs_queued -= 1
+            if exito:
+                self.jobs_completed += 1
+            else:
+                self.jobs_failed += 1
+
+    def error_apertura(self, printer_name):
+        with self._lock:
+            self.printer_open_failures[printer_name] = self.printer_open_failures.get(printer_name, 0) + 1
+
+    def tira_enviada(self, printer_name, nbytes, etiquetas, spool_s):
+        ahora = time.monotonic()
+        with self._lock:
+            self.strips_printed += 1
+            self.labels_printed += etiquetas
+            self.spool_seconds_sum += spool_s
+            self.bytes_sent[printer_name] = self.bytes_sent.get(printer_name, 0) + nbytes
+            self._latencias.append(spool_s)
+            self._etiquetas_recientes.append((ahora, etiquetas))
+
+    def _etiquetas_por_segundo(self):
+        limite = time.monotonic() - self.RATE_WINDOW_S
+        while self._etiquetas_recientes and self._etiquetas_recientes[0][0] < limite:
+            self._etiquetas_recientes.popleft()
+        return sum(n for _, n in self._etiquetas_recientes) / self.RATE_WINDOW_S
+
+    def snapshot(self):
+        """Copia consistente de todas las métricas (para JSON y Prometheus)."""
+        with self._lock:
+            latencias = sorted(self._latencias)
+            datos = {
+                "uptime_seconds": round(time.time() - self.inicio, 3),
+                "jobs_queued": self.jobs_queued,
+                "jobs_in_flight": self.jobs_in_flight,
+                "jobs_completed": self.jobs_completed,
+                "jobs_failed": self.jobs_failed,
+                "strips_printed": self.strips_printed,
+                "labels_printed": self.labels_printed,
+                "labels_per_second": round(self._etiquetas_por_segundo(), 3),
+                "spool_latency_seconds": {
+                    "count": self.strips_printed,
+                    "sum": round(self.spool_seconds_sum, 6),
+                },
+                "printer_open_failures": dict(self.printer_open_failures),
+                "bytes_sent": dict(self.bytes_sent),
+            }
+        for nombre, q in (("p50", 0.50), ("p95", 0.95), ("p99", 0.99)):
+            datos["spool_latency_seconds"][nombre] = _percentil(latencias, q)
+        return datos
+
+    def prometheus(self):
+        """Métricas en formato de texto de Prometheus (versión 0.0.4)."""
+        datos = self.snapshot()
+        lineas = []
+
+        def metrica(nombre, tipo, ayuda, muestras):
+            lineas.append(f"# HELP zebra_{nombre} {ayuda}")
+            lineas.append(f"# TYPE zebra_{nombre} {tipo}")
+            for sufijo, etiquetas, valor in muestras:
+                lineas.append(f"zebra_{nombre}{sufijo}{etiquetas} {valor}")
+
+        metrica("uptime_seconds", "gauge", "Segundos desde el inicio del servicio.",
+                [("", "", datos["uptime_seconds"])])
+        metrica("jobs_queued", "gauge", "Trabajos esperando la impresora.",
+                [("", "", datos["jobs_queued"])])
+        metrica("jobs_in_flight", "gauge", "Trabajos imprimiéndose.",
+                [("", "", datos["jobs_in_flight"])])
+        metrica("jobs_completed_total", "counter", "Trabajos completados.",
+                [("", "", datos["jobs_completed"])])
+        metrica("jobs_failed_total", "counter", "Trabajos fallidos.",
+                [("", "", datos["jobs_failed"])])
+        metrica("strips_printed_total", "counter", "Tiras enviadas al spooler.",
+                [("", "", datos["strips_printed"])])
+        metrica("labels_printed_total", "counter", "Etiquetas enviadas al spooler.",
+                [("", "", datos["labels_printed"])])
+        metrica("labels_per_second", "gauge",
+                f"Etiquetas por segundo (últimos {self.RATE_WINDOW_S} s).",
+                [("", "", datos["labels_per_second"])])
+        spool = datos["spool_latency_seconds"]
+        metrica("spool_latency_seconds", "summary", "Latencia de spool por tira.",
+                [("", '{quantile="0.5"}', spool["p50"]),
+                 ("", '{quantile="0.95"}', spool["p95"]),
+                 ("", '{quantile="0.99"}', spool["p99"]),
+                 ("_sum", "", spool["sum"]),
+                 ("_count", "", spool["count"])])
+        metrica("printer_open_failures_total", "counter", "Errores al abrir la impresora.",
+                [("", f'{{printer="{_escapar_etiqueta(p)}"}}', n)
+                 for p, n in sorted(datos["printer_open_failures"].items())])
+        metrica("bytes_sent_total", "counter", "Bytes ZPL enviados por impresora.",
+                [("", f'{{printer="{_escapar_etiqueta(p)}"}}', n)
+                 for p, n in sorted(datos["bytes_sent"].items())])
+        return "\n".join(lineas) + "\n"
+
+
+def _percentil(valores_ordenados, q):
+    """Percentil por rango más cercano; 0 si aún no hay muestras."""
+    if not valores_ordenados:
+        return 0.0
+    indice = min(len(valores_ordenados) - 1, max(0, math.ceil(q * len(valores_ordenados)) - 1))
+    return round(valores_ordenados[indice], 6)
+
+
+def _escapar_etiqueta(valor):
+    """Escapa un valor de etiqueta Prometheus (nombres como \\\\servidor\\impresora)."""
+    return valor.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+metricas = MetricasImpresion()
+
+
 def get_available_printers():
     """Obtiene lista de impresoras disponibles en el sistema."""
     flags = win32print.PRINTER_ENUM_LOCAL | win32print.PRINTER_ENUM_CONNECTIONS
@@ -126,62 +399,261 @@ def build_zpl_double_label(lote, left_num, right_num=None):
     zpl.append("^XZ")
     return "\n".join(zpl)
 
-def imprimir_etiquetas(lote, numeros_caja, printer_name="ZDesigner ZD230-203dpi ZPL"):
-    """Imprime etiquetas Zebra con el lote y números de caja."""
-    if not numeros_caja:
-        return {"success": False, "error": "No hay números de caja para imprimir"}
-
+def resolver_impresora(printer_name):
+    """
+    Verifica que la impresora exista; si no, busca una Zebra alternativa.
+    Retorna (nombre_impresora, error). Solo uno de los dos es distinto de None.
+    """
     if platform.system() != "Windows":
-        return {"success": False, "error": "Este servicio solo funciona en Windows"}
+        return None, "Este servicio solo funciona en Windows"
 
     available = get_available_printers()
-    if printer_name not in available:
-        # Buscar impresora Zebra alternativa
-        zebra_printers = [p for p in available if 'zebra' in p.lower() or 'zdesigner' in p.lower()]
-        if zebra_printers:
-            printer_name = zebra_printers[0]
+    if printer_name in available:
+        return printer_name, None
+
+    # Buscar impresora Zebra alternativa
+    zebra_printers = [p for p in available if 'zebra' in p.lower() or 'zdesigner' in p.lower()]
+    if zebra_printers:
+        return zebra_printers[0], None
+    return None, f"Impresora Zebra no encontrada. Disponibles: {', '.join(available)}"
+
+def agrupar_en_tiras(numeros_caja):
+    """Agrupa los números de caja en tiras (número de tira 1-based, izquierda, derecha)."""
+    for i in range(0, len(numeros_caja), 2):
+        left = str(numeros_caja[i])
+        right = str(numeros_caja[i+1]) if i+1 < len(numeros_caja) else None
+        yield i // 2 + 1, left, right
+
+def enviar_tira(hPrinter, etiqueta_zpl):
+    """Envía una tira ZPL a la impresora como documento RAW independiente. Retorna los bytes enviados."""
+    datos = etiqueta_zpl.encode('utf-8')
+    win32print.StartDocPrinter(hPrinter, 1, ("Etiqueta USDA", None, "RAW"))
+    win32print.StartPagePrinter(hPrinter)
+    win32print.WritePrinter(hPrinter, datos)
+    win32print.EndPagePrinter(hPrinter)
+    win32print.EndDocPrinter(hPrinter)
+    return len(datos)
+
+
+# ============================================
+# JOURNAL DE TRABAJOS (reanudar / reimprimir)
+# ============================================
+# Cada trabajo escribe eventos en <JOURNAL_DIR>/<job_id>.jsonl:
+#   inicio   {lote, printer, numeros}  cabecera del trabajo
+#   numeros  {numeros}                 números recibidos por streaming
+#   tira     {tira}                    tira confirmada por el spooler
+#   reanudacion / reimpresion {desde, hasta, printer}
+#   fin      {estado, error}
+# Una tira se registra solo después de EndDocPrinter, así el journal nunca
+# marca como impresa una tira que no llegó al spooler.
+
+_JOB_ID_RE = re.compile(r'^[0-9a-f]{12}$')
+ERROR_EN_CURSO = "El trabajo se está imprimiendo"
+_trabajos_activos = set()
+_trabajos_activos_lock = threading.Lock()
+
+
+class DiarioTrabajo:
+    """Journal append-only (JSON lines) de un trabajo de impresión."""
+
+    def __init__(self, job_id, directorio=JOURNAL_DIR):
+        self.job_id = job_id
+        self.path = os.path.join(directorio, f"{job_id}.jsonl")
+        self._lock = threading.Lock()
+        self._archivo = None
+
+    @classmethod
+    def nuevo(cls, lote, printer_name, numeros):
+        """Crea el journal de un trabajo nuevo y registra su cabecera."""
+        os.makedirs(JOURNAL_DIR, exist_ok=True)
+        diario = cls(uuid.uuid4().hex[:12])
+        diario.registrar('inicio', lote=lote, printer=printer_name, numeros=list(numeros))
+        return diario
+
+    def registrar(self, evento, **datos):
+        linea = json.dumps({"evento": evento, "ts": round(time.time(), 3), **datos}, ensure_ascii=False)
+        with self._lock:
+            if self._archivo is None:
+                self._archivo = open(self.path, 'a', encoding='utf-8')
+            self._archivo.write(linea + '\n')
+            self._archivo.flush()
+
+    def finalizar(self, error=None):
+        """Registra el fin del trabajo (o del tramo reanudado) y cierra el archivo."""
+        if error:
+            self.registrar('fin', estado='error', error=error)
         else:
-            return {
-                "success": False, 
-                "error": f"Impresora Zebra no encontrada. Disponibles: {', '.join(available)}"
-            }
+            self.registrar('fin', estado='completado')
+        with self._lock:
+            if self._archivo is not None:
+                self._archivo.close()
+                self._archivo = None
+
 
+def cargar_trabajo(job_id):
+    """
+    Reconstruye el estado de un trabajo desde su journal.
+    Retorna None si el id no es válido o el trabajo no existe.
+    """
+    if not _JOB_ID_RE.match(job_id or ''):
+        return None
+    path = os.path.join(JOURNAL_DIR, f"{job_id}.jsonl")
+    if not os.path.exists(path):
+        return None
+
+    trabajo = {"job_id": job_id, "lote": None, "printer": None, "numeros": [],
+               "impresas": set(), "estado": "interrumpido", "error": None}
+    with open(path, encoding='utf-8') as f:
+        for linea in f:
+            try:
+                evento = json.loads(linea)
+            except ValueError:
+                continue  # línea truncada por un corte durante la escritura
+            tipo = evento.get('evento')
+            if tipo == 'inicio':
+                trabajo.update(lote=evento['lote'], printer=evento['printer'])
+                trabajo['numeros'].extend(evento.get('numeros', []))
+            elif tipo == 'numeros':
+                trabajo['numeros'].extend(evento['numeros'])
+            elif tipo == 'tira':
+                trabajo['impresas'].add(evento['tira'])
+            elif tipo in ('reanudacion', 'reimpresion'):
+                trabajo.update(estado='interrumpido', error=None)
+            elif tipo == 'fin':
+                trabajo.update(estado=evento['estado'], error=evento.get('error'))
+
+    with _trabajos_activos_lock:
+        if job_id in _trabajos_activos:
+            trabajo['estado'] = 'en_curso'
+    return trabajo
+
+
+def resumen_trabajo(trabajo):
+    """Representación JSON del estado de un trabajo."""
+    total = (len(trabajo['numeros']) + 1) // 2
+    pendientes = [n for n in range(1, total + 1) if n not in trabajo['impresas']]
+    return {
+        "job_id": trabajo['job_id'],
+        "lote": trabajo['lote'],
+        "printer": trabajo['printer'],
+        "estado": trabajo['estado'],
+        "error": trabajo['error'],
+        "tiras_total": total,
+        "tiras_impresas": len(trabajo['impresas']),
+        "primera_pendiente": pendientes[0] if pendientes else None,
+        "etiquetas_total": len(trabajo['numeros']),
+    }
+
+
+def _marcar_activo(job_id):
+    """Marca un trabajo como en curso. False si ya se está imprimiendo."""
+    with _trabajos_activos_lock:
+        if job_id in _trabajos_activos:
+            return False
+        _trabajos_activos.add(job_id)
+        return True
+
+
+def _desmarcar_activo(job_id):
+    with _trabajos_activos_lock:
+        _trabajos_activos.discard(job_id)
+
+
+def limpiar_journal(dias=JOURNAL_RETENTION_DAYS):
+    """Elimina journals de trabajos con más de `dias` de antigüedad."""
+    if not os.path.isdir(JOURNAL_DIR):
+        return 0
+    limite = time.time() - dias * 86400
+    eliminados = 0
+    for nombre in os.listdir(JOURNAL_DIR):
+        path = os.path.join(JOURNAL_DIR, nombre)
+        if nombre.endswith('.jsonl') and os.path.getmtime(path) < limite:
+            try:
+                os.remove(path)
+                eliminados += 1
+            except OSError:
+                pass
+    return eliminados
+
+
+class TrabajoImpresion:
+    """Progreso y tiempos de un trabajo de impresión."""
+
+    def __init__(self, lote, printer_name, diario=None):
+        self.lote = lote
+        self.printer_name = printer_name
+        self.diario = diario
+        self.strips_printed = 0
+        self.labels_printed = 0
+        self.recibido = time.perf_counter()
+        self.queue_wait_s = 0.0
+        self.render_s = 0.0
+        self.spool_s = 0.0
+
+    @property
+    def job_id(self):
+        return self.diario.job_id if self.diario else None
+
+    def campos(self):
+        campos = campos_trabajo(
+            self.lote, self.printer_name, self.strips_printed, self.labels_printed,
+            self.queue_wait_s, self.render_s, self.spool_s
+        )
+        if self.diario:
+            campos['job_id'] = self.diario.job_id
+        return campos
+
+
+def _imprimir_tiras(trabajo, tiras, al_imprimir=None):
+    """
+    Núcleo común de impresión: toma la impresora, envía cada tira
+    (número, izq, der) y actualiza progreso, tiempos, métricas y journal.
+    `al_imprimir(trabajo, numero, izq, der)` se llama tras cada tira confirmada
+    por el spooler. Propaga las excepciones; el progreso parcial queda en
+    `trabajo` y en su journal.
+    """
+    metricas.trabajo_encolado()
+    iniciado = False
     hPrinter = None
     try:
-        hPrinter = win32print.OpenPrinter(printer_name)
-        
-        # Imprimir en pares: (0,1), (2,3), ...
-        i = 0
-        strips_printed = 0
-        while i < len(numeros_caja):
-            left = str(numeros_caja[i])
-            right = str(numeros_caja[i+1]) if i+1 < len(numeros_caja) else None
-            etiqueta_zpl = build_zpl_double_label(lote, left, right)
-            
-            # Log para debugging
-            print(f"\n{'='*60}")
-            print(f"Imprimiendo tira {strips_printed + 1}: Izq={left}, Der={right or 'vacío'}")
-            print(f"ZPL generado:")
-            print(etiqueta_zpl)
-            print(f"{'='*60}\n")
-            
-            win32print.StartDocPrinter(hPrinter, 1, ("Etiqueta USDA", None, "RAW"))
-            win32print.StartPagePrinter(hPrinter)
-            win32print.WritePrinter(hPrinter, etiqueta_zpl.encode('utf-8'))
-            win32print.EndPagePrinter(hPrinter)
-            win32print.EndDocPrinter(hPrinter)
-            
-            strips_printed += 1
-            i += 2
+        with _print_lock:
+            trabajo.queue_wait_s = time.perf_counter() - trabajo.recibido
+            metricas.trabajo_iniciado()
+            iniciado = True
+            try:
+                hPrinter = win32print.OpenPrinter(trabajo.printer_name)
+            except Exception:
+                metricas.error_apertura(trabajo.printer_name)
+                raise
 
-        return {
-            "success": True,
-            "message": f"✅ Se imprimieron {strips_printed} tiras ({len(numeros_caja)} etiquetas) en '{printer_name}'"
-        }
-    
-    except Exception as e:
-        return {"success": False, "error": f"Error al imprimir: {str(e)}"}
-    
+            for numero, left, right in tiras:
+                t0 = time.perf_counter()
+                etiqueta_zpl = build_zpl_double_label(trabajo.lote, left, right)
+                t1 = time.perf_counter()
+                if logger.isEnabledFor(logging.DEBUG):
+                    logger.debug(
+                        "Tira %d: Izq=%s, Der=%s\n%s",
+                        numero, left, right or 'vacío', etiqueta_zpl
+                    )
+                t2 = time.perf_counter()
+                nbytes = enviar_tira(hPrinter, etiqueta_zpl)
+                spool_s = time.perf_counter() - t2
+                etiquetas = 1 if right is None else 2
+
+                trabajo.render_s += t1 - t0
+                trabajo.spool_s += spool_s
+                trabajo.strips_printed += 1
+                trabajo.labels_printed += etiquetas
+                metricas.tira_enviada(trabajo.printer_name, nbytes, etiquetas, spool_s)
+                if trabajo.diario:
+                    trabajo.diario.registrar('tira', tira=numero)
+                if al_imprimir:
+                    al_imprimir(trabajo, numero, left, right)
+    except BaseException:
+        metricas.trabajo_finalizado(iniciado, False)
+        raise
+    else:
+        metricas.trabajo_finalizado(iniciado, True)
     finally:
         if hPrinter:
             try:
@@ -190,8 +662,314 @@ def imprimir_etiquetas(lote, numeros_caja, printer_name="ZDesigner ZD230-203dpi
                 pass
 
 
+def imprimir_etiquetas(lote, numeros_caja, printer_name="ZDesigner ZD230-203dpi ZPL"):
+    """Imprime etiquetas Zebra con el lote y números de caja."""
+    if not numeros_caja:
+        return {"success": False, "error": "No hay números de caja para imprimir"}
+
+    printer_name, error = resolver_impresora(printer_name)
+    if error:
+        return {"success": False, "error": error}
+
+    diario = DiarioTrabajo.nuevo(lote, printer_name, numeros_caja)
+    _marcar_activo(diario.job_id)
+    try:
+        # Imprimir en pares: (0,1), (2,3), ...
+        return _ejecutar_trabajo(
+            TrabajoImpresion(lote, printer_name, diario), agrupar_en_tiras(numeros_caja)
+        )
+    finally:
+        _desmarcar_activo(diario.job_id)
+
+
+def reanudar_trabajo(job_id, desde=None, hasta=None, printer_name=None):
+    """
+    Continúa un trabajo desde su journal.
+
+    Sin rango, imprime las tiras que aún no fueron confirmadas (reanudar tras
+    un atasco o falta de etiquetas). Con `desde`/`hasta` (números de tira,
+    1-based e inclusivos) reimprime solo ese tramo. Retorna None si el
+    trabajo no existe.
+    """
+    trabajo = cargar_trabajo(job_id)
+    if trabajo is None:
+        return None
+    if trabajo['estado'] == 'en_curso':
+        return {"success": False, "error": ERROR_EN_CURSO, "job_id": job_id}
+
+    tiras = list(agrupar_en_tiras(trabajo['numeros']))
+    if desde is None and hasta is None:
+        evento = 'reanudacion'
+        seleccion = [t for t in tiras if t[0] not in trabajo['impresas']]
+        if not seleccion:
+            return {"success": True, "message": "✅ El trabajo no tiene tiras pendientes",
+                    "job_id": job_id, "printed_count": 0}
+    else:
+        evento = 'reimpresion'
+        desde = desde or 1
+        hasta = hasta or len(tiras)
+        if not (1 <= desde <= hasta <= len(tiras)):
+            return {"success": False, "job_id": job_id,
+                    "error": f"Rango inválido: el trabajo tiene tiras 1 a {len(tiras)}"}
+        seleccion = tiras[desde - 1:hasta]
+
+    printer_name, error = resolver_impresora(printer_name or trabajo['printer'])
+    if error:
+        return {"success": False, "error": error, "job_id": job_id}
+    if not _marcar_activo(job_id):
+        return {"success": False, "error": ERROR_EN_CURSO, "job_id": job_id}
+    try:
+        diario = DiarioTrabajo(job_id)
+        diario.registrar(evento, desde=seleccion[0][0], hasta=seleccion[-1][0], printer=printer_name)
+        return _ejecutar_trabajo(TrabajoImpresion(trabajo['lote'], printer_name, diario), seleccion)
+    finally:
+        _desmarcar_activo(job_id)
+
+
+def _ejecutar_trabajo(trabajo, tiras):
+    """Imprime las tiras de un trabajo con journal y arma la respuesta JSON."""
+    try:
+        _imprimir_tiras(trabajo, tiras)
+    except Exception as e:
+        trabajo.diario.finalizar(error=str(e))
+        logger.error("Error al imprimir: %s", e, extra={'campos': trabajo.campos()})
+        return {
+            "success": False,
+            "error": f"Error al imprimir: {str(e)}",
+            "job_id": trabajo.job_id,
+            "printed_count": trabajo.strips_printed,
+        }
+
+    trabajo.diario.finalizar()
+    logger.info("Trabajo impreso", extra={'campos': trabajo.campos()})
+    return {
+        "success": True,
+        "message": f"✅ Se imprimieron {trabajo.strips_printed} tiras ({trabajo.labels_printed} etiquetas) en '{trabajo.printer_name}'",
+        "job_id": trabajo.job_id,
+        "printed_count": trabajo.strips_printed,
+        "labels_count": trabajo.labels_printed,
+    }
+
+
+# ============================================
+# IDEMPOTENCIA (envíos duplicados)
+# ============================================
+# Las tablets reenvían la misma solicitud cuando el Wi-Fi falla. Las
+# solicitudes con la misma clave (header Idempotency-Key, o un hash de
+# lote + cajas ordenadas + impresora) se fusionan: si el trabajo original
+# sigue en curso se espera su resultado, y si terminó con éxito hace menos
+# de IDEMPOTENCY_WINDOW_S segundos se devuelve su resultado sin reimprimir.
+# Cada entrada guarda la huella del contenido: una Idempotency-Key reutilizada
+# con otro lote, cajas o impresora se rechaza con 409 en vez de devolver el
+# resultado de otro trabajo (y dejar etiquetas sin imprimir).
+
+ERROR_CLAVE_REUTILIZADA = "La Idempotency-Key ya se usó con otros datos de impresión"
+
+class _EntradaIdempotencia:
+    """Trabajo original asociado a una clave de idempotencia."""
+
+    def __init__(self, huella=None):
+        self.listo = threading.Event()
+        self.resultado = None
+        self.expira = None
+        self.huella = huella
+
+
+_idempotencia = {}
+_idempotencia_lock = threading.Lock()
+
+
+def huella_trabajo(lote, numeros, printer_name):
+    """Hash del contenido normalizado (lote, cajas ordenadas, impresora)."""
+    contenido = json.dumps(
+        [str(lote), sorted(str(n) for n in numeros), printer_name or ''], ensure_ascii=False
+    )
+    return hashlib.sha256(contenido.encode('utf-8')).hexdigest()
+
+
+def clave_idempotencia(lote, numeros, printer_name, clave_cliente=None):
+    """Clave del trabajo: la enviada por el cliente o un hash del contenido."""
+    if clave_cliente:
+        return f"cliente:{clave_cliente}"
+    return "hash:" + huella_trabajo(lote, numeros, printer_name)
+
+
+def _reservar_idempotencia(clave, huella=None):
+    """
+    Retorna (entrada, es_original). Descarta antes las entradas vencidas.
+    `huella` (ver huella_trabajo) queda guardada en la entrada nueva.
+    """
+    ahora = time.monotonic()
+    with _idempotencia_lock:
+        vencidas = [k for k, e in _idempotencia.items() if e.expira is not None and e.expira < ahora]
+        for k in vencidas:
+            del _idempotencia[k]
+        entrada = _idempotencia.get(clave)
+        if entrada is not None:
+            return entrada, False
+        entrada = _idempotencia[clave] = _EntradaIdempotencia(huella)
+        return entrada, True
+
+
+def _completar_idempotencia(clave, entrada, resultado):
+    """Publica el resultado del trabajo original a las solicitudes en espera."""
+    with _idempotencia_lock:
+        entrada.resultado = resultado
+        if resultado.get('success') and IDEMPOTENCY_WINDOW_S > 0:
+            entrada.expira = time.monotonic() + IDEMPOTENCY_WINDOW_S
+        else:
+            # Un trabajo fallido no bloquea reintentos (o /jobs/<id>/resume)
+            _idempotencia.pop(clave, None)
+    entrada.listo.set()
+
+
+def _clave_reutilizada(entrada, huella):
+    """True si la clave del original se reutilizó con otro contenido."""
+    return huella is not None and entrada.huella is not None and huella != entrada.huella
+
+
+def _resultado_coalescido(entrada, clave, timeout=None, huella=None):
+    """
+    Espera al trabajo original y retorna su resultado marcado como duplicado.
+    Si el original no termina en `timeout` segundos retorna ERROR_EN_CURSO
+    (el cliente puede reintentar o consultar /jobs/<id>), y si `huella` no
+    coincide con la del original retorna ERROR_CLAVE_REUTILIZADA sin esperar.
+    """
+    if _clave_reutilizada(entrada, huella):
+        logger.warning("Idempotency-Key reutilizada con otros datos",
+                       extra={'campos': {'clave': clave[:24]}})
+        return {"success": False, "error": ERROR_CLAVE_REUTILIZADA}
+    if not entrada.listo.wait(IDEMPOTENCY_WAIT_S if timeout is None else timeout):
+        logger.warning("Solicitud duplicada sin resultado del trabajo original",
+                       extra={'campos': {'clave': clave[:24]}})
+        return {"success": False, "error": ERROR_EN_CURSO, "coalesced": True}
+    logger.info("Solicitud duplicada fusionada con el trabajo %s",
+                entrada.resultado.get('job_id'), extra={'campos': {'clave': clave[:24]}})
+    return {**entrada.resultado, "coalesced": True}
+
+
+def imprimir_etiquetas_idempotente(lote, numeros_caja, printer_name, clave_cliente=None):
+    """Como imprimir_etiquetas, pero fusiona solicitudes duplicadas."""
+    clave = clave_idempotencia(lote, numeros_caja, printer_name, clave_cliente)
+    huella = huella_trabajo(lote, numeros_caja, printer_name)
+    entrada, original = _reservar_idempotencia(clave, huella)
+    if not original:
+        return _resultado_coalescido(entrada, clave, huella=huella)
+
+    resultado = {"success": False, "error": "Error interno del servicio"}
+    try:
+        resultado = imprimir_etiquetas(lote, numeros_caja, printer_name)
+        return resultado
+    finally:
+        _completar_idempotencia(clave, entrada, resultado)
+
+
+def campos_trabajo(lote, printer_name, tiras, etiquetas, queue_wait_s, render_s, spool_s):
+    """Campos estructurados de tiempos de un trabajo de impresión (en ms)."""
+    return {
+        'lote': lote,
+        'printer': repr(printer_name),
+        'tiras': tiras,
+        'etiquetas': etiquetas,
+        'queue_wait_ms': round(queue_wait_s * 1000, 1),
+        'render_ms': round(render_s * 1000, 1),
+        'spool_ms': round(spool_s * 1000, 1),
+    }
+
+
+def leer_numeros_stream(lineas):
+    """
+    Interpreta las líneas NDJSON del stream de impresión y entrega cada número
+    de caja a medida que llega. Cada línea puede ser un número, una lista de
+    números o un objeto {"numeros": [...]}; las líneas vacías se ignoran.
+    """
+    for linea in lineas:
+        linea = linea.strip()
+        if not linea:
+            continue
+        item = json.loads(linea.decode('utf-8'))
+        if isinstance(item, dict):
+            item = item.get('numeros', [])
+        if isinstance(item, list):
+            yield from item
+        else:
+            yield item
+
+
+def _encadenar(primeros, resto):
+    """Entrega primero los números incluidos en la cabecera y luego el stream."""
+    yield from primeros
+    yield from resto
+
+
+def _tiras_desde_cola(cola, timeout=None):
+    """
+    Entrega las tiras encoladas por el hilo lector hasta el fin del stream.
+    Si no llega ninguna tira en `timeout` segundos lanza TimeoutError, lo que
+    aborta el trabajo y libera la impresora.
+    """
+    if timeout is None:
+        timeout = STREAM_READ_TIMEOUT_S
+    while True:
+        try:
+            item = cola.get(timeout=timeout)
+        except queue.Empty:
+            raise TimeoutError(
+                f"El cliente no envió datos durante {timeout:g} s"
+            ) from None
+        if item is _FIN_STREAM:
+            return
+        if isinstance(item, Exception):
+            raise item
+        yield item
+
+
+def _productor_tiras(numeros, cola, detener, diario=None):
+    """
+    Hilo lector del stream: arma las tiras y las encola. La cola es acotada,
+    por lo que si la impresora va más lenta que la subida, la lectura del
+    cuerpo se detiene (back-pressure vía TCP) en lugar de acumular en memoria.
+    Cada tira recibida se anota en el journal antes de encolarse, para que el
+    trabajo pueda reanudarse aunque se corte la conexión.
+    """
+    def encolar(item):
+        while not detener.is_set():
+            try:
+                cola.put(item, timeout=0.5)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def encolar_tira(numero, left, right):
+        if diario:
+            diario.registrar('numeros', numeros=[left] if right is None else [left, right])
+        return encolar((numero, left, right))
+
+    try:
+        numero = 0
+        pendiente = None
+        for caja in numeros:
+            if pendiente is None:
+                pendiente = str(caja)
+                continue
+            numero += 1
+            if not encolar_tira(numero, pendiente, str(caja)):
+                return
+            pendiente = None
+        if pendiente is not None:
+            encolar_tira(numero + 1, pendiente, None)
+        encolar(_FIN_STREAM)
+    except Exception as e:
+        encolar(e)
+
+
 class ZebraServiceHandler(BaseHTTPRequestHandler):
     """Handler HTTP para el servicio de impresión."""
+
+    # Timeout de socket (StreamRequestHandler lo aplica a la conexión): una
+    # lectura de rfile sin datos durante este tiempo lanza TimeoutError.
+    timeout = STREAM_READ_TIMEOUT_S
     
     def do_OPTIONS(self):
         """Maneja preflight CORS - Permite acceso desde dominios web."""
@@ -216,7 +994,7 @@ class ZebraServiceHandler(BaseHTTPRequestHandler):
             self.send_header('Access-Control-Allow-Origin', '*')
             
         self.send_header('Access-Control-Allow-Methods', 'POST, GET, OPTIONS')
-        self.send_header('Access-Control-Allow-Headers', 'Content-Type')
+        self.send_header('Access-Control-Allow-Headers', 'Content-Type, Idempotency-Key')
         self.send_header('Access-Control-Allow-Credentials', 'true')
         self.end_headers()
     
@@ -230,8 +1008,17 @@ class ZebraServiceHandler(BaseHTTPRequestHandler):
         self.send_header('Access-Control-Allow-Credentials', 'true')
     
     def do_GET(self):
-        """Health check."""
-        if self.path == '/health':
+        """Health check, métricas y estado de trabajos."""
+        url = urlsplit(self.path)
+        if url.path == '/metrics':
+            self._handle_metrics(parse_qs(url.query))
+        elif url.path.startswith('/jobs/'):
+            trabajo = cargar_trabajo(url.path[len('/jobs/'):].strip('/'))
+            if trabajo is None:
+                self._send_json(404, {"success": False, "error": "Trabajo no encontrado"})
+            else:
+                self._send_json(200, resumen_trabajo(trabajo))
+        elif self.path == '/health':
             self.send_response(200)
             self.send_header('Content-Type', 'application/json')
             self._set_cors_headers()
@@ -250,7 +1037,12 @@ class ZebraServiceHandler(BaseHTTPRequestHandler):
     
     def do_POST(self):
         """Recibe datos de impresión desde el navegador."""
-        if self.path == '/print':
+        url = urlsplit(self.path)
+        if url.path.startswith('/jobs/'):
+            self._handle_job_action(url)
+        elif self.path == '/print/stream':
+            self._handle_print_stream()
+        elif self.path == '/print':
             content_length = int(self.headers['Content-Length'])
             post_data = self.rfile.read(content_length)
             
@@ -265,9 +1057,17 @@ class ZebraServiceHandler(BaseHTTPRequestHandler):
                 if not numeros:
                     raise ValueError("Lista de números de caja requerida")
                 
-                result = imprimir_etiquetas(lote, numeros, printer)
+                result = imprimir_etiquetas_idempotente(
+                    lote, numeros, printer, self.headers.get('Idempotency-Key')
+                )
                 
-                self.send_response(200 if result['success'] else 400)
+                if result['success']:
+                    status = 200
+                elif result.get('error') in (ERROR_EN_CURSO, ERROR_CLAVE_REUTILIZADA):
+                    status = 409
+                else:
+                    status = 400
+                self.send_response(status)
                 self.send_header('Content-Type', 'application/json')
                 self._set_cors_headers()
                 self.end_headers()
@@ -284,9 +1084,276 @@ class ZebraServiceHandler(BaseHTTPRequestHandler):
             self.send_response(404)
             self.end_headers()
     
+    def _send_json(self, status, data):
+        """Envía una respuesta JSON con headers CORS."""
+        body = json.dumps(data, ensure_ascii=False).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self._set_cors_headers()
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _read_json_body(self):
+        """Lee un cuerpo JSON opcional (objeto vacío si no hay cuerpo)."""
+        content_length = int(self.headers.get('Content-Length') or 0)
+        if not content_length:
+            return {}
+        return json.loads(self.rfile.read(content_length).decode('utf-8'))
+
+    def _handle_job_action(self, url):
+        """
+        Endpoints:
+            POST /jobs/<id>/resume                  continúa desde la primera tira sin confirmar
+            POST /jobs/<id>/reprint?from=N&to=M     reimprime solo las tiras N a M
+
+        Cuerpo opcional: {"printer": "..."} para usar otra impresora.
+        """
+        partes = url.path.strip('/').split('/')
+        if len(partes) != 3 or partes[2] not in ('resume', 'reprint'):
+            self._send_json(404, {"success": False, "error": "Ruta no encontrada"})
+            return
+        job_id, accion = partes[1], partes[2]
+        try:
+            data = self._read_json_body()
+            desde = hasta = None
+            if accion == 'reprint':
+                query = parse_qs(url.query)
+                desde = int(query['from'][0]) if 'from' in query else None
+                hasta = int(query['to'][0]) if 'to' in query else None
+                if desde is None and hasta is None:
+                    raise ValueError("Indique el tramo a reimprimir con ?from=N&to=M")
+        except ValueError as e:
+            self._send_json(400, {"success": False, "error": str(e)})
+            return
+
+        result = reanudar_trabajo(job_id, desde, hasta, data.get('printer'))
+        if result is None:
+            self._send_json(404, {"success": False, "error": "Trabajo no encontrado"})
+        else:
+            if result['success']:
+                status = 200
+            elif result['error'] == ERROR_EN_CURSO:
+                status = 409
+            else:
+                status = 400
+            self._send_json(status, result)
+
+    def _handle_metrics(self, query):
+        """
+        Endpoint: GET /metrics
+
+        Formato de texto Prometheus por defecto; JSON con ?format=json o
+        con el header Accept: application/json.
+        """
+        formato = query.get('format', [''])[0]
+        if formato == 'json' or (not formato and 'application/json' in self.headers.get('Accept', '')):
+            body = json.dumps(metricas.snapshot(), ensure_ascii=False).encode('utf-8')
+            content_type = 'application/json'
+        else:
+            body = metricas.prometheus().encode('utf-8')
+            content_type = 'text/plain; version=0.0.4; charset=utf-8'
+        self.send_response(200)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        self._set_cors_headers()
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _iter_body_lines(self):
+        """
+        Itera las líneas del cuerpo a medida que llegan, sin leerlo completo.
+        Soporta Content-Length y Transfer-Encoding: chunked.
+        """
+        if self.headers.get('Transfer-Encoding', '').lower() == 'chunked':
+            pending = b''
+            while True:
+                size_line = self.rfile.readline()
+                if not size_line:
+                    break
+                size = int(size_line.split(b';')[0].strip() or b'0', 16)
+                if size == 0:
+                    # Consumir trailers hasta la línea vacía final
+                    while self.rfile.readline() not in (b'\r\n', b'\n', b''):
+                        pass
+                    break
+                pending += self.rfile.read(size)
+                self.rfile.readline()  # CRLF de cierre del chunk
+                *lines, pending = pending.split(b'\n')
+                yield from lines
+            if pending:
+                yield pending
+        else:
+            remaining = int(self.headers.get('Content-Length', 0))
+            line = b''
+            while remaining > 0:
+                chunk = self.rfile.readline(min(remaining, 65536))
+                if not chunk:
+                    break
+                remaining -= len(chunk)
+                line += chunk
+                if line.endswith(b'\n'):
+                    yield line
+                    line = b''
+            if line:
+                yield line
+
+    def _iniciar_eventos(self):
+        """Envía los headers de una respuesta text/event-stream."""
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/event-stream; charset=utf-8')
+        self.send_header('Cache-Control', 'no-cache')
+        self.send_header('X-Accel-Buffering', 'no')
+        self._set_cors_headers()
+        self.end_headers()
+        self.close_connection = True
+
+    def _send_event(self, event, data):
+        """Escribe un Server-Sent Event y lo envía de inmediato."""
+        payload = json.dumps(data, ensure_ascii=False)
+        self.wfile.write(f"event: {event}\ndata: {payload}\n\n".encode('utf-8'))
+        self.wfile.flush()
+
+    def _handle_print_stream(self):
+        """
+        Endpoint: POST /print/stream
+
+        Cuerpo NDJSON (Content-Length o chunked). La primera línea es la
+        cabecera del trabajo y las siguientes traen los números de caja:
+
+            {"lote": "L-123", "printer": "ZDesigner ZD230-203dpi ZPL"}
+            [1, 2, 3, 4]
+            {"numeros": [5, 6]}
+            7
+
+        La respuesta es text/event-stream: un evento "strip" por cada tira
+        enviada a la impresora, y un evento final "done" o "error". Así la
+        impresión avanza mientras el cliente sigue subiendo números.
+
+        Con el header Idempotency-Key, un reenvío del mismo stream no vuelve
+        a imprimir: recibe un único evento final con el resultado original.
+        Si la clave se usó con otra cabecera (lote, impresora o números
+        iniciales) responde 409; los números que llegan después no se
+        conocen al decidir y no se comparan.
+
+        Retorna el resultado final, o None si la cabecera fue rechazada.
+        """
+        lineas = self._iter_body_lines()
+        try:
+            cabecera = {}
+            for linea in lineas:
+                if linea.strip():
+                    cabecera = json.loads(linea.decode('utf-8'))
+                    break
+            lote = cabecera.get('lote', '')
+            if not lote:
+                raise ValueError("Número de lote requerido")
+            numeros_iniciales = cabecera.get('numeros', [])
+            printer_name, error = resolver_impresora(
+                cabecera.get('printer', 'ZDesigner ZD230-203dpi ZPL')
+            )
+            if error:
+                raise ValueError(error)
+        except Exception as e:
+            self.send_response(400)
+            self.send_header('Content-Type', 'application/json')
+            self._set_cors_headers()
+            self.end_headers()
+            error_response = {"success": False, "error": str(e)}
+            self.wfile.write(json.dumps(error_response, ensure_ascii=False).encode('utf-8'))
+            return
+
+        clave = entrada = None
+        original = True
+        if self.headers.get('Idempotency-Key'):
+            clave = clave_idempotencia(lote, [], printer_name, self.headers['Idempotency-Key'])
+            huella = huella_trabajo(lote, numeros_iniciales, printer_name)
+            entrada, original = _reservar_idempotencia(clave, huella)
+            if not original and _clave_reutilizada(entrada, huella):
+                resultado = _resultado_coalescido(entrada, clave, huella=huella)
+                self._send_json(409, resultado)
+                return resultado
+
+        if not original:
+            self._iniciar_eventos()
+            resultado = _resultado_coalescido(entrada, clave)
+            self._send_event('done' if resultado.get('success') else 'error', resultado)
+            return resultado
+
+        resultado = {"success": False, "error": "Error interno del servicio"}
+        try:
+            self._iniciar_eventos()
+            resultado = self._print_stream(lineas, lote, numeros_iniciales, printer_name)
+        finally:
+            if clave:
+                _completar_idempotencia(clave, entrada, resultado)
+        return resultado
+
+    def _print_stream(self, lineas, lote, numeros_iniciales, printer_name):
+        """Imprime el stream emitiendo eventos SSE y retorna el resultado final."""
+        diario = DiarioTrabajo.nuevo(lote, printer_name, [])
+        _marcar_activo(diario.job_id)
+        cola = queue.Queue(maxsize=STREAM_QUEUE_MAX)
+        detener = threading.Event()
+        numeros = leer_numeros_stream(lineas)
+        if numeros_iniciales:
+            numeros = _encadenar(numeros_iniciales, numeros)
+        productor = threading.Thread(
+            target=_productor_tiras, args=(numeros, cola, detener, diario), daemon=True
+        )
+        productor.start()
+
+        def al_imprimir(trabajo, numero, left, right):
+            self._send_event('strip', {
+                "job_id": trabajo.job_id,
+                "tira": numero,
+                "izquierda": left,
+                "derecha": right,
+                "etiquetas": trabajo.labels_printed,
+            })
+
+        trabajo = TrabajoImpresion(lote, printer_name, diario)
+        try:
+            self._send_event('job', {"job_id": diario.job_id})
+            _imprimir_tiras(trabajo, _tiras_desde_cola(cola), al_imprimir)
+            diario.finalizar()
+            logger.info("Trabajo impreso (stream)", extra={'campos': trabajo.campos()})
+            resultado = {
+                "success": True,
+                "job_id": diario.job_id,
+                "printed_count": trabajo.strips_printed,
+                "labels_count": trabajo.labels_printed,
+                "message": f"✅ Se imprimieron {trabajo.strips_printed} tiras ({trabajo.labels_printed} etiquetas) en '{printer_name}'"
+            }
+            self._send_event('done', resultado)
+            return resultado
+        except (BrokenPipeError, ConnectionResetError):
+            # El navegador cerró la conexión: no seguir imprimiendo a ciegas
+            diario.finalizar(error="Cliente desconectado")
+            logger.warning("Cliente desconectado tras %d tiras del lote %s", trabajo.strips_printed, lote)
+            return {"success": False, "job_id": diario.job_id,
+                    "printed_count": trabajo.strips_printed, "error": "Cliente desconectado"}
+        except Exception as e:
+            diario.finalizar(error=str(e))
+            logger.error("Error al imprimir (stream): %s", e, extra={'campos': trabajo.campos()})
+            resultado = {
+                "success": False,
+                "job_id": diario.job_id,
+                "printed_count": trabajo.strips_printed,
+                "error": f"Error al imprimir: {str(e)}"
+            }
+            try:
+                self._send_event('error', resultado)
+            except OSError:
+                pass
+            return resultado
+        finally:
+            detener.set()
+            _desmarcar_activo(diario.job_id)
+
     def log_message(self, format, *args):
         """Personaliza el log."""
-        print(f"[{self.log_date_time_string()}] {format % args}")
+        logger.info("%s - %s", self.address_string(), format % args)
 
 
 def run_service(port=5000):
@@ -302,8 +1369,11 @@ def run_service(port=5000):
         print("   Instalar con: pip install pywin32")
         sys.exit(1)
     
+    configurar_logging()
+    limpiar_journal()
+
     server_address = ('', port)
-    httpd = HTTPServer(server_address, ZebraServiceHandler)
+    httpd = ThreadingHTTPServer(server_address, ZebraServiceHandler)
     
     print("=" * 60)
     print("🖨️  SERVICIO DE IMPRESIÓN ZEBRA - SISTEMA USDA")
@@ -311,6 +1381,9 @@ def run_service(port=5000):
     print(f"✅ Servicio iniciado en http://localhost:{port}")
     print(f"   Health check: http://localhost:{port}/health")
     print(f"   Endpoint: POST http://localhost:{port}/print")
+    print(f"   Streaming: POST http://localhost:{port}/print/stream (NDJSON → SSE)")
+    print(f"   Métricas: http://localhost:{port}/metrics (Prometheus, ?format=json)")
+    print(f"   Trabajos: GET /jobs/<id>, POST /jobs/<id>/resume, POST /jobs/<id>/reprint?from=N&to=M")
     print()
     
     printers = get_available_printers()
@@ -325,6 +1398,7 @@ def run_service(port=5000):
         print(f"   Impresoras disponibles: {', '.join(printers) if printers else 'Ninguna'}")
     
     print()
+    print(f"📝 Registro: {os.path.abspath(LOG_FILE)} (nivel {LOG_LEVEL})")
     print("🔄 Presiona Ctrl+C para detener el servicio")
     print("=" * 60)
     
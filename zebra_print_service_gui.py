@@ -6,14 +6,24 @@ Se ejecuta en la bandeja del sistema (system tray)
 
 import sys
 import json
+import time
+import logging
 import win32print
-from http.server import HTTPServer, BaseHTTPRequestHandler
+from http.server import HTTPServer
 import threading
 import tkinter as tk
 from tkinter import messagebox
 import pystray
 from PIL import Image, ImageDraw
 from datetime import datetime
+from zebra_print_service import (
+    logger,
+    configurar_logging,
+    RingBufferHandler,
+    LOG_BUFFER_SIZE,
+    campos_trabajo,
+    ZebraServiceHandler as ZebraServiceHandlerBase,
+)
 
 # ============================================
 # CONFIGURACIÓN
@@ -141,8 +151,15 @@ def build_zpl_double_label(lote, left_num, right_num=None):
     zpl.append("^XZ")
     return "\n".join(zpl)
 
-def imprimir_etiquetas(lote, numeros, printer_name):
-    """Imprime etiquetas en pares (tiras de 10x5cm con dos etiquetas de 5x5cm)."""
+def imprimir_etiquetas(lote, numeros, printer_name, recibido=None):
+    """
+    Imprime etiquetas en pares (tiras de 10x5cm con dos etiquetas de 5x5cm).
+    `recibido` es el time.perf_counter() de llegada de la solicitud; se usa
+    para registrar cuánto esperó el trabajo antes de empezar a imprimir.
+    """
+    queue_wait_s = time.perf_counter() - recibido if recibido is not None else 0.0
+    render_s = spool_s = 0.0
+    strips_printed = 0
     try:
         # Verificar que la impresora existe
         try:
@@ -156,12 +173,19 @@ def imprimir_etiquetas(lote, numeros, printer_name):
         
         # Imprimir en pares: (0,1), (2,3), ...
         i = 0
-        strips_printed = 0
         while i < len(numeros):
             left = str(numeros[i])
             right = str(numeros[i+1]) if i+1 < len(numeros) else None
+            t0 = time.perf_counter()
             etiqueta_zpl = build_zpl_double_label(lote, left, right)
+            render_s += time.perf_counter() - t0
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug(
+                    "Tira %d: Izq=%s, Der=%s\n%s",
+                    strips_printed + 1, left, right or 'vacío', etiqueta_zpl
+                )
             
+            t1 = time.perf_counter()
             hPrinter = win32print.OpenPrinter(printer_name)
             try:
                 hJob = win32print.StartDocPrinter(hPrinter, 1, ("Etiqueta USDA", None, "RAW"))
@@ -173,10 +197,14 @@ def imprimir_etiquetas(lote, numeros, printer_name):
                     win32print.EndDocPrinter(hPrinter)
             finally:
                 win32print.ClosePrinter(hPrinter)
+            spool_s += time.perf_counter() - t1
             
             strips_printed += 1
             i += 2
         
+        logger.info("Trabajo impreso", extra={'campos': campos_trabajo(
+            lote, printer_name, strips_printed, len(numeros), queue_wait_s, render_s, spool_s
+        )})
         return {
             "success": True,
             "message": f"✅ Se imprimieron {strips_printed} tiras ({len(numeros)} etiquetas) en '{printer_name}'",
@@ -185,6 +213,9 @@ def imprimir_etiquetas(lote, numeros, printer_name):
         }
     
     except Exception as e:
+        logger.error("Error al imprimir: %s", e, extra={'campos': campos_trabajo(
+            lote, printer_name, strips_printed, len(numeros), queue_wait_s, render_s, spool_s
+        )})
         return {
             "success": False,
             "error": f"Error al imprimir: {str(e)}"
@@ -194,8 +225,13 @@ def imprimir_etiquetas(lote, numeros, printer_name):
 # SERVIDOR HTTP
 # ============================================
 
-class ZebraServiceHandler(BaseHTTPRequestHandler):
-    """Manejador HTTP para el servicio de impresión."""
+class ZebraServiceHandler(ZebraServiceHandlerBase):
+    """
+    Manejador HTTP para el servicio de impresión.
+
+    POST /print/stream (NDJSON con avance por Server-Sent Events, timeout de
+    lectura y journal) se hereda tal cual del servicio de consola.
+    """
     
     log_callback = None  # Callback para logging en GUI
     
@@ -254,7 +290,13 @@ class ZebraServiceHandler(BaseHTTPRequestHandler):
     
     def do_POST(self):
         """Maneja solicitudes POST (imprimir)."""
-        if self.path == '/print':
+        if self.path == '/print/stream':
+            result = self._handle_print_stream()
+            if result and self.log_callback:
+                status = "✅" if result['success'] else "❌"
+                self.log_callback(f"{status} Stream: {result.get('printed_count', 0)} tiras")
+        elif self.path == '/print':
+            recibido = time.perf_counter()
             content_length = int(self.headers['Content-Length'])
             post_data = self.rfile.read(content_length)
             
@@ -279,7 +321,7 @@ class ZebraServiceHandler(BaseHTTPRequestHandler):
                         raise ValueError("No se encontró impresora Zebra")
                 
                 # Imprimir
-                result = imprimir_etiquetas(lote, numeros, printer)
+                result = imprimir_etiquetas(lote, numeros, printer, recibido)
                 
                 self.send_response(200 if result['success'] else 400)
                 self.send_header('Content-Type', 'application/json')
@@ -319,6 +361,8 @@ class PrinterServiceApp:
         self.icon = None
         self.running = False
         self.log_window = None
+        self.log_buffer = RingBufferHandler(LOG_BUFFER_SIZE)
+        configurar_logging(console=sys.stdout is not None, ring_buffer=self.log_buffer)
         
     def create_image(self):
         """Crea icono para la bandeja del sistema."""
@@ -353,17 +397,23 @@ class PrinterServiceApp:
             self.add_log("🔴 Servicio detenido")
     
     def add_log(self, message):
-        """Agrega mensaje al log (si la ventana está abierta)."""
-        timestamp = datetime.now().strftime("%H:%M:%S")
-        log_message = f"[{timestamp}] {message}"
-        print(log_message)  # También en consola
-        
-        if self.log_window and hasattr(self.log_window, 'text_widget'):
-            try:
-                self.log_window.text_widget.insert('end', log_message + '\n')
-                self.log_window.text_widget.see('end')
-            except:
-                pass
+        """Agrega mensaje al log (archivo rotativo y buffer del visor)."""
+        logger.info(message)
+    
+    def _refresh_log_window(self):
+        """Agrega al visor las líneas nuevas del buffer (se llama periódicamente)."""
+        if not (self.log_window and tk.Toplevel.winfo_exists(self.log_window)):
+            return
+        text_widget = self.log_window.text_widget
+        self.log_window.last_seq, lineas = self.log_buffer.since(self.log_window.last_seq)
+        if lineas:
+            text_widget.insert('end', '\n'.join(lineas) + '\n')
+            # Mantener el visor acotado al mismo tamaño que el buffer
+            sobrantes = int(text_widget.index('end-1c').split('.')[0]) - 1 - LOG_BUFFER_SIZE
+            if sobrantes > 0:
+                text_widget.delete('1.0', f'{sobrantes + 1}.0')
+            text_widget.see('end')
+        self.log_window.after(500, self._refresh_log_window)
     
     def show_status(self, icon, item):
         """Muestra ventana de estado."""
@@ -405,12 +455,14 @@ Todas las impresoras: {len(all_printers)}
         scrollbar.config(command=text_widget.yview)
         
         self.log_window.text_widget = text_widget
+        self.log_window.last_seq = 0
         
         # Botón cerrar
         btn_close = tk.Button(self.log_window, text="Cerrar", command=self.log_window.destroy)
         btn_close.pack(pady=5)
         
         self.add_log("📋 Ventana de logs abierta")
+        self._refresh_log_window()
     
     def test_print(self, icon, item):
         """Imprime etiqueta de prueba."""